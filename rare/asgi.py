@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rare.settings')
+# Serve the read endpoints with async views; RARE_ASYNC_READS=0 turns them off
+os.environ.setdefault('RARE_ASYNC_READS', '1')
 
 application = get_asgi_application()
@@ -46,15 +46,31 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'rareapi.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
+    'DEFAULT_RENDERER_CLASSES': [
+        # orjson when installed; same bytes as DRF's own
+        'rareapi.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'rareapi.pagination.BoundedLimitOffsetPagination',
     'PAGE_SIZE': 10
 }
 
+# In-process token -> user cache used by CachedTokenAuthentication
+TOKEN_CACHE_MAX_SIZE = 10000
+TOKEN_CACHE_TTL = 300  # seconds
+
+# Async views for the post, comment and rareuser reads (rareapi.asyncviews).
+# rare/asgi.py turns this on; under WSGI they would only add thread hops.
+ASYNC_READS = os.environ.get('RARE_ASYNC_READS') == '1'
+
+# The bulk create endpoints take up to 10,000 items per request
+DATA_UPLOAD_MAX_MEMORY_SIZE = 16 * 1024 * 1024
+
 CORS_ORIGIN_WHITELIST = (
     'http://localhost:3000',
     'http://127.0.0.1:3000'
@@ -62,6 +78,9 @@ CORS_ORIGIN_WHITELIST = (
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Outermost of the rest, so its timings cover them
+    'rareapi.middleware.PerformanceMiddleware',
+    'rareapi.middleware.ReplicaReadsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -94,13 +113,81 @@ WSGI_APPLICATION = 'rare.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/4.0/ref/settings/#databases
+# RARE_DB_ENGINE switches the backend (sqlite3, postgresql, mysql or a
+# dotted path; postgresql needs psycopg2 installed), configured by
+# RARE_DB_NAME/USER/PASSWORD/HOST/PORT.
+# RARE_DB_PROFILE=production keeps connections open between requests and,
+# on SQLite, applies SQLITE_PRAGMAS to every new connection.
+
+DB_ENGINE = os.environ.get('RARE_DB_ENGINE', 'sqlite3')
+DB_PROFILE = os.environ.get('RARE_DB_PROFILE', 'development')
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'ENGINE': DB_ENGINE if '.' in DB_ENGINE else f'django.db.backends.{DB_ENGINE}',
+        'NAME': os.environ.get(
+            'RARE_DB_NAME', BASE_DIR / 'db.sqlite3' if DB_ENGINE == 'sqlite3' else 'rare'),
     }
 }
+if DB_ENGINE != 'sqlite3':
+    DATABASES['default'].update({
+        'USER': os.environ.get('RARE_DB_USER', ''),
+        'PASSWORD': os.environ.get('RARE_DB_PASSWORD', ''),
+        'HOST': os.environ.get('RARE_DB_HOST', 'localhost'),
+        'PORT': os.environ.get('RARE_DB_PORT', ''),
+    })
+
+SQLITE_PRAGMAS = {}
+if DB_PROFILE == 'production':
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('RARE_DB_CONN_MAX_AGE', 600))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+    SQLITE_PRAGMAS = {
+        # Readers and the writer stop blocking each other
+        'journal_mode': 'WAL',
+        # Wait up to 5s for the write lock rather than fail with "database is locked"
+        'busy_timeout': 5000,
+        # Sync at checkpoints, not every commit; WAL stays consistent either way
+        'synchronous': 'NORMAL',
+        # 64 MiB page cache per connection
+        'cache_size': -65536,
+    }
+
+# Read replicas, RARE_DB_REPLICAS=a,b: SQLite files that manage.py
+# sync_replica copies the primary into, or for other engines the hosts
+# the database server replicates to. GET, HEAD and OPTIONS requests read
+# from them (rareapi.routers); tests use the primary.
+DATABASE_REPLICAS = []
+for index, location in enumerate(
+        filter(None, os.environ.get('RARE_DB_REPLICAS', '').split(',')), start=1):
+    replica = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+    replica['NAME' if DB_ENGINE == 'sqlite3' else 'HOST'] = location.strip()
+    DATABASES[f'replica{index}'] = replica
+    DATABASE_REPLICAS.append(f'replica{index}')
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ['rareapi.routers.ReplicaRouter']
+# Seconds a replica health check is trusted before probing again
+REPLICA_HEALTH_CHECK_INTERVAL = int(os.environ.get('RARE_REPLICA_HEALTH_CHECK_INTERVAL', 10))
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+# locmem is per process; point RARE_CACHE_DIR at a directory to share the
+# category/tag response cache between several workers on one box.
+
+if os.environ.get('RARE_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['RARE_CACHE_DIR'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'rare',
+        }
+    }
 
 
 # Password validation
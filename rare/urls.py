@@ -13,17 +13,19 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.conf.urls import include
 from django.urls import path
 from rest_framework import routers
 from rareapi.models import rareuser
-from rareapi.views import register_user, login_user
+from rareapi.views import register_user, login_user, token_cache_stats, prometheus_metrics
 from rareapi.views import CategoryView
 from rareapi.views import CommentView
 from rareapi.views import PostView
 from rareapi.views import TagView
 from rareapi.views import RareUserView
-from rareapi.views.profile import get_rareuser_profile
+from rareapi.views.profile import aget_rareuser_profile, get_rareuser_profile
+from rareapi.asyncviews import async_read_view, with_async_reads
 
 
 router = routers.DefaultRouter(trailing_slash=False)
@@ -35,10 +37,26 @@ router.register(r'posts', PostView, 'post')
 router.register(r'comments', CommentView, 'comment') 
 router.register(r'rareusers', RareUserView, 'rareuser') 
 
+router_urls = router.urls
+profile_view = get_rareuser_profile
+if settings.ASYNC_READS:
+    # Route name -> async handler; see rareapi.asyncviews
+    router_urls = with_async_reads(router_urls, {
+        'post-list': PostView.alist,
+        'post-detail': PostView.aretrieve,
+        'comment-list': CommentView.alist,
+        'comment-detail': CommentView.aretrieve,
+        'rareuser-list': RareUserView.alist,
+        'rareuser-detail': RareUserView.aretrieve,
+    })
+    profile_view = async_read_view(get_rareuser_profile, aget_rareuser_profile)
+
 urlpatterns = [
-    path('', include(router.urls)),
+    path('', include(router_urls)),
     path('register', register_user),
     path('login', login_user),
     path('api-auth', include('rest_framework.urls', namespace='rest_framework')),
-    path('myprofile', get_rareuser_profile)
+    path('myprofile', profile_view),
+    path('token-cache', token_cache_stats),
+    path('metrics', prometheus_metrics),
 ]
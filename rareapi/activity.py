@@ -0,0 +1,86 @@
+"""Upkeep of the comment_count and last_comment_at columns of posts
+
+Each change is one UPDATE computed by the database, so concurrent
+comments on the same post can't lose each other's counts. The post's
+updated_at moves along, as its JSON now differs. Writes that bypass
+these functions (admin, cascades from deleted users, raw loads) are
+repaired by manage.py rebuild_comment_counts.
+"""
+from django.db.models import Count, DateTimeField, F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from rareapi.models import Comment, Post
+
+
+def comment_added(comment):
+    """Count a comment just saved on its post"""
+    created_on = Value(comment.created_on, output_field=DateTimeField())
+    Post.objects.filter(pk=comment.post_id).update(
+        comment_count=F('comment_count') + 1,
+        last_comment_at=Greatest(Coalesce('last_comment_at', created_on), created_on),
+        updated_at=timezone.now(),
+    )
+
+
+def comment_removed(post_id):
+    """Uncount a comment just deleted from, or moved off, a post"""
+    Post.objects.filter(pk=post_id).update(
+        comment_count=Greatest(F('comment_count') - 1, Value(0)),
+        last_comment_at=_latest_comment(),
+        updated_at=timezone.now(),
+    )
+
+
+def recount(posts):
+    """Recompute both columns of posts from their comments
+
+    Returns:
+        int -- posts updated
+    """
+    return posts.update(
+        comment_count=Coalesce(
+            Subquery(_comments().annotate(total=Count('pk')).values('total')), 0),
+        last_comment_at=_latest_comment(),
+        updated_at=timezone.now(),
+    )
+
+
+def rebuild(batch_size=1000):
+    """Recount every post whose columns disagree with its comments
+
+    Walks the posts in primary key batches, so it can run on a live
+    database, and leaves correct posts (and their ETags) alone.
+
+    Returns:
+        tuple -- (posts checked, posts fixed)
+    """
+    checked = fixed = 0
+    last_id = 0
+    while True:
+        batch = list(
+            Post.objects.filter(pk__gt=last_id).order_by('pk')
+            .annotate(
+                counted=Coalesce(
+                    Subquery(_comments().annotate(total=Count('pk')).values('total')), 0),
+                latest=_latest_comment())
+            .values_list('pk', 'comment_count', 'last_comment_at', 'counted', 'latest')
+            [:batch_size])
+        if not batch:
+            return checked, fixed
+
+        stale = [
+            pk for pk, comment_count, last_comment_at, counted, latest in batch
+            if (comment_count, last_comment_at) != (counted, latest)
+        ]
+        if stale:
+            fixed += recount(Post.objects.filter(pk__in=stale))
+        checked += len(batch)
+        last_id = batch[-1][0]
+
+
+def _comments():
+    return Comment.objects.filter(post=OuterRef('pk')).order_by().values('post')
+
+
+def _latest_comment():
+    return Subquery(_comments().annotate(last=Max('created_on')).values('last'))
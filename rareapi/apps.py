@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class RareapiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'rareapi'
+
+    def ready(self):
+        # Connect the cache invalidation receivers, register the job tasks
+        from rareapi import signals, tasks  # pylint: disable=unused-import,import-outside-toplevel
+        from rareapi.metrics import install_serializer_timer  # pylint: disable=import-outside-toplevel
+        install_serializer_timer()
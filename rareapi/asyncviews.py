@@ -0,0 +1,117 @@
+"""Async entry points for the read-heavy endpoints
+
+Under ASGI a sync view holds a thread for its whole run. With
+settings.ASYNC_READS the list and retrieve routes of posts, comments and
+rareusers, and /myprofile, go through async_read_view() instead: a GET
+whose token authenticates and that negotiates JSON runs the view's async
+handler on the event loop, querying through the ORM's async API. Anything
+else (writes, missing or bad credentials, the browsable API, cursor
+pages, .json suffixes) is passed to the sync view, so both paths answer alike.
+"""
+from asgiref.sync import sync_to_async
+from django.urls import URLPattern
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rareapi.authentication import CachedTokenAuthentication
+
+authenticator = CachedTokenAuthentication()
+
+
+def async_read_view(callback, handler):
+    """Serve GETs to a DRF view with an async handler where possible
+
+    Arguments:
+        callback -- the view function DRF built (ViewSet.as_view, @api_view)
+        handler -- coroutine function called like a method of the view,
+                   handler(view, request, *args, **kwargs); returns a
+                   Response, or None to hand the request to callback
+
+    Returns:
+        function -- async view for the same route
+    """
+    run_sync = sync_to_async(callback)
+
+    async def view(request, *args, **kwargs):
+        # The actions take no format argument, so suffixed URLs stay as they were
+        if request.method == 'GET' and 'format' not in kwargs:
+            credentials = await authenticator.aauthenticate(request)
+            if credentials is not None:
+                response = await _handle(callback, handler, credentials, request, args, kwargs)
+                if response is not None:
+                    return response
+        return await run_sync(request, *args, **kwargs)
+
+    # Same markers as the sync view: CSRF exemption, and the attributes the
+    # metrics middleware names actions by
+    view.csrf_exempt = True
+    for attribute in ('cls', 'initkwargs', 'actions'):
+        if hasattr(callback, attribute):
+            setattr(view, attribute, getattr(callback, attribute))
+    return view
+
+
+async def _handle(callback, handler, credentials, request, args, kwargs):
+    """Run handler as DRF's dispatch() would run the sync action
+
+    Returns:
+        Response -- finalized, or None when the sync view should answer
+    """
+    view = callback.cls(**callback.initkwargs)
+    actions = getattr(callback, 'actions', None)
+    if actions is not None:
+        # What ViewSetMixin.as_view() does per request
+        view.action_map = actions
+        for method, action in actions.items():
+            setattr(view, method, getattr(view, action))
+        if hasattr(view, 'get') and not hasattr(view, 'head'):
+            view.head = view.get
+        view.action = actions.get('get')
+    view.args = args
+    view.kwargs = kwargs
+
+    drf_request = Request(
+        request,
+        parsers=view.get_parsers(),
+        authenticators=(),
+        negotiator=view.get_content_negotiator(),
+        parser_context=view.get_parser_context(request),
+    )
+    drf_request.user, drf_request.auth = credentials
+    view.request = drf_request
+    view.headers = view.default_response_headers
+
+    try:
+        # Negotiation, permissions and throttles; no queries once the user is set
+        view.initial(drf_request, *args, **kwargs)
+    except APIException:
+        return None
+    if not isinstance(drf_request.accepted_renderer, JSONRenderer):
+        return None
+
+    try:
+        response = await handler(view, drf_request, *args, **kwargs)
+    except APIException as exc:
+        response = view.handle_exception(exc)
+    if response is None:
+        return None
+    return view.finalize_response(drf_request, response, *args, **kwargs)
+
+
+def with_async_reads(patterns, handlers):
+    """Router URL patterns with async handlers for some routes
+
+    Arguments:
+        patterns -- router.urls
+        handlers -- route name (post-list, post-detail...) -> handler
+
+    Returns:
+        list -- the patterns, with matching ones served by async_read_view
+    """
+    return [
+        URLPattern(
+            pattern.pattern, async_read_view(pattern.callback, handlers[pattern.name]),
+            pattern.default_args, pattern.name)
+        if isinstance(pattern, URLPattern) and pattern.name in handlers else pattern
+        for pattern in patterns
+    ]
@@ -0,0 +1,172 @@
+"""Token authentication backed by an in-process cache"""
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rareapi.models import RareUser
+
+
+class TokenCache:
+    """Bounded LRU cache of token key -> (user, token) with a time to live
+
+    The cache lives in the worker process, so invalidation through signals
+    only reaches the process that made the change. The TTL bounds how long
+    any other worker can keep serving a stale entry.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Look up a token key
+
+        Returns:
+            tuple -- (user, token) or None when absent or expired
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        """Store (user, token) for a key, evicting the least recently used"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, key):
+        """Drop one token key"""
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def discard_user(self, user_id):
+        """Drop every token that belongs to a user"""
+        with self._lock:
+            stale = [
+                key for key, (_expires, (user, _token)) in self._entries.items()
+                if user.pk == user_id
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        """Drop every entry and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def stats(self):
+        """Counters for sizing the cache
+
+        Returns:
+            dict -- size, limits, hit/miss counts and hit rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+token_cache = TokenCache(
+    max_size=getattr(settings, 'TOKEN_CACHE_MAX_SIZE', 10000),
+    ttl=getattr(settings, 'TOKEN_CACHE_TTL', 300),
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that skips the token query on a cache hit
+
+    The user is loaded together with its RareUser, so request.user.rareuser
+    is available without another query.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+
+        model = self.get_model()
+        try:
+            token = model.objects.select_related('user__rareuser').get(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        token_cache.set(key, (token.user, token))
+        return (token.user, token)
+
+    async def aauthenticate(self, request):
+        """authenticate() for the async views, reading the token with aget()
+
+        Returns:
+            tuple -- (user, token), or None when the credentials are missing
+                     or not accepted; DRF then gives its usual 401
+        """
+        header = request.META.get('HTTP_AUTHORIZATION', '').split()
+        if len(header) != 2 or header[0].lower() != self.keyword.lower():
+            return None
+
+        key = header[1]
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+
+        model = self.get_model()
+        try:
+            token = await model.objects.select_related('user__rareuser').aget(key=key)
+        except model.DoesNotExist:
+            return None
+
+        if not token.user.is_active:
+            return None
+
+        token_cache.set(key, (token.user, token))
+        return (token.user, token)
+
+
+def get_rareuser(request):
+    """RareUser acting in a request
+
+    CachedTokenAuthentication loads it together with the user and Django
+    keeps it on the user instance, so every view in the request shares
+    one lookup, and none at all when the token came from the cache.
+
+    Returns:
+        RareUser -- or None for accounts without a profile
+    """
+    try:
+        return request.user.rareuser
+    except (AttributeError, RareUser.DoesNotExist):
+        return None
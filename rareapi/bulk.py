@@ -0,0 +1,109 @@
+"""Helpers shared by the bulk create endpoints"""
+from django.db import transaction
+from rest_framework import status
+from rest_framework.exceptions import ParseError, ValidationError
+from rest_framework.response import Response
+from rest_framework.serializers import as_serializer_error
+
+# Rows per INSERT statement
+BATCH_SIZE = 500
+# Items accepted in one request
+MAX_ITEMS = 10000
+# Stay well below SQLite's limit on bound parameters per statement
+LOOKUP_CHUNK_SIZE = 900
+
+
+def request_items(request):
+    """The JSON array a bulk request carries
+
+    Returns:
+        list -- the items, each a dict
+    """
+    items = request.data
+    if not isinstance(items, list):
+        raise ParseError('Expected a JSON array of items')
+    if len(items) > MAX_ITEMS:
+        raise ParseError(f'At most {MAX_ITEMS} items per request')
+    return items
+
+
+def as_id(value):
+    """Coerce a submitted primary key
+
+    Returns:
+        int -- the id, or None when it is not an integer
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def existing_ids(model, ids):
+    """Which of the ids exist, using one query per chunk of ids
+
+    Returns:
+        set -- ids that have a row in model's table
+    """
+    wanted = sorted({pk for pk in ids if pk is not None})
+    found = set()
+    for start in range(0, len(wanted), LOOKUP_CHUNK_SIZE):
+        chunk = wanted[start:start + LOOKUP_CHUNK_SIZE]
+        found.update(model.objects.filter(pk__in=chunk).values_list('pk', flat=True))
+    return found
+
+
+def validated_items(items, serializer_class):
+    """Validate every submitted item with one serializer
+
+    The fields are built once and reused for each item, as a many=True
+    serializer does, but an invalid item only fails itself.
+
+    Yields:
+        tuple -- (index, errors, validated_data); errors is None and
+                 validated_data maps fields to values when the item is usable
+    """
+    serializer = serializer_class()
+    for index, item in enumerate(items):
+        try:
+            yield index, None, serializer.run_validation(item)
+        except ValidationError as ex:
+            yield index, as_serializer_error(ex), None
+
+
+def insert(model, candidates, results, on_created=None):
+    """Insert the valid items and report a status for every item
+
+    Arguments:
+        model -- model class of the rows
+        candidates -- list of (index, unsaved instance)
+        results -- per-item dicts already filled in for invalid items
+        on_created -- called with the created instances inside the same
+                      transaction, for rows derived from them
+
+    Returns:
+        Response -- 201 when all items were created, 207 when only some
+                    were, 400 when none were
+    """
+    with transaction.atomic():
+        created = model.objects.bulk_create(
+            [instance for _index, instance in candidates], batch_size=BATCH_SIZE)
+        if created and on_created is not None:
+            on_created(created)
+
+    for (index, _instance), instance in zip(candidates, created):
+        results.append({'index': index, 'status': 'created', 'id': instance.pk})
+    results.sort(key=lambda result: result['index'])
+
+    if not created:
+        response_status = status.HTTP_400_BAD_REQUEST
+    elif len(created) < len(results):
+        response_status = status.HTTP_207_MULTI_STATUS
+    else:
+        response_status = status.HTTP_201_CREATED
+
+    return Response({
+        'created': len(created),
+        'failed': len(results) - len(created),
+        'results': results,
+    }, status=response_status)
@@ -0,0 +1,163 @@
+"""Versioned response caching for resources that are read far more than written"""
+import hashlib
+import time
+from functools import wraps
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db.models import Count, Max
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def _version_key(namespace):
+    return f'rare:version:{namespace}'
+
+
+def get_version(namespace):
+    """Current version counter of a namespace
+
+    A missing counter (first use, restart, eviction) is seeded from the
+    clock, so it never repeats a version an older ETag was built from.
+
+    Returns:
+        int -- version number
+    """
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(namespace):
+    """Invalidate every cached response of a namespace"""
+    key = _version_key(namespace)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def cached_response(namespace, timeout=DEFAULT_TIMEOUT):
+    """Serve a view method's responses from the cache until the namespace changes
+
+    Entries are keyed by the namespace version and the absolute request
+    URI, as pagination links carry the scheme and host the page was
+    requested on, so bump_version() retires all of them at once. Responses
+    carry an ETag built from the same key, and a matching If-None-Match
+    gets a 304 without running the view or reading the database.
+
+    Arguments:
+        namespace -- version counter that writes to the resource bump
+        timeout -- seconds to keep an entry, cache default when omitted
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            version = get_version(namespace)
+            digest = hashlib.md5(
+                f'{namespace}:{version}:{request.build_absolute_uri()}'.encode()
+            ).hexdigest()
+            etag = f'"{digest}"'
+
+            if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+            if etag in if_none_match or '*' in if_none_match:
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+            key = f'rare:response:{namespace}:{digest}'
+            data = cache.get(key)
+            if data is None:
+                response = method(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache.set(key, response.data, timeout)
+            else:
+                response = Response(data)
+
+            response['ETag'] = etag
+            return response
+        return wrapper
+    return decorator
+
+
+def conditional_response(request, queryset, render, namespaces=()):
+    """Answer a GET with 304 when the rows behind it have not changed
+
+    Freshness is the newest updated_at plus the row count of the filtered
+    queryset, which catches edits, inserts and deletes with one aggregate
+    query. Versions of the embedded resources and the absolute request URI,
+    whose host the pagination links carry, are folded into the ETag as well.
+
+    Arguments:
+        request -- the request being answered
+        queryset -- filtered rows the response is built from
+        render -- callable that builds the full Response when stale
+        namespaces -- version counters of resources nested in the response
+
+    Returns:
+        Response -- 304 or the rendered response with ETag/Last-Modified
+    """
+    freshness = queryset.order_by().aggregate(
+        last_modified=Max('updated_at'), count=Count('pk'))
+    headers, not_modified = _validators(request, freshness, namespaces)
+    if not_modified:
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    response = render()
+    if response.status_code == status.HTTP_200_OK:
+        for header, value in headers.items():
+            response[header] = value
+    return response
+
+
+async def aconditional_response(request, queryset, render, namespaces=()):
+    """conditional_response for async views; render is a coroutine function
+
+    Returns:
+        Response -- 304 or the rendered response with ETag/Last-Modified
+    """
+    freshness = await queryset.order_by().aaggregate(
+        last_modified=Max('updated_at'), count=Count('pk'))
+    headers, not_modified = _validators(request, freshness, namespaces)
+    if not_modified:
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    response = await render()
+    if response.status_code == status.HTTP_200_OK:
+        for header, value in headers.items():
+            response[header] = value
+    return response
+
+
+def _validators(request, freshness, namespaces):
+    """ETag/Last-Modified for the freshness aggregate, and whether the client has them
+
+    Returns:
+        tuple -- (dict of headers, True when a 304 answers the request)
+    """
+    last_modified = freshness['last_modified']
+    versions = ':'.join(str(get_version(namespace)) for namespace in namespaces)
+    digest = hashlib.md5(
+        f'{last_modified}:{freshness["count"]}:{versions}:{request.build_absolute_uri()}'.encode()
+    ).hexdigest()
+    etag = f'"{digest}"'
+
+    headers = {'ETag': etag}
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified.timestamp())
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        etags = parse_etags(if_none_match)
+        not_modified = etag in etags or '*' in etags
+    else:
+        # Only consulted without If-None-Match, and blind to deletes
+        if_modified_since = parse_http_date_safe(
+            request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        not_modified = (
+            if_modified_since is not None and last_modified is not None
+            and int(last_modified.timestamp()) <= if_modified_since)
+
+    return headers, not_modified
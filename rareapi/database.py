@@ -0,0 +1,15 @@
+"""Per-connection database setup"""
+from django.conf import settings
+
+
+def apply_sqlite_pragmas(connection):
+    """Run settings.SQLITE_PRAGMAS on a newly opened SQLite connection
+
+    Executed on the driver connection so they stay out of query logs and
+    request timings.
+    """
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', None)
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    for name, value in pragmas.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,152 @@
+"""Sparse fieldsets, ?fields= and ?expand=, for the model serializers
+
+?fields=id,title,publication_date narrows each object to those fields. A
+relation named in fields is sent as its primary key (a list of them for
+tags), unless expand names it too, in which case it is nested as usual.
+Without fields every field is sent nested, as before, and expand alone
+changes nothing. Names may be comma separated or repeated; unknown ones
+are ignored.
+
+Bookkeeping columns (HIDDEN_FIELDS) are left out of the objects depth=
+nests, as they are of the fields each serializer lists.
+
+The selection narrows the SQL as well. setup_eager_loading() reads only
+the columns behind the chosen fields and joins or prefetches only the
+relations that are expanded, so an unrequested post body is never read.
+"""
+from collections import namedtuple
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+# What the database has to provide for a relation field when it is expanded:
+# only -- columns for QuerySet.only(), the field's own name when None
+# select -- relations to join with select_related()
+# prefetch -- relations to load with prefetch_related()
+Load = namedtuple('Load', ['only', 'select', 'prefetch'], defaults=(None, (), ()))
+
+# Model fields never sent in nested objects: when a soft deleted row was
+# deleted is nobody's business but the purge's
+HIDDEN_FIELDS = frozenset({'deleted_at'})
+
+
+def requested_fieldset(request):
+    """The fields and expand parameters of a request
+
+    Returns:
+        tuple -- (set of field names, or None for every field, set of
+                 relations to expand)
+    """
+    if request is None:
+        return None, set()
+    params = getattr(request, 'query_params', request.GET)
+    return _names(params, 'fields') or None, _names(params, 'expand')
+
+
+def _names(params, key):
+    return {
+        name.strip()
+        for value in params.getlist(key)
+        for name in value.split(',')
+        if name.strip()
+    }
+
+
+class SparseFieldsMixin:
+    """fields/expand support for a ModelSerializer
+
+    Meta.loads maps each relation field to a Load; every other field in
+    Meta.fields is taken to be a column of the same name.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self._is_top_level():
+            return fields
+        requested, expand = requested_fieldset(self.context.get('request'))
+        if requested is None:
+            return fields
+
+        narrowed = {}
+        for name, field in fields.items():
+            if name not in requested:
+                continue
+            if name not in expand and isinstance(field, serializers.BaseSerializer):
+                field = serializers.PrimaryKeyRelatedField(
+                    read_only=True, many=isinstance(field, serializers.ListSerializer))
+            narrowed[name] = field
+        return narrowed
+
+    def build_nested_field(self, field_name, relation_info, nested_depth):
+        field_class, field_kwargs = super().build_nested_field(
+            field_name, relation_info, nested_depth)
+        return _without_hidden_fields(field_class), field_kwargs
+
+    def _is_top_level(self):
+        # Nested serializers share the request, but fields= is about the outer objects
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, request=None):
+        """Read, join and prefetch only what the requested fields print
+
+        Arguments:
+            queryset -- of Meta.model
+            request -- for its fields/expand parameters; everything when None
+
+        Returns:
+            QuerySet -- narrowed with only(), select_related() and prefetch_related()
+        """
+        requested, expand = requested_fieldset(request)
+        loads = getattr(cls.Meta, 'loads', {})
+        model = cls.Meta.model
+        only, select, prefetch = [], [], []
+
+        for name in cls.Meta.fields:
+            if requested is not None and name not in requested:
+                continue
+            if name not in loads:
+                only.append(name)
+                continue
+
+            if requested is not None and name not in expand:
+                # Sent as primary keys: the foreign key column, or the
+                # related ids alone
+                relation = model._meta.get_field(name)
+                if relation.many_to_many or relation.one_to_many:
+                    prefetch.append(Prefetch(
+                        name, queryset=relation.related_model.objects.only('pk')))
+                else:
+                    only.append(name)
+                continue
+
+            load = loads[name]
+            only.extend((name,) if load.only is None else load.only)
+            select.extend(load.select)
+            prefetch.extend(load.prefetch)
+
+        queryset = queryset.only(*only)
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+
+def _without_hidden_fields(serializer_class):
+    """A depth= NestedSerializer that skips HIDDEN_FIELDS, as do the ones it nests"""
+    class NestedSerializer(serializer_class):
+        def get_field_names(self, declared_fields, info):
+            return [
+                name for name in super().get_field_names(declared_fields, info)
+                if name not in HIDDEN_FIELDS
+            ]
+
+        def build_nested_field(self, field_name, relation_info, nested_depth):
+            field_class, field_kwargs = super().build_nested_field(
+                field_name, relation_info, nested_depth)
+            return _without_hidden_fields(field_class), field_kwargs
+
+    return NestedSerializer
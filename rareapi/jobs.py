@@ -0,0 +1,182 @@
+"""A job queue kept in the database, run by manage.py run_jobs
+
+enqueue() is an INSERT on the default database, so a view that calls it
+inside its transaction commits the job with its write, or neither. No
+broker is involved; every worker process polls the job table.
+
+Workers claim a job with a compare-and-set UPDATE on its status, which
+needs no row locks, so any number of worker processes can share the
+table. A job that raises is retried with exponential backoff until it
+has had max_attempts; a worker that dies mid-job leaves it running
+until its lease expires, then it is retried like a failure.
+
+Tasks are plain functions registered with @task; their arguments are
+stored as JSON.
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from rareapi.models import Job
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+# Seconds before the second attempt, doubling for each one after it
+BACKOFF_BASE = 10
+BACKOFF_MAX = 3600
+# Seconds a running job may take before its worker is presumed dead
+LEASE = 600
+
+# Task name -> function
+TASKS = {}
+
+
+def task(name):
+    """Register a function as the task called name"""
+    def decorator(function):
+        TASKS[name] = function
+        return function
+    return decorator
+
+
+def enqueue(name, key=None, priority=0, delay=0, max_attempts=MAX_ATTEMPTS, **args):
+    """Queue a call of task name with keyword arguments args
+
+    Arguments:
+        key -- idempotency key: while a job with the same key is queued,
+               this one is dropped
+        priority -- higher runs first
+        delay -- seconds before the job may run
+
+    Returns:
+        bool -- False when a queued job with the same key made this one redundant
+    """
+    if name not in TASKS:
+        raise ValueError(f'No task named {name!r}')
+    try:
+        # A savepoint, so a duplicate key leaves the caller's transaction usable
+        with transaction.atomic():
+            Job.objects.create(
+                name=name, args=args, key=key, priority=priority, max_attempts=max_attempts,
+                run_after=timezone.now() + timedelta(seconds=delay))
+    except IntegrityError:
+        if key is None:
+            raise
+        return False
+    return True
+
+
+def claim(worker, limit):
+    """Take up to limit queued jobs that are due, most urgent first
+
+    Returns:
+        list -- Job instances now running under worker
+    """
+    if limit < 1:
+        return []
+    now = timezone.now()
+    candidates = (Job.objects.filter(status=Job.QUEUED, run_after__lte=now)
+                  .order_by('-priority', 'run_after', 'id')
+                  .values_list('pk', flat=True)[:limit * 2])
+    claimed = []
+    for pk in candidates:
+        # Another worker may have taken it since the SELECT
+        if Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+                status=Job.RUNNING, locked_by=worker, locked_at=now,
+                attempts=F('attempts') + 1):
+            claimed.append(pk)
+            if len(claimed) == limit:
+                break
+    return list(Job.objects.filter(pk__in=claimed).order_by('-priority', 'run_after', 'id'))
+
+
+def run(job):
+    """Call a claimed job's task and record how it went
+
+    Meant for a worker thread: the thread's connections are closed when
+    they are past their age, as after a request.
+    """
+    close_old_connections()
+    try:
+        function = TASKS.get(job.name)
+        if function is None:
+            _finish(job, Job.FAILED, f'No task named {job.name!r}')
+            return
+        try:
+            function(**job.args)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Job %s (%s) failed, attempt %s', job.pk, job.name, job.attempts)
+            _retry_or_fail(job, traceback.format_exc())
+        else:
+            _finish(job, Job.DONE, '')
+    finally:
+        close_old_connections()
+
+
+def expire_leases(lease=LEASE):
+    """Put jobs whose worker stopped reporting back in the queue
+
+    Returns:
+        int -- jobs retried or failed
+    """
+    stale = Job.objects.filter(
+        status=Job.RUNNING, locked_at__lt=timezone.now() - timedelta(seconds=lease))
+    expired = 0
+    for job in stale:
+        _retry_or_fail(job, f'Lease of {job.locked_by} expired after {lease}s')
+        expired += 1
+    return expired
+
+
+def prune(older_than):
+    """Delete jobs that finished more than older_than seconds ago
+
+    Returns:
+        int -- jobs deleted
+    """
+    deleted, _by_model = Job.objects.filter(
+        status__in=(Job.DONE, Job.FAILED),
+        finished_at__lt=timezone.now() - timedelta(seconds=older_than)).delete()
+    return deleted
+
+
+def counts():
+    """Jobs per status
+
+    Returns:
+        dict -- status -> jobs, every status included
+    """
+    found = dict(Job.objects.order_by().values_list('status').annotate(total=Count('pk')))
+    return {status: found.get(status, 0) for status, _label in Job.STATUSES}
+
+
+def backoff(attempts):
+    """Seconds to wait before retrying a job that has failed attempts times"""
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    # Jobs that failed together shouldn't all come back together
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _finish(job, status, error):
+    Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by).update(
+        status=status, last_error=error, finished_at=timezone.now())
+
+
+def _retry_or_fail(job, error):
+    running = Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by)
+    if job.attempts >= job.max_attempts:
+        running.update(status=Job.FAILED, last_error=error, finished_at=timezone.now())
+        return
+    try:
+        with transaction.atomic():
+            running.update(
+                status=Job.QUEUED, last_error=error, locked_by='', locked_at=None,
+                run_after=timezone.now() + timedelta(seconds=backoff(job.attempts)))
+    except IntegrityError:
+        # The same work was queued again meanwhile; that job stands in for the retry
+        running.update(status=Job.DONE, last_error=error + '\nRetry left to a newer job',
+                       finished_at=timezone.now())
@@ -0,0 +1,174 @@
+"""Fast inserts for the bulk loader and the synthetic data generator
+
+Rows bypass model instances: each record is converted column by column
+and a batch goes to the database as one executemany, so nothing here
+runs save() or sends signals.
+"""
+from contextlib import contextmanager
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connection, connections, models
+from django.utils import timezone
+
+# Connection settings for the duration of a SQLite load. Each batch is
+# still one transaction; a power loss can lose the last batches, but
+# can't tear a committed one.
+SQLITE_PRAGMAS = {
+    'synchronous': 'OFF',
+    'cache_size': '-262144',
+    'temp_store': 'MEMORY',
+}
+
+# Python types the database takes unconverted, by field type
+PASSTHROUGH = {
+    'AutoField': (int,),
+    'BigAutoField': (int,),
+    'IntegerField': (int,),
+    'BigIntegerField': (int,),
+    'PositiveIntegerField': (int,),
+    'CharField': (str,),
+    'TextField': (str,),
+    'BooleanField': (bool,),
+}
+
+TRUE_STRINGS = {'1', 't', 'true', 'y', 'yes'}
+FALSE_STRINGS = {'0', 'f', 'false', 'n', 'no'}
+
+
+class RowWriter:
+    """Turns records of one model into rows and inserts them"""
+
+    def __init__(self, model):
+        self.model = model
+        self.fields = model._meta.concrete_fields
+        self.pk_index = self.fields.index(model._meta.pk)
+        self.columns = [self.column(field) for field in self.fields]
+        self.sql = self.insert_sql(self.fields)
+        # Rows without an id leave the column out so the database assigns one
+        self.generated_sql = self.insert_sql(
+            [field for field in self.fields if not field.primary_key])
+
+    def row(self, record):
+        """The column values of one record, ready for the database
+
+        Fixture records carry their primary key beside "fields". Relations
+        may be given as either "author" or "author_id"; keys that are not
+        columns, like many-to-many lists, are ignored.
+
+        Returns:
+            list -- one value per concrete field
+        """
+        if not isinstance(record, dict):
+            raise TypeError('expected an object')
+        if isinstance(record.get('fields'), dict):
+            values = record['fields']
+            if 'pk' in record:
+                values = {**values, 'pk': record['pk']}
+        else:
+            values = record
+
+        row = []
+        for keys, missing, native, convert in self.columns:
+            for key in keys:
+                if key in values:
+                    value = values[key]
+                    break
+            else:
+                value = missing()
+            if value is None or type(value) in native:
+                row.append(value)
+            else:
+                row.append(convert(value))
+        return row
+
+    def insert(self, rows):
+        """Insert rows made by row(); call inside a transaction"""
+        pk_index = self.pk_index
+        given = [row for row in rows if row[pk_index] is not None]
+        generated = [
+            row[:pk_index] + row[pk_index + 1:]
+            for row in rows if row[pk_index] is None
+        ]
+        with connection.cursor() as cursor:
+            if given:
+                cursor.executemany(self.sql, given)
+            if generated:
+                cursor.executemany(self.generated_sql, generated)
+
+    def reset_sequence(self):
+        """Move the id sequence past explicitly inserted ids, where there is one"""
+        with connection.cursor() as cursor:
+            for statement in connection.ops.sequence_reset_sql(no_style(), [self.model]):
+                cursor.execute(statement)
+
+    def insert_sql(self, fields):
+        """INSERT statement for one row of fields"""
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+        placeholders = ', '.join(['%s'] * len(fields))
+        return f'INSERT INTO {table} ({columns}) VALUES ({placeholders})'
+
+    @staticmethod
+    def column(field):
+        """How row() fills in a field
+
+        Returns:
+            tuple -- (keys to look for, value when they are all missing,
+                      types stored as they are, converter for the rest)
+        """
+        # The connection proxy resolves itself on every attribute access
+        db = connections[DEFAULT_DB_ALIAS]
+        keys = (field.name, field.attname, 'pk') if field.primary_key else (
+            field.name, field.attname)
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+            missing = timezone.now
+        elif field.primary_key:
+            # Left for the database to assign
+            missing = type(None)
+        else:
+            missing = field.get_default
+        target = field.target_field if field.is_relation else field
+        native = PASSTHROUGH.get(target.get_internal_type(), ())
+
+        def convert(value):
+            if isinstance(field, models.BooleanField) and isinstance(value, str):
+                value = parse_bool(value)
+            return field.get_db_prep_save(field.to_python(value), db)
+
+        return keys, missing, native, convert
+
+
+def parse_bool(value):
+    """Read a boolean written out as text, as CSV cells are
+
+    Returns:
+        bool -- the value
+    """
+    lowered = value.strip().lower()
+    if lowered in TRUE_STRINGS:
+        return True
+    if lowered in FALSE_STRINGS:
+        return False
+    raise ValueError(f'{value!r} is not a boolean')
+
+
+@contextmanager
+def bulk_load_pragmas(enabled=True):
+    """Apply SQLITE_PRAGMAS for the duration of a load, then restore them"""
+    if not enabled or connection.vendor != 'sqlite':
+        yield
+        return
+    previous = _set_pragmas(SQLITE_PRAGMAS)
+    try:
+        yield
+    finally:
+        _set_pragmas(previous)
+
+
+def _set_pragmas(pragmas):
+    previous = {}
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}')
+            previous[name] = str(cursor.fetchone()[0])
+            cursor.execute(f'PRAGMA {name} = {value}')
+    return previous
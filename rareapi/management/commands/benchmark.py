@@ -0,0 +1,593 @@
+"""Management command that measures every endpoint in-process"""
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import threading
+import time
+import tracemalloc
+from collections import namedtuple
+from itertools import count
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection, connections, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework import renderers
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+from rareapi.models import Category, Comment, Post, RareUser, Tag
+from rareapi.projection import projection_for
+from rareapi.renderers import JSONRenderer, orjson
+from rareapi.views.comment import CommentSerializer
+from rareapi.views.post import PostSerializer
+from rareapi.views.rareuser import RareUserSerializer
+
+User = get_user_model()
+
+PASSWORD = 'benchmark'
+
+# url and data may be callables, called before each request and not timed,
+# for endpoints that need a fresh row or a unique value every time
+Endpoint = namedtuple('Endpoint', ['name', 'method', 'url', 'data'])
+
+
+class Command(BaseCommand):
+    help = ('Call every endpoint through the full middleware stack, in this '
+            'process, and print latency percentiles, throughput, SQL query '
+            'counts and peak memory per endpoint as JSON. Rows the endpoints '
+            'write are rolled back. Run generate_data first for realistic volumes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int, default=50,
+            help='Timed requests per endpoint (default 50)')
+        parser.add_argument(
+            '--warmup', type=int, default=5,
+            help='Untimed requests per endpoint before timing (default 5)')
+        parser.add_argument(
+            '--endpoint', action='append', default=[], metavar='TEXT',
+            help='Only endpoints whose name contains TEXT (repeatable)')
+        parser.add_argument(
+            '--concurrent-writers', type=int, default=0, metavar='N',
+            help='Instead of the endpoint sweep, create comments from N threads at '
+                 'once, --iterations each, and report write throughput. These '
+                 'writes are committed, then deleted.')
+        parser.add_argument(
+            '--concurrent-readers', type=int, default=0, metavar='N',
+            help='Instead of the endpoint sweep, read posts, comments and rareusers '
+                 'through the ASGI handler from N clients at once, --iterations each, '
+                 'and report throughput. Run with RARE_ASYNC_READS=1 and =0 to compare '
+                 'the async views with the sync ones.')
+        parser.add_argument(
+            '--serialization', type=int, default=0, metavar='ROWS',
+            help='Instead of the endpoint sweep, turn ROWS posts, comments and rareusers '
+                 'into JSON with their serializers and with their projections, '
+                 '--iterations times each, and report CPU time per 1,000 rows.')
+        parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 2:
+            raise CommandError('--iterations must be at least 2')
+
+        report = {'meta': self.meta(options)}
+
+        # The test client talks to the "testserver" host
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            if options['concurrent_writers'] > 0:
+                report['concurrent_writes'] = self.concurrent_writes(
+                    options['concurrent_writers'], options['iterations'])
+            elif options['concurrent_readers'] > 0:
+                report['concurrent_reads'] = self.concurrent_reads(
+                    options['concurrent_readers'], options['iterations'], options['warmup'])
+            elif options['serialization'] > 0:
+                report['serialization'] = self.serialization(
+                    options['serialization'], options['iterations'], options['warmup'])
+            else:
+                report['endpoints'] = self.sweep(options)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as report_file:
+                report_file.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    def sweep(self, options):
+        """Measure each endpoint in turn inside a transaction that is rolled back
+
+        Returns:
+            list -- one dict per endpoint
+        """
+        results = []
+        with transaction.atomic():
+            client, endpoints = self.setup()
+            for endpoint in endpoints:
+                if options['endpoint'] and not any(
+                        text in endpoint.name for text in options['endpoint']):
+                    continue
+                result = self.measure(client, endpoint, options['iterations'], options['warmup'])
+                results.append(result)
+                self.stderr.write(
+                    f'{endpoint.name}: p50 {result["p50_ms"]}ms, '
+                    f'{result["queries"]} queries')
+            # Nothing the endpoints write is kept
+            transaction.set_rollback(True)
+        return results
+
+    def concurrent_writes(self, writers, iterations):
+        """Create comments from several threads, each with its own connection
+
+        Connections are handled as a WSGI server would at the end of each
+        request, so CONN_MAX_AGE decides whether they are reused.
+
+        Returns:
+            dict -- latency percentiles, writes per second and failures
+        """
+        user = User.objects.create_user(
+            username='benchmark-writers', password=PASSWORD, is_staff=True)
+        try:
+            token = Token.objects.create(user=user)
+            rareuser = RareUser.objects.create(user=user, bio='benchmark')
+            category = Category.objects.order_by('-id').first() or Category.objects.create(
+                label='benchmark')
+            post = Post.objects.create(
+                author=rareuser, category=category, title='benchmark',
+                image_url='http://localhost/', content='benchmark', approved=True)
+
+            timings = []
+            failures = []
+            lock = threading.Lock()
+            barrier = threading.Barrier(writers + 1)
+
+            def write():
+                client = APIClient(raise_request_exception=False)
+                client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+                mine = []
+                errors = 0
+                try:
+                    barrier.wait()
+                    for _index in range(iterations):
+                        started = time.perf_counter()
+                        response = client.post(
+                            '/comments', {'postId': post.id, 'content': 'benchmark'},
+                            format='json')
+                        mine.append(time.perf_counter() - started)
+                        if response.status_code >= 400:
+                            errors += 1
+                        close_old_connections()
+                finally:
+                    connections.close_all()
+                with lock:
+                    timings.extend(mine)
+                    failures.append(errors)
+
+            threads = [threading.Thread(target=write) for _index in range(writers)]
+            for thread in threads:
+                thread.start()
+            barrier.wait()
+            started = time.perf_counter()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+        finally:
+            # Cascades to everything created above
+            user.delete()
+
+        errors = sum(failures)
+        result = {
+            'writers': writers,
+            'requests': len(timings),
+            'errors': errors,
+            'writes_per_second': round((len(timings) - errors) / elapsed, 1),
+            **summarize(timings),
+        }
+        self.stderr.write(
+            f'{writers} writers: {result["writes_per_second"]} writes/s, '
+            f'p95 {result["p95_ms"]}ms, {errors} errors')
+        return result
+
+    def concurrent_reads(self, readers, iterations, warmup):
+        """Read the list and detail endpoints from many async clients at once
+
+        Requests go straight to Django's ASGI handler, as an ASGI server
+        would pass them, so each has its own thread for sync code.
+
+        Returns:
+            dict -- latency percentiles, requests per second and failures
+        """
+        user = User.objects.create_user(
+            username='benchmark-readers', password=PASSWORD, is_staff=True)
+        try:
+            token = Token.objects.create(user=user)
+            rareuser = RareUser.objects.create(user=user, bio='benchmark')
+            category = Category.objects.order_by('-id').first() or Category.objects.create(
+                label='benchmark')
+            post = Post.objects.create(
+                author=rareuser, category=category, title='benchmark',
+                image_url='http://localhost/', content='benchmark', approved=True)
+            comment = Comment.objects.create(post=post, author=rareuser, content='benchmark')
+            other_post = Post.objects.exclude(pk=post.pk).order_by('-id').first() or post
+            other_comment = Comment.objects.exclude(pk=comment.pk).order_by('-id').first() or comment
+            other_rareuser = RareUser.objects.exclude(pk=rareuser.pk).order_by('-id').first() or rareuser
+            urls = [
+                '/posts', f'/posts/{other_post.id}', '/comments',
+                f'/comments/{other_comment.id}', '/rareusers',
+                f'/rareusers/{other_rareuser.id}', '/myprofile',
+            ]
+            timings, errors, elapsed = asyncio.run(
+                read_concurrently(token.key, urls, readers, iterations, warmup))
+        finally:
+            # Cascades to everything created above
+            user.delete()
+
+        result = {
+            'readers': readers,
+            'async_reads': settings.ASYNC_READS,
+            'requests': len(timings),
+            'errors': errors,
+            'requests_per_second': round((len(timings) - errors) / elapsed, 1),
+            **summarize(timings),
+        }
+        self.stderr.write(
+            f'{readers} readers: {result["requests_per_second"]} requests/s, '
+            f'p95 {result["p95_ms"]}ms, {errors} errors')
+        return result
+
+    def serialization(self, rows, iterations, warmup):
+        """CPU time of list pages' JSON, from serializers and from projections
+
+        Returns:
+            list -- one dict per serializer
+        """
+        request = Request(RequestFactory().get('/'))
+        results = []
+        for serializer_class in (PostSerializer, CommentSerializer, RareUserSerializer):
+            result = self.measure_serialization(
+                serializer_class, request, rows, iterations, warmup)
+            if result is None:
+                continue
+            results.append(result)
+            self.stderr.write(
+                f'{result["serializer"]}: serializing '
+                f'{result["serializer_serialize_cpu_ms_per_1000_rows"]}ms -> '
+                f'{result["projection_serialize_cpu_ms_per_1000_rows"]}ms per 1,000 rows '
+                f'({result["serialize_speedup"]}x, {result["total_speedup"]}x with reading)')
+        return results
+
+    def measure_serialization(self, serializer_class, request, rows, iterations, warmup):
+        """Read and serialize the first rows of one serializer's model both ways
+
+        Each way reads the rows, then serializes and renders them as a list
+        response does: model instances through the serializer and DRF's
+        renderer, or values_list() rows through the projection and
+        rareapi's renderer. The projection's serialization includes its
+        queries for nested lists, which the serializers have prefetched
+        while reading. The bytes have to match.
+
+        Returns:
+            dict -- the serializer's row of the report, None without rows
+        """
+        model = serializer_class.Meta.model
+        queryset = serializer_class.setup_eager_loading(
+            model.objects.order_by('pk'), request)[:rows]
+        projection = projection_for(serializer_class, request)
+        read = queryset.count()
+        if not read:
+            return None
+
+        def serialize(instances):
+            serializer = serializer_class(instances, many=True, context={'request': request})
+            return renderers.JSONRenderer().render(serializer.data)
+
+        def project(rows):
+            return JSONRenderer().render(projection.data(rows))
+
+        ways = {
+            'serializer': (lambda: list(queryset.all()), serialize),
+            'projection': (lambda: list(projection.queryset(queryset)), project),
+        }
+        if serialize(list(queryset.all())) != project(list(projection.queryset(queryset))):
+            raise CommandError(f'{serializer_class.__name__} and its projection differ')
+
+        result = {'serializer': serializer_class.__name__, 'rows': read,
+                  'orjson': orjson is not None}
+        for name, (fetch, render) in ways.items():
+            reading, rendering = cpu_times(fetch, render, iterations, warmup)
+            result[f'{name}_read_cpu_ms_per_1000_rows'] = round(reading * 1e6 / read, 3)
+            result[f'{name}_serialize_cpu_ms_per_1000_rows'] = round(rendering * 1e6 / read, 3)
+        result['serialize_speedup'] = round(
+            result['serializer_serialize_cpu_ms_per_1000_rows']
+            / result['projection_serialize_cpu_ms_per_1000_rows'], 2)
+        result['total_speedup'] = round(
+            (result['serializer_read_cpu_ms_per_1000_rows']
+             + result['serializer_serialize_cpu_ms_per_1000_rows'])
+            / (result['projection_read_cpu_ms_per_1000_rows']
+               + result['projection_serialize_cpu_ms_per_1000_rows']), 2)
+        return result
+
+    def meta(self, options):
+        """What the numbers were measured on, to tell runs apart"""
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'started': timezone.now().isoformat(),
+            'commit': commit,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'db_profile': getattr(settings, 'DB_PROFILE', None),
+            'async_reads': settings.ASYNC_READS,
+            'debug': settings.DEBUG,
+            'iterations': options['iterations'],
+            'warmup': options['warmup'],
+            'rows': {
+                model._meta.model_name: model.objects.count()
+                for model in (RareUser, Category, Tag, Post, Comment)
+            },
+        }
+
+    def setup(self):
+        """Create the staff user and rows the endpoints act on
+
+        Returns:
+            tuple -- (authenticated client, list of Endpoint)
+        """
+        user = User.objects.create_user(
+            username='benchmark', password=PASSWORD, email='benchmark@example.com',
+            is_staff=True)
+        token = Token.objects.create(user=user)
+        rareuser = RareUser.objects.create(user=user, bio='benchmark')
+        category = Category.objects.order_by('-id').first() or Category.objects.create(
+            label='benchmark')
+        tag = Tag.objects.order_by('-id').first() or Tag.objects.create(label='benchmark')
+        post = Post.objects.create(
+            author=rareuser, category=category, title='benchmark',
+            image_url='http://localhost/', content='benchmark', approved=True)
+        comment = Comment.objects.create(post=post, author=rareuser, content='benchmark')
+        # Existing rows, so reads see realistic nesting when there is data
+        other_post = Post.objects.exclude(pk=post.pk).order_by('-id').first() or post
+        other_rareuser = RareUser.objects.exclude(pk=rareuser.pk).order_by('-id').first() or rareuser
+        search_word = other_post.title.split()[0] if other_post.title.split() else 'benchmark'
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        post_data = {
+            'title': 'benchmark', 'publication_date': timezone.now().isoformat(),
+            'image_url': 'http://localhost/', 'content': 'benchmark',
+            'category_id': category.id,
+        }
+        comment_data = {'postId': post.id, 'content': 'benchmark'}
+        serial = count()
+
+        def new_post():
+            created = Post.objects.create(
+                author=rareuser, category=category, title='benchmark',
+                image_url='http://localhost/', content='benchmark')
+            return f'/posts/{created.id}'
+
+        def new_comment():
+            created = Comment.objects.create(post=post, author=rareuser, content='benchmark')
+            return f'/comments/{created.id}'
+
+        def new_category():
+            return f'/categories/{Category.objects.create(label="benchmark").id}'
+
+        def new_tag():
+            return f'/tags/{Tag.objects.create(label="benchmark").id}'
+
+        def registration():
+            return {
+                'username': f'benchmark-{next(serial)}', 'email': 'benchmark@example.com',
+                'password': PASSWORD, 'first_name': 'Bench', 'last_name': 'Mark',
+                'bio': 'benchmark', 'profile_image_url': 'http://localhost/',
+            }
+
+        endpoints = [
+            Endpoint('GET /posts', 'get', '/posts', None),
+            Endpoint('GET /posts?paginate=cursor', 'get', '/posts?paginate=cursor', None),
+            Endpoint('GET /posts?authorId=', 'get', f'/posts?authorId={other_post.author_id}', None),
+            Endpoint('GET /posts?q=', 'get', f'/posts?q={search_word}', None),
+            Endpoint('GET /posts?tag=', 'get', f'/posts?tag={tag.id}', None),
+            Endpoint('GET /posts?ordering=-last_comment_at', 'get',
+                     '/posts?ordering=-last_comment_at', None),
+            Endpoint('GET /posts?fields=id,title,publication_date', 'get',
+                     '/posts?fields=id,title,publication_date', None),
+            Endpoint('GET /posts/{id}', 'get', f'/posts/{other_post.id}', None),
+            Endpoint('POST /posts', 'post', '/posts', post_data),
+            Endpoint('PUT /posts/{id}', 'put', f'/posts/{post.id}', post_data),
+            Endpoint('PATCH /posts/{id}', 'patch', f'/posts/{post.id}', {'title': 'benchmark'}),
+            Endpoint('DELETE /posts/{id}', 'delete', new_post, None),
+            Endpoint('GET /posts/unapproved', 'get', '/posts/unapproved', None),
+            Endpoint('PUT /posts/{id}/approve', 'put', f'/posts/{post.id}/approve', None),
+            Endpoint('POST /posts/moderate', 'post', '/posts/moderate',
+                     {'decision': 'approve', 'ids': [post.id]}),
+            Endpoint('GET /comments', 'get', '/comments', None),
+            Endpoint('GET /comments?postId=', 'get', f'/comments?postId={other_post.id}', None),
+            Endpoint('GET /comments/{id}', 'get', f'/comments/{comment.id}', None),
+            Endpoint('POST /comments', 'post', '/comments', comment_data),
+            Endpoint('PUT /comments/{id}', 'put', f'/comments/{comment.id}', comment_data),
+            Endpoint('PATCH /comments/{id}', 'patch', f'/comments/{comment.id}',
+                     {'content': 'benchmark'}),
+            Endpoint('DELETE /comments/{id}', 'delete', new_comment, None),
+            Endpoint('GET /rareusers', 'get', '/rareusers', None),
+            Endpoint('GET /rareusers/{id}', 'get', f'/rareusers/{other_rareuser.id}', None),
+            Endpoint('GET /categories', 'get', '/categories', None),
+            Endpoint('GET /categories/{id}', 'get', f'/categories/{category.id}', None),
+            Endpoint('POST /categories', 'post', '/categories', {'label': 'benchmark'}),
+            Endpoint('PUT /categories/{id}', 'put', f'/categories/{category.id}',
+                     {'label': category.label}),
+            Endpoint('DELETE /categories/{id}', 'delete', new_category, None),
+            Endpoint('GET /tags', 'get', '/tags', None),
+            Endpoint('GET /tags/{id}', 'get', f'/tags/{tag.id}', None),
+            Endpoint('POST /tags', 'post', '/tags', {'label': 'benchmark'}),
+            Endpoint('PUT /tags/{id}', 'put', f'/tags/{tag.id}', {'label': tag.label}),
+            Endpoint('DELETE /tags/{id}', 'delete', new_tag, None),
+            Endpoint('GET /myprofile', 'get', '/myprofile', None),
+            Endpoint('POST /login', 'post', '/login',
+                     {'username': user.username, 'password': PASSWORD}),
+            Endpoint('POST /register', 'post', '/register', registration),
+        ]
+        return client, endpoints
+
+    def measure(self, client, endpoint, iterations, warmup):
+        """Time one endpoint
+
+        Every timed request runs with its queries captured. One more
+        request runs under tracemalloc, which would skew the timings.
+
+        Returns:
+            dict -- the endpoint's row of the report
+        """
+        def call():
+            url = endpoint.url() if callable(endpoint.url) else endpoint.url
+            data = endpoint.data() if callable(endpoint.data) else endpoint.data
+            return lambda: getattr(client, endpoint.method)(url, data, format='json')
+
+        for _index in range(warmup):
+            self.check_status(endpoint, call()())
+
+        timings = []
+        queries = []
+        for _index in range(iterations):
+            request = call()
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                response = request()
+                timings.append(time.perf_counter() - started)
+            self.check_status(endpoint, response)
+            queries.append(len(ctx.captured_queries))
+
+        request = call()
+        tracemalloc.start()
+        try:
+            baseline = tracemalloc.get_traced_memory()[0]
+            self.check_status(endpoint, request())
+            peak = tracemalloc.get_traced_memory()[1] - baseline
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'endpoint': endpoint.name,
+            **summarize(timings),
+            'requests_per_second': round(len(timings) / sum(timings), 1),
+            'queries': round(statistics.fmean(queries), 1),
+            'peak_memory_kib': round(peak / 1024, 1),
+        }
+
+    @staticmethod
+    def check_status(endpoint, response):
+        if response.status_code >= 400:
+            raise CommandError(f'{endpoint.name} answered {response.status_code}')
+
+
+async def read_concurrently(key, urls, readers, iterations, warmup):
+    """GET urls round robin from readers concurrent clients
+
+    Returns:
+        tuple -- (request timings, failed requests, seconds elapsed)
+    """
+    application = ASGIHandler()
+    timings = []
+    failures = []
+
+    async def read(offset):
+        errors = 0
+        for index in range(iterations):
+            started = time.perf_counter()
+            status = await asgi_get(application, urls[(offset + index) % len(urls)], key)
+            timings.append(time.perf_counter() - started)
+            if status >= 400:
+                errors += 1
+        failures.append(errors)
+
+    for _index in range(warmup):
+        for url in urls:
+            await asgi_get(application, url, key)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(read(offset) for offset in range(readers)))
+    return timings, sum(failures), time.perf_counter() - started
+
+
+async def asgi_get(application, url, key):
+    """Send one GET through an ASGI application, as a server would
+
+    Returns:
+        int -- response status code
+    """
+    path, _separator, query = url.partition('?')
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'query_string': query.encode(), 'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'authorization', f'Token {key}'.encode())],
+        'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+    }
+    finished = asyncio.Event()
+    received = []
+    status = []
+
+    async def receive():
+        if not received:
+            received.append(True)
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # The client stays connected until the whole response is sent
+        await finished.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+        elif not message.get('more_body', False):
+            finished.set()
+
+    await application(scope, receive, send)
+    return status[0]
+
+
+def cpu_times(fetch, render, iterations, warmup):
+    """Median CPU seconds of this process spent in fetch() and in render(fetch())
+
+    Returns:
+        tuple -- (reading, rendering)
+    """
+    for _index in range(warmup):
+        render(fetch())
+    reading = []
+    rendering = []
+    for _index in range(iterations):
+        started = time.process_time()
+        fetched = fetch()
+        read = time.process_time()
+        render(fetched)
+        reading.append(read - started)
+        rendering.append(time.process_time() - read)
+    return statistics.median(reading), statistics.median(rendering)
+
+
+def summarize(timings):
+    """Latency percentiles of request timings in seconds
+
+    Returns:
+        dict -- p50/p95/p99, mean and max in milliseconds
+    """
+    cuts = statistics.quantiles(timings, n=100, method='inclusive')
+    return {
+        'p50_ms': round(cuts[49] * 1000, 3),
+        'p95_ms': round(cuts[94] * 1000, 3),
+        'p99_ms': round(cuts[98] * 1000, 3),
+        'mean_ms': round(statistics.fmean(timings) * 1000, 3),
+        'max_ms': round(max(timings) * 1000, 3),
+    }
@@ -0,0 +1,228 @@
+"""Management command that loads large JSON, NDJSON or CSV dumps"""
+import csv
+import json
+import os
+import time
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, transaction
+from rest_framework.authtoken.models import Token
+from rareapi import activity
+from rareapi.caching import bump_version
+from rareapi.loading import RowWriter, bulk_load_pragmas
+from rareapi.models import (Category, Comment, LoadCheckpoint, Post, PostTag,
+                            RareUser, Tag)
+
+User = get_user_model()
+
+LOADABLE = {
+    'user': User,
+    'token': Token,
+    'rareuser': RareUser,
+    'category': Category,
+    'tag': Tag,
+    'post': Post,
+    'posttag': PostTag,
+    'comment': Comment,
+}
+
+# Cached responses that may include rows of each model
+NAMESPACES = {
+    'user': 'rareuser',
+    'rareuser': 'rareuser',
+    'category': 'category',
+    'tag': 'tag',
+    'post': 'post',
+    'posttag': 'post',
+    'comment': 'post',
+}
+
+FORMATS = {'.json': 'json', '.ndjson': 'ndjson', '.jsonl': 'ndjson', '.csv': 'csv'}
+
+# Bytes read from a JSON array at a time
+READ_SIZE = 1 << 16
+
+
+def read_json_array(stream):
+    """Yield the objects of a top level JSON array without reading it whole
+
+    Yields:
+        dict -- one element of the array
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, position, eof
+        chunk = stream.read(READ_SIZE)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+    def skip(characters):
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in characters:
+                position += 1
+            if position < len(buffer) or eof:
+                return
+            fill()
+
+    fill()
+    skip(' \t\r\n')
+    if buffer[position:position + 1] != '[':
+        raise CommandError('Expected a JSON array')
+    position += 1
+
+    while True:
+        skip(' \t\r\n,')
+        if position >= len(buffer):
+            raise CommandError('Unterminated JSON array')
+        if buffer[position] == ']':
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as ex:
+            if eof:
+                raise CommandError(f'Invalid JSON: {ex}') from ex
+            fill()
+            continue
+        yield item
+
+
+def read_ndjson(stream):
+    """Yield one object per non-blank line"""
+    for number, line in enumerate(stream, start=1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as ex:
+                raise CommandError(f'Invalid JSON on line {number}: {ex}') from ex
+
+
+def read_csv(stream):
+    """Yield one dict per row; empty cells count as missing"""
+    for row in csv.DictReader(stream):
+        yield {name: value for name, value in row.items() if value != ''}
+
+
+READERS = {'json': read_json_array, 'ndjson': read_ndjson, 'csv': read_csv}
+
+
+class Command(BaseCommand):
+    help = ('Stream a JSON array, NDJSON or CSV file of one model into the '
+            'database in batched transactions. Accepts fixture records '
+            '({"model", "pk", "fields"}) or flat ones, resumes an interrupted '
+            'load of the same file and reports rows per second.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=sorted(LOADABLE))
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format', choices=sorted(READERS),
+            help='Input format; guessed from the file extension by default')
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Rows per INSERT and per transaction (default 5000)')
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Ignore the checkpoint of an earlier load of this file')
+        parser.add_argument(
+            '--no-pragmas', action='store_true',
+            help="Keep the connection's SQLite settings during the load")
+
+    def handle(self, *args, **options):
+        model = LOADABLE[options['model']]
+        path = os.path.abspath(options['path'])
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        file_format = options['format'] or FORMATS.get(os.path.splitext(path)[1].lower())
+        if file_format is None:
+            raise CommandError('Unknown file extension, pass --format')
+
+        checkpoint, _created = LoadCheckpoint.objects.get_or_create(
+            source=path, model=options['model'])
+        if options['restart']:
+            checkpoint.rows = 0
+            checkpoint.finished = False
+            checkpoint.save()
+        elif checkpoint.finished:
+            raise CommandError(
+                f'{path} was already loaded; pass --restart to load it again')
+        elif checkpoint.rows:
+            self.stdout.write(f'Resuming after {checkpoint.rows} rows')
+
+        with bulk_load_pragmas(not options['no_pragmas']), \
+                open(path, newline='' if file_format == 'csv' else None,
+                     encoding='utf-8') as stream:
+            writer = RowWriter(model)
+            loaded, elapsed = self.load(
+                writer, READERS[file_format](stream), checkpoint, batch_size)
+
+        checkpoint.finished = True
+        checkpoint.save()
+        writer.reset_sequence()
+        if options['model'] in NAMESPACES:
+            bump_version(NAMESPACES[options['model']])
+
+        rate = loaded / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Loaded {loaded} {options["model"]} rows in {elapsed:.1f}s '
+            f'({rate:,.0f} rows/s), {checkpoint.rows} in total'))
+
+        if options['model'] == 'comment' and loaded:
+            # Raw inserts skip the post comment counters
+            checked, fixed = activity.rebuild()
+            self.stdout.write(f'Recounted comments of {fixed} of {checked} posts')
+
+    def load(self, writer, records, checkpoint, batch_size):
+        """Insert records after the checkpoint, one transaction per batch
+
+        Returns:
+            tuple -- (rows inserted, seconds spent)
+        """
+        # Records committed by an earlier run of this load
+        resume_after = checkpoint.rows
+        skipped = 0
+        loaded = 0
+        batch = []
+        started = time.monotonic()
+
+        def flush():
+            nonlocal loaded
+            first = checkpoint.rows + 1
+            try:
+                with transaction.atomic():
+                    writer.insert(batch)
+                    checkpoint.rows += len(batch)
+                    checkpoint.save(update_fields=['rows', 'updated_at'])
+            except DatabaseError as ex:
+                checkpoint.refresh_from_db()
+                raise CommandError(
+                    f'Rows {first}-{first + len(batch) - 1} were not loaded: {ex}') from ex
+            loaded += len(batch)
+            batch.clear()
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'{checkpoint.rows} rows ({loaded / elapsed:,.0f} rows/s)')
+
+        for record in records:
+            if skipped < resume_after:
+                skipped += 1
+                continue
+            try:
+                batch.append(writer.row(record))
+            except (ValidationError, TypeError, ValueError) as ex:
+                raise CommandError(
+                    f'Row {checkpoint.rows + len(batch) + 1} is invalid: {ex}') from ex
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+
+        return loaded, time.monotonic() - started
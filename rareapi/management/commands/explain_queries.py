@@ -0,0 +1,199 @@
+"""Management command that checks the query plans behind every endpoint"""
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import resolve
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+from rareapi.models import Category, Comment, Post, RareUser, Tag
+
+User = get_user_model()
+
+# Scans that are there by design, by table (a scan of its rows) or by
+# index (a walk over the whole index). Anything else that SQLite reads
+# row by row instead of searching for is a regression.
+ALLOWED_SCANS = {
+    # Admin-managed lookup tables with a handful of rows
+    'rareapi_category', 'rareapi_tag',
+    # Conditional GET: newest updated_at and row count of the listing
+    'post_live_updated_idx', 'comment_updated_post_idx',
+    # Offset pagination counts the rows it pages through
+    'rareuser_live_created_idx',
+    # Ordered listings walk their index only until the page is full
+    'post_pubdate_id_idx', 'post_last_comment_idx', 'post_pending_pubdate_idx',
+    'comment_created_id_idx',
+    # /metrics: jobs per status
+    'job_status_finished_idx',
+}
+
+
+class Command(BaseCommand):
+    help = ('Call every endpoint against throwaway rows, run EXPLAIN QUERY PLAN '
+            'on the SQL it issues and fail if any statement scans a whole table '
+            'or index that is not on the allowed list.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--allow-scan', action='append', default=[], metavar='NAME',
+            help='Table or index that may be scanned in full (repeatable)')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('EXPLAIN QUERY PLAN is SQLite specific')
+
+        allowed = ALLOWED_SCANS | set(options['allow_scan'])
+        failures = []
+
+        # Nothing the endpoints write here is kept. The request factory
+        # talks to the "testserver" host, which pagination links need.
+        with transaction.atomic(), override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for label, sql in self.captured_queries():
+                scans = [
+                    scan for scan in self.full_scans(sql)
+                    if scan.split()[-1] not in allowed
+                ]
+                if scans:
+                    failures.append((label, sql, scans))
+            transaction.set_rollback(True)
+
+        for label, sql, scans in failures:
+            self.stdout.write(self.style.ERROR(
+                f'{label}: full scan of {", ".join(scans)}'))
+            self.stdout.write(f'    {sql}')
+
+        if failures:
+            raise CommandError(f'{len(failures)} queries scan a whole table or index')
+        self.stdout.write(self.style.SUCCESS('No full scans beyond the allowed ones'))
+
+    def captured_queries(self):
+        """Call each endpoint and yield the statements it ran
+
+        Yields:
+            tuple -- (endpoint label, sql with its parameters inlined)
+        """
+        user = User.objects.create_user(
+            username='explain-queries', password='explain-queries', is_staff=True)
+        token = Token.objects.create(user=user)
+        rareuser = RareUser.objects.create(user=user, bio='')
+        category = Category.objects.create(label='explain')
+        tag = Tag.objects.create(label='explain')
+        post = Post.objects.create(
+            author=rareuser, category=category, title='explain',
+            image_url='http://localhost/', content='explain')
+        comment = Comment.objects.create(post=post, author=rareuser, content='explain')
+
+        post_data = {
+            'title': 'explain', 'publication_date': post.publication_date,
+            'image_url': 'http://localhost/', 'content': 'explain',
+            'category_id': category.id,
+        }
+        comment_data = {'postId': post.id, 'content': 'explain'}
+
+        endpoints = [
+            ('get', '/posts', None),
+            ('get', f'/posts?authorId={rareuser.id}', None),
+            ('get', '/posts?paginate=cursor', None),
+            ('get', '/posts?q=explain', None),
+            ('get', f'/posts?tag={tag.id}', None),
+            ('get', f'/posts?tag={tag.id}&tagMatch=all', None),
+            ('get', '/posts?ordering=-last_comment_at', None),
+            ('get', '/posts?fields=id,title,publication_date', None),
+            ('get', '/comments?fields=id,author&expand=author', None),
+            ('get', f'/posts/{post.id}', None),
+            ('get', '/posts/unapproved', None),
+            ('post', '/posts', post_data),
+            ('put', f'/posts/{post.id}', post_data),
+            ('patch', f'/posts/{post.id}', {'title': 'explain', 'version': 2}),
+            ('put', f'/posts/{post.id}/approve', None),
+            ('post', '/posts/moderate', {'decision': 'approve', 'authorId': rareuser.id}),
+            ('post', f'/posts/{post.id}/tags', {'tag_ids': [tag.id]}),
+            ('delete', f'/posts/{post.id}/tags', {'tag_ids': [tag.id]}),
+            ('get', '/comments', None),
+            ('get', f'/comments?postId={post.id}', None),
+            ('get', '/comments?paginate=cursor', None),
+            ('get', f'/comments/{comment.id}', None),
+            ('post', '/comments', comment_data),
+            ('put', f'/comments/{comment.id}', comment_data),
+            ('patch', f'/comments/{comment.id}', {'content': 'explain'}),
+            ('get', '/rareusers', None),
+            ('get', '/rareusers?paginate=cursor', None),
+            ('get', f'/rareusers/{rareuser.id}', None),
+            ('get', '/categories', None),
+            ('get', f'/categories/{category.id}', None),
+            ('put', f'/categories/{category.id}', {'label': 'explain'}),
+            ('patch', f'/categories/{category.id}', {'label': 'explain'}),
+            ('get', '/tags', None),
+            ('get', f'/tags/{tag.id}', None),
+            ('put', f'/tags/{tag.id}', {'label': 'explain'}),
+            ('patch', f'/tags/{tag.id}', {'label': 'explain'}),
+            ('get', '/myprofile', None),
+            ('get', '/metrics', None),
+            ('post', '/login', {'username': user.username, 'password': 'explain-queries'}),
+            ('delete', f'/comments/{comment.id}', None),
+            ('delete', f'/posts/{post.id}', None),
+            ('delete', f'/categories/{category.id}', None),
+            ('delete', f'/tags/{tag.id}', None),
+        ]
+
+        factory = APIRequestFactory()
+        for method, url, data in endpoints:
+            request = getattr(factory, method)(
+                url, data, format='json', HTTP_AUTHORIZATION=f'Token {token.key}')
+            match = resolve(url.split('?')[0])
+            view = match.func
+            if iscoroutinefunction(view):
+                # With ASYNC_READS; the sync parts run back on this thread
+                view = async_to_sync(view)
+
+            with CaptureQueriesContext(connection) as ctx:
+                response = view(request, *match.args, **match.kwargs)
+                if hasattr(response, 'render'):
+                    response.render()
+
+            if response.status_code >= 400:
+                raise CommandError(
+                    f'{method.upper()} {url} answered {response.status_code}')
+
+            for query in ctx.captured_queries:
+                yield f'{method.upper()} {url}', query['sql']
+
+    def full_scans(self, sql):
+        """Tables and indexes the statement walks from end to end
+
+        Returns:
+            list -- "table t" for a table (or alias) read row by row,
+                    "index i" for one walked instead of searched
+        """
+        keyword = sql.lstrip().split(None, 1)[0].upper()
+        if keyword not in ('SELECT', 'UPDATE', 'DELETE'):
+            return []
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = [row[3] for row in cursor.fetchall()]
+
+        scans = []
+        for detail in plan:
+            # "SCAN t" on SQLite >= 3.36, "SCAN TABLE t" before that
+            words = detail.split()
+            if words[0] != 'SCAN':
+                continue
+            # Virtual tables report the constraints they were handed as
+            # "INDEX <num>:<idxStr>"; an empty idxStr means no constraint
+            if 'VIRTUAL' in words:
+                if words[-1].endswith(':'):
+                    scans.append(f'table {words[1]}')
+                continue
+            if 'USING' in words and words[-2] == 'INDEX':
+                # "USING [COVERING] INDEX i"; a scan "USING INTEGER PRIMARY
+                # KEY" walks the table itself
+                scans.append(f'index {words[-1]}')
+                continue
+            table = words[2] if words[1] == 'TABLE' else words[1]
+            if table not in ('CONSTANT', 'SUBQUERY'):
+                scans.append(f'table {table}')
+        return scans
@@ -0,0 +1,221 @@
+"""Management command that fills the database with reproducible fake data"""
+import random
+import time
+from datetime import timedelta, timezone as dt_timezone
+from itertools import accumulate
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+from rest_framework.authtoken.models import Token
+from rareapi.caching import bump_version
+from rareapi.loading import RowWriter, bulk_load_pragmas
+from rareapi.models import Category, Comment, Post, PostTag, RareUser, Tag
+
+User = get_user_model()
+
+# Insert order; later models point at earlier ones
+MODELS = [User, Token, RareUser, Category, Tag, Post, PostTag, Comment]
+
+SYLLABLES = [
+    'ba', 'be', 'bo', 'ca', 'co', 'da', 'de', 'di', 'fa', 'fe', 'ga', 'go',
+    'ha', 'he', 'ka', 'ki', 'la', 'le', 'li', 'lo', 'ma', 'me', 'mi', 'mo',
+    'na', 'ne', 'no', 'pa', 'pe', 'po', 'ra', 're', 'ri', 'ro', 'sa', 'se',
+    'si', 'so', 'ta', 'te', 'ti', 'to', 'va', 've', 'wa', 'ya', 'za', 'zo',
+]
+VOCABULARY_SIZE = 5000
+# Dates are fixed rather than relative to today so every run matches
+DEFAULT_END = '2024-01-01T00:00:00Z'
+
+
+class Command(BaseCommand):
+    help = ('Generate users, categories, tags, posts and comments in realistic '
+            'proportions. The same --seed always yields the same rows, so '
+            'benchmark runs on different commits see the same data.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument(
+            '--posts-per-user', type=float, default=10,
+            help='Average posts per user; a few users write most of them')
+        parser.add_argument(
+            '--comments-per-post', type=float, default=5,
+            help='Average comments per post')
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--tags', type=int, default=30)
+        parser.add_argument(
+            '--tags-per-post', type=int, default=2, help='Most tags on one post')
+        parser.add_argument(
+            '--days', type=int, default=730, help='Days of history to spread posts over')
+        parser.add_argument(
+            '--end', default=DEFAULT_END,
+            help=f'Latest generated date, ISO 8601 (default {DEFAULT_END})')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--password', default='password', help='Password of every generated user')
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Rows per transaction (default 5000)')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['categories'] < 1:
+            raise CommandError('--users and --categories must be at least 1')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        end = parse_datetime(options['end'])
+        if end is None:
+            raise CommandError('--end must be an ISO 8601 datetime')
+        if end.tzinfo is None:
+            end = end.replace(tzinfo=dt_timezone.utc)
+
+        self.rng = random.Random(options['seed'])
+        self.vocabulary = self.make_vocabulary()
+        self.cum_weights = list(accumulate(1 / rank for rank in range(1, VOCABULARY_SIZE + 1)))
+        self.writers = {model: RowWriter(model) for model in MODELS}
+        self.pending = {model: [] for model in MODELS}
+        self.queued = 0
+        self.counts = {model: 0 for model in MODELS}
+        self.batch_size = options['batch_size']
+        self.next_ids = {
+            model: (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+            for model in MODELS if model is not Token
+        }
+
+        started = time.monotonic()
+        with bulk_load_pragmas():
+            self.generate(end, options)
+            self.flush()
+            for writer in self.writers.values():
+                writer.reset_sequence()
+
+        for namespace in ('category', 'tag', 'post', 'rareuser'):
+            bump_version(namespace)
+
+        elapsed = time.monotonic() - started
+        total = sum(self.counts.values())
+        for model, count in self.counts.items():
+            self.stdout.write(f'{model._meta.label}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {total} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)'))
+
+    def generate(self, now, options):
+        """Queue every row, parents before children"""
+        rng = self.rng
+        start = now - timedelta(days=options['days'])
+        span = (now - start).total_seconds()
+
+        category_ids = [
+            self.add(Category, label=self.words(1, 2).title()[:50])
+            for _index in range(options['categories'])
+        ]
+        tag_ids = [
+            self.add(Tag, label=self.words(1, 2)[:50])
+            for _index in range(options['tags'])
+        ]
+
+        password = make_password(options['password'])
+        authors = []
+        for index in range(options['users']):
+            joined = start + timedelta(seconds=rng.random() * span * 0.5)
+            first_name, last_name = self.words(1, 1).title(), self.words(1, 1).title()
+            user_id = self.add(
+                User, password=password, username=f'{first_name.lower()}{self.next_ids[User]}',
+                first_name=first_name, last_name=last_name,
+                email=f'{first_name.lower()}.{last_name.lower()}@example.com',
+                # The first user can moderate, for the staff-only endpoints
+                is_staff=index == 0, is_superuser=False, is_active=True,
+                date_joined=joined)
+            self.add(Token, key=f'{rng.getrandbits(160):040x}', user=user_id, created=joined)
+            authors.append((self.add(
+                RareUser, user=user_id, bio=self.sentence()[:500], created_on=joined,
+                active=True,
+                profile_image_url=f'https://picsum.photos/seed/{user_id}/200'), joined))
+
+        author_ids = [author_id for author_id, _joined in authors]
+        for author_id, joined in authors:
+            # Exponential: most users write little, a few write a lot
+            for _index in range(int(rng.expovariate(1 / options['posts_per_user']))
+                                if options['posts_per_user'] > 0 else 0):
+                published = joined + timedelta(
+                    seconds=rng.random() * (now - joined).total_seconds())
+                post = dict(
+                    author=author_id, category=rng.choice(category_ids),
+                    title=self.words(3, 10).capitalize()[:100], publication_date=published,
+                    image_url=f'https://picsum.photos/seed/post{self.next_ids[Post]}/800/400',
+                    content=self.paragraphs(), approved=rng.random() < 0.8,
+                    updated_at=published)
+                tags = rng.sample(
+                    tag_ids, min(len(tag_ids), rng.randint(0, options['tags_per_post'])))
+
+                comments = []
+                if options['comments_per_post'] > 0:
+                    for _comment in range(int(rng.expovariate(1 / options['comments_per_post']))):
+                        commented = published + timedelta(
+                            seconds=rng.random() * (now - published).total_seconds())
+                        comments.append(dict(
+                            author=rng.choice(author_ids), content=self.sentence()[:250],
+                            created_on=commented, updated_at=commented))
+
+                # Comments are drawn first so the post row carries their count
+                post_id = self.add(
+                    Post, **post, comment_count=len(comments),
+                    last_comment_at=max(
+                        (comment['created_on'] for comment in comments), default=None))
+                for tag_id in tags:
+                    self.add(PostTag, post=post_id, tag=tag_id)
+                for comment in comments:
+                    self.add(Comment, post=post_id, **comment)
+
+    def add(self, model, **values):
+        """Queue one row, flushing every model once batch_size rows wait
+
+        Returns:
+            int -- the id given to the row, or its key for tokens
+        """
+        if model is Token:
+            pk = values['key']
+        else:
+            pk = values['id'] = self.next_ids[model]
+            self.next_ids[model] += 1
+        self.pending[model].append(self.writers[model].row(values))
+        self.queued += 1
+        if self.queued >= self.batch_size:
+            self.flush()
+        return pk
+
+    def flush(self):
+        """Insert everything queued in one transaction, parents first"""
+        with transaction.atomic():
+            for model in MODELS:
+                rows = self.pending[model]
+                if rows:
+                    self.writers[model].insert(rows)
+                    self.counts[model] += len(rows)
+                    self.pending[model] = []
+        self.queued = 0
+
+    def make_vocabulary(self):
+        """Distinct made up words, most common first"""
+        words = []
+        seen = set()
+        while len(words) < VOCABULARY_SIZE:
+            word = ''.join(self.rng.choices(SYLLABLES, k=self.rng.randint(1, 4)))
+            if word not in seen:
+                seen.add(word)
+                words.append(word)
+        return words
+
+    def words(self, least, most):
+        """Space separated words with a Zipf-like frequency"""
+        return ' '.join(self.rng.choices(
+            self.vocabulary, cum_weights=self.cum_weights, k=self.rng.randint(least, most)))
+
+    def sentence(self):
+        return self.words(4, 18).capitalize() + '.'
+
+    def paragraphs(self):
+        return '\n\n'.join(
+            ' '.join(self.sentence() for _sentence in range(self.rng.randint(2, 6)))
+            for _paragraph in range(self.rng.randint(1, 5)))
@@ -0,0 +1,45 @@
+"""Management command that removes soft deleted rows and their dependents"""
+import time
+from django.core.management.base import BaseCommand, CommandError
+from rareapi import purge
+
+
+class Command(BaseCommand):
+    help = ('Remove the categories, posts and rareusers DELETE requests marked '
+            'deleted, with their posts, comments and tags, in small batches. '
+            'Safe to run while the site is up; run it from cron.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=purge.BATCH_SIZE,
+            help=f'Rows per statement and per transaction (default {purge.BATCH_SIZE})')
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Seconds to sleep between batches (default 0)')
+        parser.add_argument(
+            '--status', action='store_true',
+            help='Only report how many deleted rows are waiting')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        if options['pause'] < 0:
+            raise CommandError('--pause must not be negative')
+
+        waiting = purge.pending()
+        self.stdout.write('Waiting: ' + ', '.join(
+            f'{rows} {model}' for model, rows in waiting.items()))
+        if options['status']:
+            return
+
+        started = time.monotonic()
+        totals = purge.purge(
+            options['batch_size'], options['pause'],
+            progress=self.batch_done if options['verbosity'] > 1 else None)
+        for step, rows in totals.items():
+            self.stdout.write(f'{step}: {rows}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Purged in {time.monotonic() - started:.1f}s'))
+
+    def batch_done(self, step, rows):
+        self.stdout.write(f'  {step}: {rows}')
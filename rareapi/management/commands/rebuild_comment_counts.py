@@ -0,0 +1,24 @@
+"""Management command that recounts the comments of every post"""
+import time
+from django.core.management.base import BaseCommand, CommandError
+from rareapi import activity
+
+
+class Command(BaseCommand):
+    help = ('Recompute comment_count and last_comment_at of every post from its '
+            'comments, fixing posts that drifted through writes outside the API. '
+            'Safe to run while the site is up.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Posts checked per query (default 1000)')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        started = time.monotonic()
+        checked, fixed = activity.rebuild(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} posts in {time.monotonic() - started:.1f}s, fixed {fixed}'))
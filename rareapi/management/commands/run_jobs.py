@@ -0,0 +1,92 @@
+"""Management command that works through the job queue"""
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from django.core.management.base import BaseCommand, CommandError
+from rareapi import jobs
+
+# Seconds between lease checks and between prunes of finished jobs
+HOUSEKEEPING_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = ('Run queued jobs with a pool of threads until stopped. Several of '
+            'these can run side by side, on one box or more, against the same '
+            'database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=4,
+            help='Jobs run at the same time (default 4)')
+        parser.add_argument(
+            '--poll', type=float, default=1.0,
+            help='Seconds to wait for new jobs when the queue is empty (default 1)')
+        parser.add_argument(
+            '--lease', type=int, default=jobs.LEASE,
+            help=f'Seconds a job may run before it is presumed lost and retried '
+                 f'(default {jobs.LEASE})')
+        parser.add_argument(
+            '--keep', type=int, default=7 * 24 * 3600,
+            help='Seconds to keep finished jobs around (default a week)')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit when no job is due instead of waiting for more')
+        parser.add_argument(
+            '--status', action='store_true',
+            help='Only report how many jobs there are in each state')
+
+    def handle(self, *args, **options):
+        if options['status']:
+            self.stdout.write(', '.join(
+                f'{total} {status}' for status, total in jobs.counts().items()))
+            return
+        if options['threads'] < 1:
+            raise CommandError('--threads must be at least 1')
+        if options['poll'] <= 0 or options['lease'] < 1:
+            raise CommandError('--poll and --lease must be positive')
+
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        stopping = threading.Event()
+
+        def stop(signum, frame):
+            self.stdout.write('Stopping after the running jobs')
+            stopping.set()
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+
+        ran = 0
+        housekept = 0
+        running = set()
+        with ThreadPoolExecutor(options['threads'], thread_name_prefix='job') as pool:
+            while not stopping.is_set():
+                if time.monotonic() - housekept > HOUSEKEEPING_INTERVAL:
+                    housekept = time.monotonic()
+                    expired = jobs.expire_leases(options['lease'])
+                    if expired:
+                        self.stderr.write(f'{expired} jobs outlived their lease')
+                    jobs.prune(options['keep'])
+
+                claimed = jobs.claim(worker, options['threads'] - len(running))
+                for job in claimed:
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f'Job {job.pk}: {job.name} {job.args}')
+                    running.add(pool.submit(jobs.run, job))
+                ran += len(claimed)
+
+                if not running:
+                    if options['once']:
+                        break
+                    stopping.wait(options['poll'])
+                    continue
+                # Back for more as soon as a thread is free, or new jobs are due
+                _finished, running = wait(
+                    running, timeout=0 if claimed else options['poll'],
+                    return_when=FIRST_COMPLETED)
+
+            wait(running)
+
+        self.stdout.write(self.style.SUCCESS(f'Ran {ran} jobs'))
@@ -0,0 +1,56 @@
+"""Management command that copies the primary SQLite database to its replicas"""
+import sqlite3
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = ('Copy the primary SQLite database into the replica files of '
+            'RARE_DB_REPLICAS with the online backup API, once or every '
+            '--interval seconds. The primary stays writable while it runs. '
+            'Other databases replicate with their own server tools.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', action='append', default=[], metavar='ALIAS',
+            help='Only this replica, e.g. replica1 (repeatable; default all)')
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Keep copying, waiting this many seconds in between')
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('sync_replica copies SQLite files; use the '
+                               "database server's replication for other engines")
+
+        aliases = options['database'] or settings.DATABASE_REPLICAS
+        if not aliases:
+            raise CommandError('No replicas configured; set RARE_DB_REPLICAS')
+        for alias in aliases:
+            if alias not in settings.DATABASE_REPLICAS:
+                raise CommandError(f'{alias} is not a replica')
+
+        while True:
+            for alias in aliases:
+                self.copy(primary, alias)
+            if options['interval'] <= 0:
+                break
+            time.sleep(options['interval'])
+
+    def copy(self, primary, alias):
+        """Back the primary up into one replica file
+
+        The backup replaces the replica's pages in one transaction, so its
+        readers see either the old copy or the new one.
+        """
+        started = time.monotonic()
+        primary.ensure_connection()
+        target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+        try:
+            primary.connection.backup(target)
+        finally:
+            target.close()
+        self.stdout.write(f'{alias}: copied in {time.monotonic() - started:.2f}s')
@@ -0,0 +1,229 @@
+"""Per-request timings and the histograms behind the /metrics endpoint
+
+Like the token cache, the aggregates live in the worker process; each
+worker reports its own, and Prometheus sums them over the instances it
+scrapes.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextvars import ContextVar
+from functools import wraps
+
+# Upper bounds of the histogram buckets, Prometheus client defaults for time
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# name -> (help text, bucket bounds)
+HISTOGRAMS = {
+    'rare_request_duration_seconds': (
+        'Time spent in the application per request, to the last byte for streams',
+        SECONDS_BUCKETS),
+    'rare_request_db_seconds': ('Time spent running SQL per request', SECONDS_BUCKETS),
+    'rare_request_db_queries': ('SQL statements per request', QUERY_BUCKETS),
+    'rare_request_serialize_seconds': (
+        'Time spent turning model instances and rows into response data, SQL excluded',
+        SECONDS_BUCKETS),
+    'rare_request_render_seconds': (
+        'Time spent rendering the response body, JSON encoding for the API',
+        SECONDS_BUCKETS),
+    'rare_response_bytes': ('Size of the response body', BYTES_BUCKETS),
+}
+
+
+class RequestTimings:
+    """What one request has spent so far"""
+    __slots__ = ('action', 'started', 'db', 'queries', 'serialize', 'serializing',
+                 'view_started', 'view_finished', 'rendered')
+
+    def __init__(self):
+        self.action = 'unmatched'
+        self.started = time.perf_counter()
+        self.db = 0.0
+        self.queries = 0
+        self.serialize = 0.0
+        # inside a timed serialization, whose nested calls it already covers
+        self.serializing = False
+        self.view_started = None
+        self.view_finished = None
+        self.rendered = None
+
+    def split(self):
+        """Seconds in SQL, in serializers and in rendering
+
+        Returns:
+            dict -- db, serialize and render seconds
+        """
+        render = 0.0
+        if self.view_finished is not None and self.rendered is not None:
+            render = self.rendered - self.view_finished
+        return {'db': self.db, 'serialize': self.serialize, 'render': render}
+
+
+_current = ContextVar('rare_request_timings', default=None)
+
+
+def activate(timings):
+    """Charge queries run in this context to timings
+
+    Returns:
+        Token -- to pass to deactivate()
+    """
+    return _current.set(timings)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def current_timings():
+    """RequestTimings of the request running in this context, if any"""
+    return _current.get()
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper adding each statement to the current request"""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db += time.perf_counter() - started
+        timings.queries += 1
+
+
+def install_query_timer(connection):
+    """Wrap every statement run on a database connection
+
+    Goes first in the list, so connection.execute_wrapper() blocks that are
+    open while the connection is made still pop their own wrapper.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+def timed_serialization(function):
+    """Charge the time spent in function, less its SQL, to serialization
+
+    Only the outermost call is timed, so nested serializers and the
+    objects of a list are not counted twice.
+    """
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        timings = _current.get()
+        if timings is None or timings.serializing:
+            return function(*args, **kwargs)
+        timings.serializing = True
+        started = time.perf_counter()
+        db = timings.db
+        try:
+            return function(*args, **kwargs)
+        finally:
+            timings.serialize += time.perf_counter() - started - (timings.db - db)
+            timings.serializing = False
+    wrapper.timed_serialization = True
+    return wrapper
+
+
+def install_serializer_timer():
+    """Time every DRF serializer's to_representation()
+
+    Serializers are built all over the views, and .data, the exports and
+    nested fields all go through to_representation() of these two classes.
+    """
+    from rest_framework import serializers  # pylint: disable=import-outside-toplevel
+    for serializer_class in (serializers.Serializer, serializers.ListSerializer):
+        method = serializer_class.to_representation
+        if not getattr(method, 'timed_serialization', False):
+            serializer_class.to_representation = timed_serialization(method)
+
+
+class Histogram:
+    """Counts of observations at or below each bound, with their sum"""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """Histograms per viewset action, e.g. post-list or comment-create"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._actions = {}
+        self._responses = Counter()
+
+    def observe(self, timings, status, size):
+        """Add one finished request"""
+        split = timings.split()
+        values = {
+            'rare_request_duration_seconds': time.perf_counter() - timings.started,
+            'rare_request_db_seconds': split['db'],
+            'rare_request_db_queries': timings.queries,
+            'rare_request_serialize_seconds': split['serialize'],
+            'rare_request_render_seconds': split['render'],
+            'rare_response_bytes': size,
+        }
+        with self._lock:
+            histograms = self._actions.get(timings.action)
+            if histograms is None:
+                histograms = self._actions[timings.action] = {
+                    name: Histogram(bounds) for name, (_help, bounds) in HISTOGRAMS.items()
+                }
+            for name, value in values.items():
+                histograms[name].observe(value)
+            self._responses[(timings.action, status)] += 1
+
+    def clear(self):
+        with self._lock:
+            self._actions.clear()
+            self._responses.clear()
+
+    def render(self):
+        """The aggregates in the Prometheus text exposition format
+
+        Returns:
+            str -- one sample per line
+        """
+        lines = []
+        with self._lock:
+            actions = sorted(self._actions.items())
+            for name, (help_text, bounds) in HISTOGRAMS.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for action, histograms in actions:
+                    histogram = histograms[name]
+                    label = f'action="{_escape(action)}"'
+                    cumulative = 0
+                    for bound, bucket_count in zip(bounds, histogram.counts):
+                        cumulative += bucket_count
+                        lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_bucket{{{label},le="+Inf"}} {histogram.count}')
+                    lines.append(f'{name}_sum{{{label}}} {histogram.sum}')
+                    lines.append(f'{name}_count{{{label}}} {histogram.count}')
+
+            lines.append('# HELP rare_responses_total Responses by action and status code')
+            lines.append('# TYPE rare_responses_total counter')
+            for (action, status), total in sorted(self._responses.items()):
+                lines.append(
+                    f'rare_responses_total{{action="{_escape(action)}",status="{status}"}} {total}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+metrics = Metrics()
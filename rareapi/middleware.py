@@ -0,0 +1,196 @@
+"""Middleware that times every request and routes the reads of safe ones"""
+import time
+from django.conf import settings
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from rest_framework.permissions import SAFE_METHODS
+from rareapi.metrics import RequestTimings, activate, current_timings, deactivate, metrics
+from rareapi.routers import begin_reads, end_reads
+
+
+class PerformanceMiddleware:
+    """Split each request into SQL, serialization and render time
+
+    The totals go into per action histograms, and out in a Server-Timing
+    header when DEBUG is on or the user is staff, who may read /metrics
+    anyway. Actions are named like the routes, "<basename>-<action>"
+    (post-list, comment-create), or after the function for plain views.
+    Works under WSGI and ASGI; streamed responses are recorded when their
+    last chunk has been sent.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = activate(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            deactivate(token)
+        return self.finish(request, timings, response)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = activate(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            deactivate(token)
+        return self.finish(request, timings, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = current_timings()
+        if timings is None:
+            return None
+        timings.action = action_name(request, view_func)
+        timings.view_started = time.perf_counter()
+        return None
+
+    def process_template_response(self, request, response):
+        # Called between the view returning and the body being rendered
+        timings = current_timings()
+        if timings is not None:
+            timings.view_finished = time.perf_counter()
+            response.add_post_render_callback(lambda _response: _rendered(timings))
+        return response
+
+    def finish(self, request, timings, response):
+        """Add Server-Timing and record the request, or arrange to once it streams"""
+        if timings.view_started is not None and timings.view_finished is None:
+            # Not a template response, so nothing was left to render
+            timings.view_finished = time.perf_counter()
+
+        if settings.DEBUG or shows_timings(request):
+            split = timings.split()
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={split["db"] * 1000:.1f};desc="{timings.queries} queries"',
+                f'serialize;dur={split["serialize"] * 1000:.1f}',
+                f'render;dur={split["render"] * 1000:.1f}',
+                f'total;dur={(time.perf_counter() - timings.started) * 1000:.1f}',
+            ])
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = _count_async(
+                    timings, response.status_code, response.streaming_content)
+            else:
+                response.streaming_content = _count(
+                    timings, response.status_code, response.streaming_content)
+        else:
+            metrics.observe(timings, response.status_code, len(response.content))
+        return response
+
+
+class ReplicaReadsMiddleware:
+    """Let GET, HEAD and OPTIONS requests read from the replicas
+
+    Without replicas in settings.DATABASE_ROUTERS this changes nothing.
+    Streamed bodies are produced after it returns and read the primary.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.method not in SAFE_METHODS:
+            return self.get_response(request)
+        token = begin_reads()
+        try:
+            return self.get_response(request)
+        finally:
+            end_reads(token)
+
+    async def __acall__(self, request):
+        if request.method not in SAFE_METHODS:
+            return await self.get_response(request)
+        token = begin_reads()
+        try:
+            return await self.get_response(request)
+        finally:
+            end_reads(token)
+
+
+def action_name(request, view_func):
+    """Name of the viewset action or view a request was routed to
+
+    Returns:
+        str -- e.g. post-list, post-unapproved, login_user
+    """
+    initkwargs = getattr(view_func, 'initkwargs', None) or {}
+    actions = getattr(view_func, 'actions', None)
+    if 'basename' in initkwargs and actions:
+        action = actions.get(request.method.lower(), request.method.lower())
+        return f'{initkwargs["basename"]}-{action}'
+    # @api_view names its wrapper class after the decorated function
+    view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    if view_class is not None:
+        return view_class.__name__
+    return getattr(view_func, '__name__', 'unknown')
+
+
+def shows_timings(request):
+    """Whether the request's user may see Server-Timing, like IsAdminUser
+
+    DRF copies the user it authenticated onto the Django request, so token
+    users are seen here once the view has run.
+    """
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_staff)
+
+
+def _rendered(timings):
+    timings.rendered = time.perf_counter()
+
+
+def _count(timings, status, content):
+    """Pass a stream through, recording the request after its last chunk
+
+    Rows a streamed export reads are fetched while it is iterated, so each
+    chunk is produced with the request's timings current.
+    """
+    size = 0
+    iterator = iter(content)
+    try:
+        while True:
+            token = activate(timings)
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                deactivate(token)
+            size += len(chunk)
+            yield chunk
+    finally:
+        metrics.observe(timings, status, size)
+
+
+async def _count_async(timings, status, content):
+    size = 0
+    iterator = content.__aiter__()
+    try:
+        while True:
+            token = activate(timings)
+            try:
+                chunk = await iterator.__anext__()
+            except StopAsyncIteration:
+                break
+            finally:
+                deactivate(token)
+            size += len(chunk)
+            yield chunk
+    finally:
+        metrics.observe(timings, status, size)
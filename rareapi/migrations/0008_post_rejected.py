@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rareapi', '0007_post_comment_activity'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='post',
+            name='post_unapproved_pubdate_idx',
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='rejected',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('approved', False), ('rejected', False)), fields=['publication_date', 'id'], name='post_pending_pubdate_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rareapi', '0011_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSearch',
+            fields=[
+                ('post', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search', serialize=False, to='rareapi.post')),
+                ('title', models.CharField(max_length=100)),
+                ('content', models.TextField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'rareapi_post_fts',
+                'managed': False,
+            },
+        ),
+    ]
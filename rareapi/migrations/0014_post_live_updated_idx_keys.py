@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rareapi', '0013_comment_updated_post_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='post',
+            name='post_live_updated_idx',
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['updated_at', 'category', 'author'], name='post_live_updated_idx'),
+        ),
+    ]
@@ -2,4 +2,8 @@ from .rareuser import RareUser
 from .comment import Comment
 from .category import Category
 from .post import Post
-from .tag import Tag
\ No newline at end of file
+from .tag import Tag
+from .posttag import PostTag
+from .loadcheckpoint import LoadCheckpoint
+from .job import Job
+from .postsearch import PostSearch
@@ -1,5 +1,14 @@
 from django.db import models
+from .softdeletable import SoftDeletable
+from .versioned import Versioned
 
 
-class Category(models.Model):
-    label = models.CharField(max_length=50)
\ No newline at end of file
+class Category(Versioned, SoftDeletable):
+    label = models.CharField(max_length=50)
+
+    class Meta:
+        indexes = [
+            # rows waiting for the purge
+            models.Index(fields=['deleted_at'], condition=models.Q(deleted_at__isnull=False),
+                         name='category_deleted_idx'),
+        ]
@@ -2,10 +2,39 @@ from django.db import models
 from django.db.models.deletion import CASCADE
 from rareapi.models.post import Post
 from rareapi.models.rareuser import RareUser
+from rareapi.models.versioned import Versioned
 
 
-class Comment(models.Model):
+class LiveCommentManager(models.Manager):
+    """Comments of posts that Post.objects shows
+
+    The purge removes them with their post; until then they are hidden.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(
+            post__deleted_at__isnull=True, post__category__deleted_at__isnull=True,
+            post__author__deleted_at__isnull=True)
+
+
+class Comment(Versioned):
     content = models.CharField(max_length=250)
     created_on = models.DateTimeField(auto_now_add=True)
     post = models.ForeignKey(Post, on_delete=CASCADE, related_name='comments')
-    author = models.ForeignKey(RareUser, on_delete=CASCADE, related_name='comments')
\ No newline at end of file
+    author = models.ForeignKey(RareUser, on_delete=CASCADE, related_name='comments')
+    # bumped on every save; drives ETag/Last-Modified on comment responses
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = LiveCommentManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            # ?postId= listings, oldest first within a post
+            models.Index(fields=['post', 'created_on'], name='comment_post_created_idx'),
+            # keyset pagination ordering
+            models.Index(fields=['created_on', 'id'], name='comment_created_id_idx'),
+            # freshness checks for conditional GET; the post column covers
+            # the join that leaves out comments of deleted posts
+            models.Index(fields=['updated_at', 'post'], name='comment_updated_post_idx'),
+        ]
@@ -0,0 +1,43 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    # Deferred work for `manage.py run_jobs`; see rareapi.jobs
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    name = models.CharField(max_length=100)
+    args = models.JSONField(default=dict)
+    # at most one queued job per key; None for jobs that may pile up
+    key = models.CharField(max_length=200, null=True, blank=True)
+    # higher runs first
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    # not claimed before this; pushed back after each failed attempt
+    run_after = models.DateTimeField(default=timezone.now)
+    # worker holding a running job, and when it claimed it
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['key'], condition=models.Q(status='queued'),
+                                    name='job_queued_key_uniq'),
+        ]
+        indexes = [
+            # claiming: most urgent queued job first
+            models.Index(fields=['-priority', 'run_after', 'id'],
+                         condition=models.Q(status='queued'), name='job_queue_idx'),
+            # counts per status, expired leases, pruning finished jobs
+            models.Index(fields=['status', 'locked_at'], name='job_status_locked_idx'),
+            models.Index(fields=['status', 'finished_at'], name='job_status_finished_idx'),
+        ]
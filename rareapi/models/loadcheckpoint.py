@@ -0,0 +1,16 @@
+from django.db import models
+
+
+class LoadCheckpoint(models.Model):
+    # Progress of one `manage.py bulkload` input, committed in the same
+    # transaction as each batch so an interrupted load resumes exactly
+    source = models.CharField(max_length=500)
+    model = models.CharField(max_length=50)
+    rows = models.BigIntegerField(default=0)
+    finished = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'model'], name='loadcheckpoint_source_model_uniq'),
+        ]
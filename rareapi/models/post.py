@@ -2,9 +2,24 @@ from django.db import models
 from django.db.models.deletion import CASCADE
 from .category import Category
 from .rareuser import RareUser
+from .softdeletable import LiveManager, SoftDeletable
+from .tag import Tag
+from .versioned import Versioned
 
 
-class Post(models.Model):
+class LivePostManager(LiveManager):
+    """Posts not soft deleted, in a category and by an author that aren't either
+
+    The purge marks the posts of deleted categories and authors deleted in
+    turn; until then they are hidden here.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(
+            category__deleted_at__isnull=True, author__deleted_at__isnull=True)
+
+
+class Post(Versioned, SoftDeletable):
     author = models.ForeignKey(RareUser, on_delete=CASCADE, related_name='posts')
     category = models.ForeignKey(Category, on_delete=CASCADE, related_name='posts')
     title = models.CharField(max_length=100)
@@ -14,4 +29,40 @@ class Post(models.Model):
     # CharField: chunk of space, not flexible, faster when smaller; 
     # TextField: rows can be smaller, no attribute
     approved = models.BooleanField(default=False)
-    
\ No newline at end of file
+    # turned down by a moderator; posts neither approved nor rejected
+    # make up the moderation queue
+    rejected = models.BooleanField(default=False)
+    # bumped on every save; drives ETag/Last-Modified on post responses
+    updated_at = models.DateTimeField(auto_now=True)
+    # kept by rareapi.activity as comments come and go, so listings can show
+    # and sort by them without touching the comment table
+    comment_count = models.PositiveIntegerField(default=0)
+    last_comment_at = models.DateTimeField(null=True, blank=True)
+    tags = models.ManyToManyField(Tag, through='PostTag', related_name='posts')
+
+    objects = LivePostManager()
+
+    class Meta:
+        indexes = [
+            # moderation queue; partial because SQLite cannot seek on
+            # the bare "NOT approved" that a boolean filter compiles to
+            models.Index(
+                fields=['publication_date', 'id'],
+                condition=models.Q(approved=False, rejected=False),
+                name='post_pending_pubdate_idx'),
+            # ?authorId= listings
+            models.Index(fields=['author', 'publication_date'], name='post_author_pubdate_idx'),
+            # keyset pagination ordering
+            models.Index(fields=['publication_date', 'id'], name='post_pubdate_id_idx'),
+            # freshness checks for conditional GET; partial, so counting
+            # the rows not deleted is a scan of this index alone, which
+            # also holds the keys LivePostManager joins on
+            models.Index(fields=['updated_at', 'category', 'author'],
+                         condition=models.Q(deleted_at__isnull=True),
+                         name='post_live_updated_idx'),
+            # ?ordering=-last_comment_at, most recently discussed first
+            models.Index(fields=['last_comment_at', 'id'], name='post_last_comment_idx'),
+            # rows waiting for the purge
+            models.Index(fields=['deleted_at'], condition=models.Q(deleted_at__isnull=False),
+                         name='post_deleted_idx'),
+        ]
@@ -0,0 +1,17 @@
+from django.db import models
+from django.db.models.deletion import DO_NOTHING
+
+
+class PostSearch(models.Model):
+    # Read-only view of the FTS5 index rareapi.search maintains (SQLite
+    # only), so searches can join it to posts; its rowid is the post id
+    post = models.OneToOneField('Post', on_delete=DO_NOTHING, primary_key=True,
+                                db_column='rowid', related_name='search')
+    title = models.CharField(max_length=100)
+    content = models.TextField()
+    # bm25() of the row against the MATCH of the same query; smaller is better
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'rareapi_post_fts'
@@ -0,0 +1,20 @@
+from django.db import models
+from django.db.models.deletion import CASCADE
+from .tag import Tag
+
+
+class PostTag(models.Model):
+    # The composite indexes below lead with each column, so the default
+    # single-column FK indexes would only slow down writes
+    post = models.ForeignKey('Post', on_delete=CASCADE, related_name='post_tags', db_index=False)
+    tag = models.ForeignKey(Tag, on_delete=CASCADE, related_name='post_tags', db_index=False)
+
+    class Meta:
+        constraints = [
+            # tags of a post (prefetch); a tag is attached at most once
+            models.UniqueConstraint(fields=['post', 'tag'], name='posttag_post_tag_uniq'),
+        ]
+        indexes = [
+            # posts carrying a tag (?tag= filter)
+            models.Index(fields=['tag', 'post'], name='posttag_tag_post_idx'),
+        ]
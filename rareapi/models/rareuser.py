@@ -1,9 +1,10 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from .softdeletable import SoftDeletable
 User = get_user_model()
 
 # class name should be PascalCase
-class RareUser(models.Model):
+class RareUser(SoftDeletable):
   
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     bio = models.CharField(max_length=500)
@@ -11,4 +12,15 @@ class RareUser(models.Model):
     # auto_now_add: first created timestamp; 
     # auto_add: overwrite when everytime it's saved
     active = models.BooleanField(default=True)
-    profile_image_url = models.URLField() #default max_length=200
\ No newline at end of file
+    profile_image_url = models.URLField() #default max_length=200
+
+    class Meta:
+        indexes = [
+            # keyset pagination ordering; partial, so counting the rows
+            # not deleted is a scan of this index alone
+            models.Index(fields=['created_on', 'id'], condition=models.Q(deleted_at__isnull=True),
+                         name='rareuser_live_created_idx'),
+            # rows waiting for the purge
+            models.Index(fields=['deleted_at'], condition=models.Q(deleted_at__isnull=False),
+                         name='rareuser_deleted_idx'),
+        ]
@@ -0,0 +1,23 @@
+from django.db import models
+
+
+class LiveManager(models.Manager):
+    """Rows that are not soft deleted"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class SoftDeletable(models.Model):
+    """A row a DELETE request only marks
+
+    `objects` hides it right away; rareapi.purge removes it later,
+    together with the rows that refer to it. `all_objects` sees both.
+    """
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        abstract = True
@@ -1,5 +1,6 @@
 from django.db import models
+from .versioned import Versioned
 
 
-class Tag(models.Model):
+class Tag(Versioned):
     label = models.CharField(max_length=50)
\ No newline at end of file
@@ -0,0 +1,34 @@
+from django.db import models, router, transaction
+from django.db.models import F
+
+
+class Versioned(models.Model):
+    """A row carrying a version number, raised by every write
+
+    PATCH requests may send the version they were based on, and are
+    refused when the row has moved on since (see rareapi.partial).
+    """
+    version = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+
+        # Raised by the database, so a PATCH landing between this row's
+        # read and its save still counts
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'version'}
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        # The UPDATE's row lock keeps other writers out until the version is read back
+        with transaction.atomic(using=using, savepoint=False):
+            self.version = F('version') + 1
+            try:
+                super().save(*args, **kwargs)
+            except BaseException:
+                del self.version
+                raise
+            self.refresh_from_db(using=using, fields=['version'])
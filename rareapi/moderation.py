@@ -0,0 +1,46 @@
+"""Set-based approval and rejection of posts
+
+A decision on any number of posts is one UPDATE, or one per chunk of
+ids. Posts already in the decided state are left alone, so their ETags
+hold; the others get a new updated_at, which moves theirs, and a new
+version, so edits based on the undecided post are refused.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from rareapi import bulk
+from rareapi.models import Post
+
+# Decision -> whether it approves
+DECISIONS = {'approve': True, 'reject': False}
+
+
+def pending():
+    """The moderation queue: posts neither approved nor rejected"""
+    return Post.objects.filter(approved=False, rejected=False)
+
+
+def decide(posts, approve):
+    """Approve or reject every post of a queryset with one UPDATE
+
+    Returns:
+        int -- posts changed
+    """
+    return posts.exclude(approved=approve, rejected=not approve).update(
+        approved=approve, rejected=not approve, updated_at=timezone.now(),
+        version=F('version') + 1)
+
+
+def decide_ids(ids, approve):
+    """decide() for posts by id, one UPDATE per chunk of ids in one transaction
+
+    Returns:
+        int -- posts changed
+    """
+    wanted = sorted({pk for pk in ids if pk is not None})
+    changed = 0
+    with transaction.atomic():
+        for start in range(0, len(wanted), bulk.LOOKUP_CHUNK_SIZE):
+            chunk = wanted[start:start + bulk.LOOKUP_CHUNK_SIZE]
+            changed += decide(Post.objects.filter(pk__in=chunk), approve)
+    return changed
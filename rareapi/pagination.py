@@ -0,0 +1,157 @@
+"""Pagination classes shared by the list endpoints"""
+from asgiref.sync import sync_to_async
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+from rest_framework.settings import api_settings
+from rareapi.projection import projection_for
+
+
+class BoundedLimitOffsetPagination(LimitOffsetPagination):
+    """Default pagination for every list endpoint
+
+    PAGE_SIZE is used when no limit is sent, and max_limit keeps a client
+    from asking for the whole table in one page.
+    """
+    max_limit = 100
+
+    def get_count(self, queryset):
+        return super().get_count(getattr(queryset, 'counted', queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset for async views, with the same page and links"""
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        self.count = await getattr(queryset, 'counted', queryset).acount()
+        self.offset = self.get_offset(request)
+        if self.count > self.limit and self.template is not None:
+            self.display_page_controls = True
+
+        if self.count == 0 or self.offset > self.count:
+            return []
+        return [item async for item in queryset[self.offset:self.offset + self.limit]]
+
+
+class PostCursorPagination(CursorPagination):
+    """Keyset pagination for posts, newest first"""
+    ordering = ('-publication_date', '-id')
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+
+class CommentCursorPagination(CursorPagination):
+    """Keyset pagination for comments, newest first"""
+    ordering = ('-created_on', '-id')
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+
+class RareUserCursorPagination(CursorPagination):
+    """Keyset pagination for rareusers, newest first"""
+    ordering = ('-created_on', '-id')
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+
+class PaginatedViewMixin:
+    """Pagination support for plain ViewSets
+
+    ViewSet does not come with GenericAPIView's pagination hooks, so list
+    actions hand their queryset to paginated_response() instead of building
+    Response(serializer.data) themselves. Views that set
+    cursor_pagination_class let clients opt in to cursor pagination with
+    ?paginate=cursor; the next/previous links keep that parameter.
+
+    Pages are read with the serializer's Projection when it has one, as
+    rows rather than model instances, and serialized without it.
+    """
+    cursor_pagination_class = None
+
+    def get_paginator(self):
+        """Pick the paginator for the current request
+
+        Returns:
+            BasePagination -- cursor paginator when requested, default otherwise
+        """
+        if (self.cursor_pagination_class is not None
+                and self.request.query_params.get('paginate') == 'cursor'):
+            return self.cursor_pagination_class()
+        return api_settings.DEFAULT_PAGINATION_CLASS()
+
+    def paginated_response(self, queryset, serializer_class):
+        """Serialize one page of queryset
+
+        Returns:
+            Response -- JSON serialized page with next/previous links
+        """
+        paginator = self.get_paginator()
+        projection = projection_for(serializer_class, self.request)
+        if projection is not None:
+            rows = projection.queryset(self.ordered(queryset), *cursor_columns(paginator))
+            page = paginator.paginate_queryset(rows, self.request, view=self)
+            return paginator.get_paginated_response(projection.data(page))
+
+        if isinstance(paginator, CursorPagination):
+            queryset = with_columns(queryset, paginator.ordering)
+        page = paginator.paginate_queryset(self.ordered(queryset), self.request, view=self)
+        serializer = serializer_class(
+            page, many=True, context={'request': self.request})
+        return paginator.get_paginated_response(serializer.data)
+
+    def paginates_async(self):
+        """Whether apaginated_response can serve the current request
+
+        Cursor pages are left to the sync views.
+        """
+        return hasattr(self.get_paginator(), 'apaginate_queryset')
+
+    async def apaginated_response(self, queryset, serializer_class):
+        """paginated_response for async views; check paginates_async() first
+
+        Returns:
+            Response -- JSON serialized page with next/previous links
+        """
+        paginator = self.get_paginator()
+        projection = projection_for(serializer_class, self.request)
+        if projection is not None:
+            page = await paginator.apaginate_queryset(
+                projection.queryset(self.ordered(queryset)), self.request, view=self)
+            # Nested lists are read by their own queries
+            return paginator.get_paginated_response(await sync_to_async(projection.data)(page))
+
+        page = await paginator.apaginate_queryset(
+            self.ordered(queryset), self.request, view=self)
+        serializer = serializer_class(
+            page, many=True, context={'request': self.request})
+        return paginator.get_paginated_response(serializer.data)
+
+    def ordered(self, queryset):
+        """queryset with a deterministic ordering
+
+        Offsets are only stable over one. The keyset ordering is reused when
+        there is one, so both pagination modes walk its index.
+        """
+        if queryset.ordered:
+            return queryset
+        ordering = getattr(self.cursor_pagination_class, 'ordering', ('pk',))
+        return queryset.order_by(*ordering)
+
+
+def cursor_columns(paginator):
+    """Columns a cursor paginator builds its cursors from, none for others"""
+    if not isinstance(paginator, CursorPagination):
+        return ()
+    return tuple(field.lstrip('-') for field in paginator.ordering)
+
+
+def with_columns(queryset, ordering):
+    """queryset, also reading the ordering columns if only() left them out
+
+    Cursors are built from the first and last rows of a page, and a
+    deferred column there would cost a query each.
+    """
+    names, deferred = queryset.query.deferred_loading
+    if not names or deferred:
+        return queryset
+    return queryset.only(*names, *(field.lstrip('-') for field in ordering))
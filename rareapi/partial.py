@@ -0,0 +1,84 @@
+"""PATCH requests written with a single UPDATE
+
+Only the fields sent are validated, by a serializer with partial=True,
+and only their columns are written. The statement's WHERE carries the
+primary key, the ownership rule and, when the request sends one, the
+version the client last read, so the row is never read first. An UPDATE
+that matches nothing costs one read to tell 404, 403 and 412 apart.
+
+UPDATE sends no post_save, so callers retire the cache namespaces the
+row belongs to themselves.
+"""
+from django.db.models import F
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rareapi import bulk
+
+
+def partial_update(request, rows, pk, serializer_class, owner=None):
+    """Apply a PATCH body to one row
+
+    Arguments:
+        request -- the PATCH request; "version" in its body, when sent,
+                   must equal the row's version
+        rows -- queryset the row is looked up in
+        pk -- primary key of the row
+        serializer_class -- validates the fields sent; its validated_data
+                            maps columns to their new values
+        owner -- (column, value) the row must match, or None when anyone
+                 may edit it
+
+    Returns:
+        Response -- 204, or 400, 403, 404 or 412 status code
+    """
+    data = request.data if isinstance(request.data, dict) else {}
+    version = data.get('version')
+    if version is not None:
+        version = bulk.as_id(version)
+        if version is None:
+            return Response({'version': 'Expected an integer'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = serializer_class(data=data, partial=True)
+    serializer.is_valid(raise_exception=True)
+    values = dict(serializer.validated_data)
+    if not values:
+        return Response({'message': 'Send at least one field to change'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    matched = rows.filter(pk=pk)
+    if owner is not None:
+        matched = matched.filter(**{owner[0]: owner[1]})
+    if version is not None:
+        matched = matched.filter(version=version)
+    if matched.update(**values, **touched(rows.model), version=F('version') + 1):
+        return Response({}, status=status.HTTP_204_NO_CONTENT)
+    return refusal(rows, pk, owner)
+
+
+def touched(model):
+    """auto_now columns, which save() would have set and update() does not"""
+    now = timezone.now()
+    return {
+        field.attname: now
+        for field in model._meta.concrete_fields if getattr(field, 'auto_now', False)
+    }
+
+
+def refusal(rows, pk, owner):
+    """Why an UPDATE of the row matched nothing
+
+    Returns:
+        Response -- 404, 403 or 412 status code
+    """
+    columns = ['version'] if owner is None else ['version', owner[0]]
+    row = rows.filter(pk=pk).values_list(*columns).first()
+    if row is None:
+        return Response({'message': f'{rows.model.__name__} matching query does not exist.'},
+                        status=status.HTTP_404_NOT_FOUND)
+    if owner is not None and row[1] != owner[1]:
+        return Response({'message': f'Only the author can edit a {rows.model.__name__.lower()}'},
+                        status=status.HTTP_403_FORBIDDEN)
+    return Response({'message': 'Changed since it was read', 'version': row[0]},
+                    status=status.HTTP_412_PRECONDITION_FAILED)
@@ -0,0 +1,308 @@
+"""List responses built from values() rows instead of serializers
+
+A ModelSerializer turns every row into a model instance, then runs each
+field's get_attribute() and to_representation() on it, which is most of
+the CPU of a page of posts. A Projection reads the same fields straight
+into tuples and assembles the dicts from them:
+
+- columns, and columns of forward foreign keys the serializer nests, come
+  from one values_list() over the page, joins included
+- nested lists (tags, a user's groups) come from one more values_list()
+  per relation for the whole page, as prefetch_related() would
+
+It is derived from the serializer's own fields, fields= and expand=
+included, so the dicts are the same, key for key, as serializer.data.
+Leaf values still go through their field's to_representation() unless
+the column already has the type it would return. Serializers with
+anything else (method fields, hyperlinks, custom to_representation)
+get no projection and are serialized as usual.
+"""
+import datetime
+from collections import namedtuple
+from operator import itemgetter
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.utils import timezone
+from rest_framework import ISO_8601, relations, serializers
+from rest_framework.settings import api_settings
+from rareapi.fieldsets import requested_fieldset
+from rareapi.metrics import timed_serialization
+
+# Projections built, by serializer and fieldset; cleared when it fills up
+CACHE_SIZE = 256
+
+# Serializer fields whose to_representation() returns these model columns unchanged
+PASSTHROUGH = (
+    (serializers.CharField, (models.CharField, models.TextField)),
+    (serializers.IntegerField, (models.IntegerField, models.AutoField)),
+    (serializers.BooleanField, (models.BooleanField,)),
+)
+
+COLUMN, DATETIME, NESTED, MANY = range(4)
+
+# The dict of one serializer: keys in field order, a function that picks
+# their columns out of a row, and the (key, index, kind, argument) nodes
+# whose column is not their value as is
+Shape = namedtuple('Shape', ['keys', 'values', 'special'])
+
+_projections = {}
+
+
+class Unsupported(Exception):
+    """A serializer field a Projection can't reproduce"""
+
+
+def projection_for(serializer_class, request):
+    """The Projection of serializer_class for a request's fieldset
+
+    Returns:
+        Projection -- or None when the serializer needs its own code
+    """
+    requested, expand = requested_fieldset(request)
+    key = (serializer_class, requested and frozenset(requested), frozenset(expand))
+    try:
+        return _projections[key]
+    except KeyError:
+        pass
+
+    serializer = serializer_class(context={'request': request})
+    try:
+        projection = Projection(serializer, serializer_class.Meta.model)
+    except Unsupported:
+        projection = None
+    if len(_projections) >= CACHE_SIZE:
+        _projections.clear()
+    _projections[key] = projection
+    return projection
+
+
+class Projection:
+    """How one serializer's dicts are assembled from values_list() rows
+
+    Arguments:
+        serializer -- a ModelSerializer instance
+        model -- the model the rows are read from
+        key -- path of a column to read first, which rows are grouped by
+               when they are a nested list
+    """
+
+    def __init__(self, serializer, model, key=None):
+        if not _plain_serializer(serializer):
+            raise Unsupported(serializer)
+        self.model = model
+        self.columns = []
+        # A related primary key is read from the foreign key, without a join
+        self.aliases = {}
+        self.relations = []
+        if key is not None:
+            self.column(key)
+        self.shape = self.walk(serializer, model, '')
+
+    def column(self, path):
+        """Index of path in the rows, adding it to the columns if new"""
+        path = self.aliases.get(path, path)
+        if path not in self.columns:
+            self.columns.append(path)
+        return self.columns.index(path)
+
+    def walk(self, serializer, model, prefix):
+        """The Shape of serializer's fields"""
+        nodes = []
+        for field in serializer._readable_fields:
+            attrs = field.source_attrs
+            if not attrs:
+                raise Unsupported(field)
+            *through, name = attrs
+            owner = model
+            for attr in through:
+                owner = _forward_relation(owner, attr).related_model
+            path = prefix + '__'.join(attrs)
+            model_field = _model_field(owner, name)
+
+            if isinstance(field, serializers.ListSerializer):
+                if type(field).to_representation is not serializers.ListSerializer.to_representation:
+                    raise Unsupported(field)
+                nodes.append((field.field_name, self.column(prefix + model._meta.pk.name),
+                              MANY, self.many(field.child, model_field, through)))
+            elif isinstance(field, relations.ManyRelatedField):
+                if (not isinstance(field.child_relation, relations.PrimaryKeyRelatedField)
+                        or field.child_relation.pk_field is not None):
+                    raise Unsupported(field)
+                nodes.append((field.field_name, self.column(prefix + model._meta.pk.name),
+                              MANY, self.many(None, model_field, through)))
+            elif isinstance(field, serializers.BaseSerializer):
+                if not _plain_serializer(field):
+                    raise Unsupported(field)
+                relation = _forward_relation(owner, name)
+                if relation.target_field.primary_key:
+                    self.aliases[f'{path}__{relation.target_field.name}'] = path
+                nodes.append((field.field_name, self.column(path), NESTED,
+                              self.walk(field, relation.related_model, path + '__')))
+            elif isinstance(field, relations.PrimaryKeyRelatedField):
+                if field.pk_field is not None:
+                    raise Unsupported(field)
+                _forward_relation(owner, name)
+                nodes.append((field.field_name, self.column(path), COLUMN, None))
+            elif (isinstance(field, (relations.RelatedField, serializers.SerializerMethodField,
+                                     serializers.HiddenField))
+                  or type(field).get_attribute is not serializers.Field.get_attribute
+                  or model_field.is_relation):
+                raise Unsupported(field)
+            elif _iso_datetime_field(field):
+                nodes.append((field.field_name, self.column(path), DATETIME, None))
+            else:
+                nodes.append((field.field_name, self.column(path), COLUMN,
+                              _converter(field, model_field)))
+
+        return Shape(
+            keys=tuple(key for key, _index, _kind, _argument in nodes),
+            values=_picker([index for _key, index, _kind, _argument in nodes]),
+            special=[node for node in nodes if node[2] != COLUMN or node[3] is not None])
+
+    def many(self, child, model_field, through):
+        """Register a nested list; its index among self.relations"""
+        if through:
+            raise Unsupported(model_field)
+        if model_field.many_to_many and not model_field.auto_created:
+            query_name = model_field.related_query_name()
+        elif model_field.one_to_many or model_field.many_to_many:
+            query_name = model_field.field.name
+        else:
+            raise Unsupported(model_field)
+
+        related = model_field.related_model
+        if child is None:
+            projection = _PrimaryKeys(related, query_name)
+        else:
+            projection = Projection(child, related, key=query_name)
+        self.relations.append(projection)
+        return len(self.relations) - 1
+
+    def queryset(self, queryset, *extra):
+        """queryset as rows of this projection's columns, and extra columns after them
+
+        Named rows, so cursor pagination can read its ordering columns by
+        name. Counting the rows needs none of the joins the columns bring
+        in, so the paginators count the queryset they were read from.
+        """
+        columns = self.columns + [path for path in extra if path not in self.columns]
+        rows = queryset.prefetch_related(None).values_list(*columns, named=True)
+        rows.counted = queryset
+        return rows
+
+    @timed_serialization
+    def data(self, rows):
+        """The dicts serializer(many=True).data would give for rows' objects
+
+        Nested lists are read here, one query per relation.
+
+        Returns:
+            list -- of dicts
+        """
+        buckets = [{} for _relation in self.relations]
+        # DateTimeField looks the zone up for every value; once is enough
+        zone = timezone.get_current_timezone() if settings.USE_TZ else None
+        items = [self.item(self.shape, row, buckets, zone) for row in rows]
+        for projection, bucket in zip(self.relations, buckets):
+            if bucket:
+                projection.fill(bucket)
+        return items
+
+    def item(self, shape, row, buckets, zone):
+        # Every column as is, then the values that need work replaced in place
+        item = dict(zip(shape.keys, shape.values(row)))
+        for key, index, kind, argument in shape.special:
+            value = row[index]
+            if kind == MANY:
+                # Objects sharing a relation share its list, filled in later
+                item[key] = buckets[argument].setdefault(value, [])
+            elif value is None:
+                item[key] = None
+            elif kind == DATETIME:
+                item[key] = _iso_datetime(value, zone)
+            elif kind == NESTED:
+                item[key] = self.item(argument, row, buckets, zone)
+            else:
+                item[key] = argument(value)
+        return item
+
+    def fill(self, bucket):
+        """Append the related objects of each key in bucket to its list"""
+        query_name = self.columns[0]
+        rows = list(self.model._default_manager.filter(
+            **{f'{query_name}__in': list(bucket)}).values_list(*self.columns))
+        for row, item in zip(rows, self.data(rows)):
+            bucket[row[0]].append(item)
+
+
+class _PrimaryKeys:
+    """A nested list of primary keys, for a many PrimaryKeyRelatedField"""
+
+    def __init__(self, model, query_name):
+        self.model = model
+        self.query_name = query_name
+
+    def fill(self, bucket):
+        rows = self.model._default_manager.filter(
+            **{f'{self.query_name}__in': list(bucket)}).values_list(self.query_name, 'pk')
+        for key, pk in rows:
+            bucket[key].append(pk)
+
+
+def _picker(indexes):
+    """itemgetter(*indexes), returning a tuple however many there are"""
+    if len(indexes) > 1:
+        return itemgetter(*indexes)
+    return lambda row: tuple(row[index] for index in indexes)
+
+
+def _plain_serializer(serializer):
+    return (isinstance(serializer, serializers.ModelSerializer)
+            and type(serializer).to_representation is serializers.Serializer.to_representation)
+
+
+def _model_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist as ex:
+        raise Unsupported(name) from ex
+
+
+def _forward_relation(model, name):
+    field = _model_field(model, name)
+    if not (field.is_relation and field.concrete) or field.many_to_many:
+        raise Unsupported(name)
+    return field
+
+
+def _iso_datetime_field(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    return (type(field).to_representation is serializers.DateTimeField.to_representation
+            and type(field).enforce_timezone is serializers.DateTimeField.enforce_timezone
+            and not hasattr(field, 'timezone')
+            and output_format is not None and output_format.lower() == ISO_8601)
+
+
+def _iso_datetime(value, zone):
+    """DateTimeField.to_representation() in ISO 8601, for the given current zone"""
+    if zone is not None:
+        value = (value.astimezone(zone) if timezone.is_aware(value)
+                 else timezone.make_aware(value, zone))
+    elif timezone.is_aware(value):
+        value = timezone.make_naive(value, datetime.timezone.utc)
+    value = value.isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def _converter(field, model_field):
+    for field_type, model_types in PASSTHROUGH:
+        if (type(field).to_representation is field_type.to_representation
+                and isinstance(field, field_type) and isinstance(model_field, model_types)):
+            return None
+    # Primary keys of BigAutoField, unless big integers are sent as strings
+    if (type(field).to_representation is serializers.BigIntegerField.to_representation
+            and not getattr(field, 'coerce_to_string', api_settings.COERCE_BIGINT_TO_STRING)
+            and isinstance(model_field, (models.IntegerField, models.AutoField))):
+        return None
+    return field.to_representation
@@ -0,0 +1,147 @@
+"""Removal of soft deleted rows and everything that refers to them
+
+A DELETE request only sets deleted_at, so its latency doesn't grow with
+the rows hanging off the deleted one. Those rows are removed here, in
+batches of primary keys, each batch written in its own transaction, so
+the purge can run beside live traffic:
+
+1. posts of deleted categories and authors are marked deleted too, which
+   takes them out of the listings first; comments of deleted authors go
+2. deleted posts lose their comments and tags, then go themselves
+3. deleted categories and rareusers, now without posts, go last
+
+Until a run reaches them, posts of deleted categories and authors and
+comments of deleted authors are still listed; comments of deleted posts
+are hidden by their manager. Deletes go through Django, so signals fire
+as usual, but the batches keep the collector from loading more than
+batch_size rows.
+"""
+import time
+from django.db import transaction
+from django.utils import timezone
+from rareapi import activity, bulk
+from rareapi.models import Category, Comment, Post, PostTag, RareUser
+
+# Rows per statement; ids are bound as parameters, so stay below SQLite's limit
+BATCH_SIZE = 500
+
+
+def pending():
+    """Soft deleted rows the purge has yet to remove
+
+    Returns:
+        dict -- model name -> rows
+    """
+    return {
+        model._meta.model_name: model.all_objects.filter(deleted_at__isnull=False).count()
+        for model in (Category, Post, RareUser)
+    }
+
+
+def purge(batch_size=BATCH_SIZE, pause=0, progress=None):
+    """Remove every soft deleted row, with its dependents
+
+    Arguments:
+        batch_size -- rows per statement and per transaction
+        pause -- seconds to sleep between batches, to leave the database
+                 to requests
+        progress -- called with (step, rows) after every batch
+
+    Returns:
+        dict -- step -> rows changed or removed
+    """
+    totals = {}
+
+    def report(step, rows):
+        totals[step] = totals.get(step, 0) + rows
+        if progress is not None:
+            progress(step, rows)
+        if pause:
+            time.sleep(pause)
+
+    deleted_categories = _deleted_ids(Category)
+    deleted_authors = _deleted_ids(RareUser)
+
+    for ids in _chunks(deleted_categories):
+        for rows in _batches(Post.all_objects.filter(category_id__in=ids, deleted_at__isnull=True),
+                             batch_size, _mark_deleted):
+            report('posts of deleted categories', rows)
+    for ids in _chunks(deleted_authors):
+        for rows in _batches(Post.all_objects.filter(author_id__in=ids, deleted_at__isnull=True),
+                             batch_size, _mark_deleted):
+            report('posts of deleted authors', rows)
+        for rows in _batches(Comment.all_objects.filter(author_id__in=ids), batch_size,
+                             _delete_comments):
+            report('comments of deleted authors', rows)
+
+    while True:
+        post_ids = list(Post.all_objects.filter(deleted_at__isnull=False)
+                        .order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not post_ids:
+            break
+        for rows in _batches(Comment.all_objects.filter(post_id__in=post_ids), batch_size, _delete):
+            report('comments of deleted posts', rows)
+        for rows in _batches(PostTag.objects.filter(post_id__in=post_ids), batch_size, _delete):
+            report('tags of deleted posts', rows)
+        for rows in _batches(Post.all_objects.filter(pk__in=post_ids), batch_size, _delete):
+            report('posts', rows)
+
+    # Left alone while anything still refers to them, e.g. a post written
+    # after this run started
+    for ids in _chunks(deleted_categories):
+        for rows in _batches(Category.all_objects.filter(pk__in=ids, posts__isnull=True),
+                             batch_size, _delete):
+            report('categories', rows)
+    for ids in _chunks(deleted_authors):
+        for rows in _batches(RareUser.all_objects.filter(
+                pk__in=ids, posts__isnull=True, comments__isnull=True), batch_size, _delete):
+            report('rareusers', rows)
+    return totals
+
+
+def _deleted_ids(model):
+    return list(model.all_objects.filter(deleted_at__isnull=False)
+                .order_by('pk').values_list('pk', flat=True))
+
+
+def _chunks(ids):
+    for start in range(0, len(ids), bulk.LOOKUP_CHUNK_SIZE):
+        yield ids[start:start + bulk.LOOKUP_CHUNK_SIZE]
+
+
+def _batches(queryset, batch_size, apply):
+    """Run apply on the primary keys of queryset, batch_size at a time
+
+    Each batch must take its rows out of queryset, or this never ends.
+
+    Yields:
+        int -- rows apply changed, per batch
+    """
+    model = queryset.model
+    while True:
+        # Read outside the transaction: on SQLite a transaction that reads
+        # before it writes fails outright, instead of waiting, when another
+        # connection writes first
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return
+        yield apply(model._base_manager.filter(pk__in=ids))
+
+
+def _mark_deleted(rows):
+    return rows.update(deleted_at=timezone.now())
+
+
+def _delete(rows):
+    # delete() reads what it has to, then writes in a transaction of its own
+    deleted, _by_model = rows.delete()
+    return deleted
+
+
+def _delete_comments(comments):
+    # Their posts stay, so their counts have to follow
+    post_ids = set(comments.values_list('post_id', flat=True))
+    with transaction.atomic():
+        deleted = _delete(comments)
+        activity.recount(Post.objects.filter(pk__in=post_ids))
+    return deleted
@@ -0,0 +1,34 @@
+"""JSON rendering with orjson when it is installed"""
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Types orjson would format its own way; they go through DRF's encoder instead
+ORJSON_OPTIONS = 0 if orjson is None else (
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """DRF's JSONRenderer, several times faster with orjson installed
+
+    The bytes are the same as DRF's compact output: UTF-8, no spaces,
+    U+2028/U+2029 escaped, and dates, decimals and lazy strings through
+    DRF's encoder. Indented output, ASCII-only settings and data orjson
+    refuses (integers over 64 bits, non-string keys) are rendered by DRF.
+    """
+    default = staticmethod(JSONEncoder().default)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.default, option=ORJSON_OPTIONS)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
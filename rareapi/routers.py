@@ -0,0 +1,130 @@
+"""Database router sending the reads of safe requests to replicas"""
+import threading
+import time
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework.authtoken.models import Token
+
+
+class ReadScope:
+    """Replica reads of one request"""
+    __slots__ = ('alias', 'wrote')
+
+    def __init__(self):
+        self.alias = None
+        self.wrote = False
+
+
+_scope = ContextVar('rare_read_scope', default=None)
+
+
+def begin_reads():
+    """Let reads in this context go to a replica
+
+    Returns:
+        Token -- to pass to end_reads()
+    """
+    return _scope.set(ReadScope())
+
+
+def end_reads(token):
+    _scope.reset(token)
+
+
+class ReplicaRouter:
+    """Round robin over settings.DATABASE_REPLICAS for safe requests
+
+    Only reads inside begin_reads(), which ReplicaReadsMiddleware opens
+    for GET, HEAD and OPTIONS, leave the primary. A request sticks to the
+    replica it started on, and once it writes, or while a transaction is
+    open, it reads from the primary so it sees its own changes. Tokens are
+    always read from the primary: a client logging in must not be turned
+    away by a replica that hasn't caught up yet.
+
+    Each replica is probed at most every REPLICA_HEALTH_CHECK_INTERVAL
+    seconds per process; one that fails is skipped until the next probe
+    succeeds, and the primary answers when none is healthy.
+    """
+
+    def __init__(self):
+        self.replicas = list(getattr(settings, 'DATABASE_REPLICAS', ()))
+        self.interval = getattr(settings, 'REPLICA_HEALTH_CHECK_INTERVAL', 10)
+        self._lock = threading.Lock()
+        self._next = 0
+        self._health = {}
+
+    def db_for_read(self, model, **hints):
+        scope = _scope.get()
+        if (scope is None or scope.wrote or model is Token
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        if scope.alias is None:
+            scope.alias = self.pick()
+        return scope.alias
+
+    def db_for_write(self, model, **hints):
+        scope = _scope.get()
+        if scope is not None:
+            scope.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *self.replicas}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema along with the data
+        return db not in self.replicas
+
+    def pick(self):
+        """Next healthy replica
+
+        Returns:
+            str -- database alias, the primary's when no replica is healthy
+        """
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self.replicas)
+        for offset in range(len(self.replicas)):
+            alias = self.replicas[(start + offset) % len(self.replicas)]
+            if self.healthy(alias):
+                return alias
+        return DEFAULT_DB_ALIAS
+
+    def healthy(self, alias):
+        """Whether a replica answered its last probe, probing when that is stale"""
+        checked = self._health.get(alias)
+        now = time.monotonic()
+        if checked is not None and now - checked[1] < self.interval:
+            return checked[0]
+
+        healthy = probe(alias)
+        self._health[alias] = (healthy, now)
+        return healthy
+
+    def health(self):
+        """Last probe result of each replica
+
+        Returns:
+            dict -- alias -> True, False or None when not probed yet
+        """
+        return {
+            alias: self._health[alias][0] if alias in self._health else None
+            for alias in self.replicas
+        }
+
+
+def probe(alias):
+    """Whether a database answers and has been migrated or copied into"""
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1 FROM django_migrations LIMIT 1')
+        return True
+    except DatabaseError:
+        connection.close()
+        return False
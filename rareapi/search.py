@@ -0,0 +1,141 @@
+"""Full-text search over post titles and content
+
+On SQLite the posts are indexed by an FTS5 table kept in sync by triggers,
+so bulk inserts and queryset updates are indexed as well. Other backends
+fall back to case-insensitive substring matching.
+"""
+import re
+from django.db import connection, connections
+from django.db.models import BooleanField, F, Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'rareapi_post_fts'
+
+# Longest query, in words, that is passed on to the index
+MAX_TERMS = 16
+
+CREATE_TABLE = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, content,
+        content='rareapi_post', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+"""
+
+CREATE_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON rareapi_post BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON rareapi_post BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+    AFTER UPDATE OF title, content ON rareapi_post BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO {FTS_TABLE} (rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+]
+
+REBUILD = f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')"
+OPTIMIZE = f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')"
+
+
+def install(schema_editor):
+    """Create the index and its triggers, then index every existing post
+
+    Safe to run again, but the rebuild reads every post.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_TABLE)
+    for statement in CREATE_TRIGGERS:
+        schema_editor.execute(statement)
+    schema_editor.execute(REBUILD)
+
+
+def restore_triggers(connection):
+    """Recreate missing triggers on an already indexed database
+
+    SQLite migrations that rebuild rareapi_post copy its rows unchanged but
+    drop its triggers, so this runs after every migrate.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        if cursor.fetchone() is None:
+            return
+        for statement in CREATE_TRIGGERS:
+            cursor.execute(statement)
+
+
+def optimize():
+    """Merge the index's segments into one
+
+    Each write adds small segments that every search has to visit;
+    worth running after bulk inserts and purges, not after every post.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(OPTIMIZE)
+
+
+def uninstall(schema_editor):
+    """Drop the index and its triggers"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for suffix in ('insert', 'delete', 'update'):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def match_expression(text):
+    """Turn free text into an FTS5 query that matches all of its words
+
+    Every word is quoted, so FTS5 operators and stray punctuation in user
+    input can't produce a syntax error.
+
+    Returns:
+        str -- the MATCH expression, or None when text has no words
+    """
+    terms = re.findall(r'\w+', text)[:MAX_TERMS]
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def search_posts(queryset, text):
+    """Narrow a post queryset to matches for text, best match first
+
+    Returns:
+        QuerySet -- matching posts ordered by relevance
+    """
+    expression = match_expression(text)
+    if expression is None:
+        return queryset.none()
+
+    # The database the queryset reads from, a replica for GET requests
+    if connections[queryset.db].vendor != 'sqlite':
+        for term in re.findall(r'\w+', text)[:MAX_TERMS]:
+            queryset = queryset.filter(Q(title__icontains=term) | Q(content__icontains=term))
+        return queryset.order_by('-publication_date', '-id')
+
+    # An inner join to the index (models.PostSearch), so SQLite starts from
+    # the MATCH and reads only the matching posts; a correlated subquery
+    # per post would work out bm25() again for every row
+    return (queryset.filter(search__isnull=False)
+            .filter(RawSQL(f'{FTS_TABLE} MATCH %s', [expression], output_field=BooleanField()))
+            .annotate(search_rank=F('search__rank'))
+            .order_by('search_rank'))
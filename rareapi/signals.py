@@ -0,0 +1,82 @@
+"""Signal receivers that keep caches and derived data consistent"""
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from rareapi import database, metrics, search
+from rareapi.authentication import token_cache
+from rareapi.caching import bump_version
+from rareapi.models import Category, Post, RareUser, Tag
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    """A deleted token must stop authenticating right away"""
+    token_cache.discard(instance.key)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_changed_user(sender, instance, **kwargs):
+    """Deactivated or edited users are reloaded on their next request"""
+    token_cache.discard_user(instance.pk)
+
+
+@receiver(post_save, sender=RareUser)
+@receiver(post_delete, sender=RareUser)
+def forget_changed_rareuser(sender, instance, **kwargs):
+    """The cached user carries its RareUser, so reload both"""
+    token_cache.discard_user(instance.user_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_category_version(sender, instance, **kwargs):
+    """Retire cached category responses once the write is committed"""
+    transaction.on_commit(lambda: bump_version('category'))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_tag_version(sender, instance, **kwargs):
+    """Retire cached tag responses once the write is committed"""
+    transaction.on_commit(lambda: bump_version('tag'))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_post_version(sender, instance, **kwargs):
+    """Comments embed a post summary, so their ETags follow post writes"""
+    transaction.on_commit(lambda: bump_version('post'))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=RareUser)
+@receiver(post_delete, sender=RareUser)
+def bump_rareuser_version(sender, instance, **kwargs):
+    """Posts and comments embed their author, so their ETags follow user writes"""
+    transaction.on_commit(lambda: bump_version('rareuser'))
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    """Table rebuilds in later migrations drop the search index triggers"""
+    if sender.name == 'rareapi':
+        search.restore_triggers(connections[using])
+
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    """WAL and the other production pragmas are per connection"""
+    database.apply_sqlite_pragmas(connection)
+
+
+@receiver(connection_created)
+def time_queries(sender, connection, **kwargs):
+    """Charge SQL time and statement counts to the request being served"""
+    metrics.install_query_timer(connection)
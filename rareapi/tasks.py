@@ -0,0 +1,39 @@
+"""Work the views leave to manage.py run_jobs, and the helpers that queue it
+
+Every task is safe to run twice, since a job can be retried after it
+did part of its work. Keys collapse a burst of writes into one job.
+"""
+from rareapi import activity, bulk, jobs, purge, search
+from rareapi.models import Post
+
+
+@jobs.task('purge_deleted')
+def purge_deleted():
+    """Remove soft deleted rows and their dependents"""
+    if purge.purge().get('posts'):
+        jobs.enqueue('optimize_search_index', key='optimize_search_index', priority=-10)
+
+
+@jobs.task('recount_posts')
+def recount_posts(post_ids):
+    """Recompute the comment counts of some posts"""
+    for start in range(0, len(post_ids), bulk.LOOKUP_CHUNK_SIZE):
+        activity.recount(Post.objects.filter(
+            pk__in=post_ids[start:start + bulk.LOOKUP_CHUNK_SIZE]))
+
+
+@jobs.task('rebuild_comment_counts')
+def rebuild_comment_counts():
+    """Recount every post whose counts drifted"""
+    activity.rebuild()
+
+
+@jobs.task('optimize_search_index')
+def optimize_search_index():
+    """Merge the full-text index after many writes"""
+    search.optimize()
+
+
+def purge_soon():
+    """Queue a purge of soft deleted rows, unless one is queued already"""
+    jobs.enqueue('purge_deleted', key='purge_deleted')
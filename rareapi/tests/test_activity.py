@@ -0,0 +1,87 @@
+"""comment_count and last_comment_at of posts as comments come and go"""
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rareapi import activity
+from rareapi.models import Category, Comment, Post, RareUser
+
+
+class CommentActivityTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='writer', password='x')
+        cls.author = RareUser.objects.create(user=cls.user, bio='')
+        category = Category.objects.create(label='News')
+        cls.first, cls.second = (
+            Post.objects.create(
+                author=cls.author, category=category, title=title,
+                image_url='http://localhost/1.png', content='Body')
+            for title in ('First', 'Second'))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def comment(self, post, content='Hi'):
+        response = self.client.post(
+            '/comments', {'postId': post.pk, 'content': content}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return Comment.objects.get(pk=response.json()['id'])
+
+    def assertActivity(self, post, count, last_comment):
+        post = Post.objects.get(pk=post.pk)
+        self.assertEqual(post.comment_count, count)
+        self.assertEqual(post.last_comment_at,
+                         None if last_comment is None else last_comment.created_on)
+
+    def test_create(self):
+        updated_at = self.first.updated_at
+        older = self.comment(self.first)
+        self.assertActivity(self.first, 1, older)
+        newer = self.comment(self.first)
+        self.assertActivity(self.first, 2, newer)
+        self.assertActivity(self.second, 0, None)
+        self.assertGreater(Post.objects.get(pk=self.first.pk).updated_at, updated_at)
+
+    def test_delete(self):
+        older = self.comment(self.first)
+        newer = self.comment(self.first)
+        self.client.delete(f'/comments/{newer.pk}')
+        self.assertActivity(self.first, 1, older)
+        self.client.delete(f'/comments/{older.pk}')
+        self.assertActivity(self.first, 0, None)
+
+    def test_move_with_put(self):
+        comment = self.comment(self.first)
+        response = self.client.put(
+            f'/comments/{comment.pk}', {'postId': self.second.pk, 'content': 'Moved'},
+            format='json')
+        self.assertEqual(response.status_code, 204)
+        self.assertActivity(self.first, 0, None)
+        self.assertActivity(self.second, 1, comment)
+
+    def test_move_with_patch(self):
+        staying = self.comment(self.first)
+        moving = self.comment(self.first)
+        response = self.client.patch(
+            f'/comments/{moving.pk}', {'postId': self.second.pk}, format='json')
+        self.assertEqual(response.status_code, 204)
+        self.assertActivity(self.first, 1, staying)
+        self.assertActivity(self.second, 1, moving)
+
+    def test_edit_in_place_keeps_counts(self):
+        comment = self.comment(self.first)
+        self.client.patch(f'/comments/{comment.pk}', {'content': 'Edited'}, format='json')
+        self.client.put(f'/comments/{comment.pk}', {'postId': self.first.pk, 'content': 'Again'},
+                        format='json')
+        self.assertActivity(self.first, 1, comment)
+
+    def test_rebuild_fixes_only_stale_posts(self):
+        comment = self.comment(self.first)
+        Post.objects.filter(pk=self.first.pk).update(comment_count=7, last_comment_at=None)
+        untouched = Post.objects.get(pk=self.second.pk).updated_at
+        self.assertEqual(activity.rebuild(batch_size=1), (2, 1))
+        self.assertActivity(self.first, 1, comment)
+        self.assertEqual(Post.objects.get(pk=self.second.pk).updated_at, untouched)
+        self.assertEqual(activity.rebuild(), (2, 0))
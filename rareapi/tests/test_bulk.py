@@ -0,0 +1,102 @@
+"""Bulk create endpoints: per-item validation and the overall status"""
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rareapi.models import Category, Comment, Post, RareUser, Tag
+
+
+class BulkCreateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='writer', password='x')
+        cls.author = RareUser.objects.create(user=cls.user, bio='')
+        cls.category = Category.objects.create(label='News')
+        cls.post = Post.objects.create(
+            author=cls.author, category=cls.category, title='First',
+            image_url='http://localhost/1.png', content='Body')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post_item(self, **changes):
+        return {'title': 'Title', 'image_url': 'http://localhost/2.png',
+                'content': 'Body', 'category_id': self.category.pk, **changes}
+
+    def errors(self, response):
+        return {result['index']: result['errors']
+                for result in response.json()['results'] if result['status'] == 'invalid'}
+
+    def test_posts_created(self):
+        response = self.client.post(
+            '/posts/bulk', [self.post_item(), self.post_item(title='Other')], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 2)
+        self.assertEqual(
+            set(Post.objects.filter(author=self.author).values_list('title', flat=True)),
+            {'First', 'Title', 'Other'})
+
+    def test_invalid_posts(self):
+        items = [
+            self.post_item(),
+            self.post_item(title={'a': 1}),
+            self.post_item(title='x' * 500),
+            self.post_item(image_url='not a url'),
+            self.post_item(category_id=self.category.pk + 100),
+            self.post_item(category_id='one'),
+            'not an object',
+        ]
+        response = self.client.post('/posts/bulk', items, format='json')
+        self.assertEqual(response.status_code, 207)
+        errors = self.errors(response)
+        self.assertEqual(sorted(errors), [1, 2, 3, 4, 5, 6])
+        self.assertIn('title', errors[1])
+        self.assertIn('title', errors[2])
+        self.assertIn('image_url', errors[3])
+        self.assertEqual(errors[4], {'category_id': ['Category does not exist.']})
+        self.assertIn('category_id', errors[5])
+        self.assertIn('non_field_errors', errors[6])
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_categories_looked_up_once(self):
+        items = [self.post_item(title=f'Post {number}') for number in range(20)]
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post('/posts/bulk', items, format='json')
+        lookups = [query for query in queries.captured_queries
+                   if 'FROM "rareapi_category"' in query['sql']]
+        self.assertEqual(len(lookups), 1)
+
+    def test_invalid_comments(self):
+        items = [
+            {'postId': self.post.pk, 'content': 'x' * 1000},
+            {'postId': self.post.pk + 100, 'content': 'Hi'},
+            {'content': 'Hi'},
+        ]
+        response = self.client.post('/comments/bulk', items, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = self.errors(response)
+        self.assertIn('content', errors[0])
+        self.assertEqual(errors[1], {'postId': ['Post does not exist.']})
+        self.assertIn('postId', errors[2])
+        self.assertFalse(Comment.objects.exists())
+
+    def test_comments_created(self):
+        response = self.client.post(
+            '/comments/bulk', [{'postId': self.post.pk, 'content': 'Hi'}], format='json')
+        self.assertEqual(response.status_code, 201)
+        comment = Comment.objects.get()
+        self.assertEqual((comment.post_id, comment.author_id), (self.post.pk, self.author.pk))
+
+    def test_tags(self):
+        response = self.client.post(
+            '/tags/bulk', [{'label': 'python'}, {'label': ['a', 'list']}, {'label': 'x' * 51}],
+            format='json')
+        self.assertEqual(response.status_code, 207)
+        errors = self.errors(response)
+        self.assertEqual(sorted(errors), [1, 2])
+        self.assertIn('label', errors[1])
+        self.assertIn('label', errors[2])
+        self.assertEqual(list(Tag.objects.values_list('label', flat=True)), ['python'])
@@ -0,0 +1,139 @@
+"""Cached category and tag responses, and conditional GET on posts and comments"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+from rareapi.caching import bump_version
+from rareapi.models import Category, Comment, Post, RareUser, Tag
+
+
+class CachedResponseTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', password='x', is_staff=True)
+        cls.category = Category.objects.create(label='News')
+        Tag.objects.create(label='a')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_second_read_comes_from_the_cache(self):
+        first = self.client.get('/categories')
+        with self.assertNumQueries(0):
+            second = self.client.get('/categories')
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_matching_etag_gets_304(self):
+        etag = self.client.get(f'/categories/{self.category.pk}')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(f'/categories/{self.category.pk}', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        other = self.client.get(f'/categories/{self.category.pk}', HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(other.status_code, 200)
+
+    def test_writes_retire_the_namespace(self):
+        before = self.client.get('/categories')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/categories/{self.category.pk}', {'label': 'World'}, format='json')
+        after = self.client.get('/categories', HTTP_IF_NONE_MATCH=before['ETag'])
+        self.assertEqual(after.status_code, 200)
+        self.assertNotEqual(after['ETag'], before['ETag'])
+        self.assertEqual(after.json()['results'][0]['label'], 'World')
+
+    def test_save_signal_retires_the_namespace(self):
+        before = self.client.get('/tags')
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(label='b')
+        after = self.client.get('/tags')
+        self.assertNotEqual(after['ETag'], before['ETag'])
+        self.assertEqual(after.json()['count'], 2)
+
+    def test_other_namespaces_stay_cached(self):
+        self.client.get('/categories')
+        bump_version('tag')
+        with self.assertNumQueries(0):
+            self.client.get('/categories')
+
+    @override_settings(ALLOWED_HOSTS=['a.example.com', 'b.example.com'])
+    def test_hosts_are_cached_apart(self):
+        for label in range(11):
+            Category.objects.create(label=f'Extra {label}')
+        first = self.client.get('/categories', HTTP_HOST='a.example.com')
+        second = self.client.get('/categories', HTTP_HOST='b.example.com')
+        self.assertTrue(first.json()['next'].startswith('http://a.example.com/'))
+        self.assertTrue(second.json()['next'].startswith('http://b.example.com/'))
+        self.assertNotEqual(first['ETag'], second['ETag'])
+
+
+class ConditionalResponseTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', password='x', is_staff=True)
+        cls.author = RareUser.objects.create(user=cls.admin, bio='')
+        cls.category = Category.objects.create(label='News')
+        cls.post = cls.new_post('First')
+        cls.comment = Comment.objects.create(post=cls.post, author=cls.author, content='Hi')
+
+    @classmethod
+    def new_post(cls, title):
+        return Post.objects.create(
+            author=cls.author, category=cls.category, title=title,
+            image_url='http://localhost/1.png', content='Body')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def assertChanged(self, path, write):
+        before = self.client.get(path)
+        self.assertEqual(
+            self.client.get(path, HTTP_IF_NONE_MATCH=before['ETag']).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+        after = self.client.get(path, HTTP_IF_NONE_MATCH=before['ETag'])
+        self.assertEqual(after.status_code, 200)
+        self.assertNotEqual(after['ETag'], before['ETag'])
+        return before, after
+
+    def test_validators(self):
+        response = self.client.get('/posts')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        not_modified = self.client.get(
+            '/posts', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+
+    def test_edit(self):
+        _, after = self.assertChanged(
+            f'/posts/{self.post.pk}',
+            lambda: self.client.patch(f'/posts/{self.post.pk}', {'title': 'Edited'}, format='json'))
+        self.assertEqual(after.json()['title'], 'Edited')
+
+    def test_insert(self):
+        self.assertChanged('/posts', lambda: self.new_post('Second'))
+
+    def test_delete(self):
+        self.assertChanged('/comments', lambda: self.client.delete(f'/comments/{self.comment.pk}'))
+        self.assertChanged('/posts', lambda: self.client.delete(f'/posts/{self.post.pk}'))
+
+    def test_embedded_author_change(self):
+        def rename():
+            self.admin.first_name = 'Renamed'
+            self.admin.save()
+            RareUser.objects.get(pk=self.author.pk).save()
+        self.assertChanged('/comments', rename)
+
+    def test_pages_have_their_own_etags(self):
+        self.new_post('Second')
+        first = self.client.get('/posts?limit=1')
+        second = self.client.get('/posts?limit=1&offset=1')
+        self.assertNotEqual(first['ETag'], second['ETag'])
@@ -0,0 +1,148 @@
+"""The job queue: claiming, retries with backoff, leases, and the recount task"""
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rareapi import jobs
+from rareapi.models import Category, Comment, Job, Post, RareUser
+
+
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        self.calls = []
+        tasks = mock.patch.dict(jobs.TASKS, {
+            'record': lambda **args: self.calls.append(args),
+            'explode': self.explode,
+        })
+        tasks.start()
+        self.addCleanup(tasks.stop)
+        # The test's transaction must outlive the job
+        connections = mock.patch('rareapi.jobs.close_old_connections')
+        connections.start()
+        self.addCleanup(connections.stop)
+
+    def explode(self, **args):
+        raise RuntimeError('boom')
+
+    def test_key_keeps_one_queued_job(self):
+        self.assertTrue(jobs.enqueue('record', key='once'))
+        self.assertFalse(jobs.enqueue('record', key='once'))
+        self.assertTrue(jobs.enqueue('record'))
+        self.assertTrue(jobs.enqueue('record'))
+        self.assertEqual(Job.objects.filter(key='once').count(), 1)
+
+        # Once running, the work may be queued again
+        jobs.claim('worker', 10)
+        self.assertTrue(jobs.enqueue('record', key='once'))
+
+    def test_unknown_task(self):
+        with self.assertRaises(ValueError):
+            jobs.enqueue('nothing')
+
+    def test_claim_order_and_limit(self):
+        jobs.enqueue('record', n=1)
+        jobs.enqueue('record', n=2, priority=5)
+        jobs.enqueue('record', n=3, delay=60)
+        claimed = jobs.claim('worker', 1)
+        self.assertEqual([job.args for job in claimed], [{'n': 2}])
+        self.assertEqual((claimed[0].status, claimed[0].locked_by, claimed[0].attempts),
+                         (Job.RUNNING, 'worker', 1))
+        self.assertEqual([job.args for job in jobs.claim('other', 10)], [{'n': 1}])
+        # Not due yet, and the running ones are taken
+        self.assertEqual(jobs.claim('third', 10), [])
+
+    def test_run(self):
+        jobs.enqueue('record', n=1)
+        jobs.run(jobs.claim('worker', 1)[0])
+        self.assertEqual(self.calls, [{'n': 1}])
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_failure_is_retried_with_backoff(self):
+        jobs.enqueue('explode', max_attempts=2)
+        with self.assertLogs('rareapi.jobs', 'ERROR'):
+            jobs.run(jobs.claim('worker', 1)[0])
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts, job.locked_by), (Job.QUEUED, 1, ''))
+        self.assertIn('RuntimeError: boom', job.last_error)
+        wait = (job.run_after - timezone.now()).total_seconds()
+        self.assertTrue(jobs.BACKOFF_BASE * 0.7 < wait <= jobs.BACKOFF_BASE * 1.2, wait)
+        self.assertEqual(jobs.claim('worker', 1), [])
+
+        Job.objects.update(run_after=timezone.now())
+        with self.assertLogs('rareapi.jobs', 'ERROR'):
+            jobs.run(jobs.claim('worker', 1)[0])
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_retry_yields_to_a_newer_job(self):
+        jobs.enqueue('explode', key='work')
+        claimed = jobs.claim('worker', 1)[0]
+        jobs.enqueue('explode', key='work')
+        with self.assertLogs('rareapi.jobs', 'ERROR'):
+            jobs.run(claimed)
+        self.assertEqual(Job.objects.get(pk=claimed.pk).status, Job.DONE)
+        self.assertEqual(Job.objects.filter(key='work', status=Job.QUEUED).count(), 1)
+
+    def test_job_of_unknown_task_fails(self):
+        Job.objects.create(name='gone')
+        jobs.run(jobs.claim('worker', 1)[0])
+        self.assertEqual(Job.objects.get().status, Job.FAILED)
+
+    def test_backoff_doubles_up_to_the_cap(self):
+        with mock.patch('rareapi.jobs.random.uniform', return_value=1):
+            self.assertEqual([jobs.backoff(attempts) for attempts in (1, 2, 3)],
+                             [jobs.BACKOFF_BASE, jobs.BACKOFF_BASE * 2, jobs.BACKOFF_BASE * 4])
+            self.assertEqual(jobs.backoff(50), jobs.BACKOFF_MAX)
+
+    def test_expired_lease_is_retried(self):
+        jobs.enqueue('record')
+        jobs.enqueue('record')
+        stuck, fresh = jobs.claim('worker', 2)
+        Job.objects.filter(pk=stuck.pk).update(
+            locked_at=timezone.now() - timedelta(seconds=jobs.LEASE + 1))
+        self.assertEqual(jobs.expire_leases(), 1)
+        statuses = dict(Job.objects.values_list('pk', 'status'))
+        self.assertEqual((statuses[stuck.pk], statuses[fresh.pk]), (Job.QUEUED, Job.RUNNING))
+        self.assertIn('Lease of worker expired', Job.objects.get(pk=stuck.pk).last_error)
+
+        # A worker that comes back late can't finish a job it lost
+        jobs.run(stuck)
+        self.assertEqual(Job.objects.get(pk=stuck.pk).status, Job.QUEUED)
+
+
+class RecountTaskTests(TestCase):
+
+    def setUp(self):
+        connections = mock.patch('rareapi.jobs.close_old_connections')
+        connections.start()
+        self.addCleanup(connections.stop)
+
+    def test_bulk_comments_are_counted_by_a_job(self):
+        user = User.objects.create_user(username='writer', password='x')
+        author = RareUser.objects.create(user=user, bio='')
+        post = Post.objects.create(
+            author=author, category=Category.objects.create(label='News'), title='First',
+            image_url='http://localhost/1.png', content='Body')
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post(
+            '/comments/bulk', [{'postId': post.pk, 'content': 'Hi'}] * 3, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Post.objects.get(pk=post.pk).comment_count, 0)
+
+        job = Job.objects.get(name='recount_posts')
+        self.assertEqual(job.args, {'post_ids': [post.pk]})
+        jobs.run(jobs.claim('worker', 1)[0])
+        latest = Comment.objects.latest('created_on').created_on
+        counted = Post.objects.values_list('comment_count', 'last_comment_at').get(pk=post.pk)
+        self.assertEqual(counted, (3, latest))
+
+        # Safe to run again, as after a retry
+        jobs.TASKS['recount_posts'](**job.args)
+        self.assertEqual(
+            Post.objects.values_list('comment_count', 'last_comment_at').get(pk=post.pk), counted)
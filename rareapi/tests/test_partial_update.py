@@ -0,0 +1,149 @@
+"""PATCH requests and the version numbers behind them"""
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rareapi.models import Category, Comment, Post, RareUser, Tag
+
+
+class PartialUpdateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = RareUser.objects.create(
+            user=User.objects.create_user(username='author', password='x'), bio='')
+        cls.other = RareUser.objects.create(
+            user=User.objects.create_user(username='other', password='x'), bio='')
+        cls.admin = User.objects.create_user(username='admin', password='x', is_staff=True)
+        cls.category = Category.objects.create(label='News')
+        cls.post = Post.objects.create(
+            author=cls.author, category=cls.category, title='Before',
+            image_url='http://localhost/1.png', content='Body')
+        cls.second = Post.objects.create(
+            author=cls.author, category=cls.category, title='Second',
+            image_url='http://localhost/2.png', content='Body')
+        cls.comment = Comment.objects.create(post=cls.post, author=cls.author, content='Hi')
+        Post.objects.filter(pk=cls.post.pk).update(comment_count=1)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def test_owner_edit_bumps_version(self):
+        response = self.client_for(self.author.user).patch(
+            f'/posts/{self.post.pk}', {'title': 'After', 'version': 1}, format='json')
+        self.assertEqual(response.status_code, 204)
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual((post.title, post.version, post.content), ('After', 2, 'Body'))
+
+    def test_stale_version_is_refused(self):
+        Post.objects.filter(pk=self.post.pk).update(version=3)
+        response = self.client_for(self.author.user).patch(
+            f'/posts/{self.post.pk}', {'title': 'After', 'version': 2}, format='json')
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(response.json()['version'], 3)
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual((post.title, post.version), ('Before', 3))
+
+    def test_without_version_always_applies(self):
+        Post.objects.filter(pk=self.post.pk).update(version=7)
+        response = self.client_for(self.author.user).patch(
+            f'/posts/{self.post.pk}', {'content': 'New body'}, format='json')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).version, 8)
+
+    def test_non_owner_is_forbidden(self):
+        for path in (f'/posts/{self.post.pk}', f'/comments/{self.comment.pk}'):
+            with self.subTest(path=path):
+                response = self.client_for(self.other.user).patch(
+                    path, {'content': 'Mine now'}, format='json')
+                self.assertEqual(response.status_code, 403)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).version, 1)
+        self.assertEqual(Comment.objects.get(pk=self.comment.pk).content, 'Hi')
+
+    def test_admin_may_edit_any_post(self):
+        response = self.client_for(self.admin).patch(
+            f'/posts/{self.post.pk}', {'approved': True, 'title': 'Edited'}, format='json')
+        self.assertEqual(response.status_code, 204)
+        post = Post.objects.get(pk=self.post.pk)
+        # approved is not a field a PATCH may change
+        self.assertEqual((post.title, post.approved), ('Edited', False))
+
+    def test_invalid_input(self):
+        client = self.client_for(self.author.user)
+        bodies = [
+            {'image_url': 'not a url'},
+            {'category_id': 999999},
+            {'title': 'x' * 101},
+            {'title': 'After', 'version': 'one'},
+            {},
+        ]
+        for body in bodies:
+            with self.subTest(body=body):
+                response = client.patch(f'/posts/{self.post.pk}', body, format='json')
+                self.assertEqual(response.status_code, 400)
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual((post.title, post.version), ('Before', 1))
+
+    def test_missing_row(self):
+        response = self.client_for(self.author.user).patch(
+            '/posts/999999', {'title': 'After'}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_moving_a_comment_recounts_both_posts(self):
+        response = self.client_for(self.author.user).patch(
+            f'/comments/{self.comment.pk}', {'postId': self.second.pk, 'version': 1},
+            format='json')
+        self.assertEqual(response.status_code, 204)
+        counts = dict(Post.objects.values_list('pk', 'comment_count'))
+        self.assertEqual((counts[self.post.pk], counts[self.second.pk]), (0, 1))
+        self.assertEqual(Comment.objects.get(pk=self.comment.pk).version, 2)
+
+    def test_moderation_moves_the_version(self):
+        response = self.client_for(self.admin).put(f'/posts/{self.post.pk}/approve')
+        self.assertEqual(response.status_code, 204)
+        response = self.client_for(self.author.user).patch(
+            f'/posts/{self.post.pk}', {'title': 'After', 'version': 1}, format='json')
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(response.json()['version'], 2)
+
+    def test_tagging_moves_the_version(self):
+        tag = Tag.objects.create(label='python')
+        client = self.client_for(self.author.user)
+        response = client.post(f'/posts/{self.post.pk}/tags', {'tag_ids': [tag.pk]}, format='json')
+        self.assertEqual(response.status_code, 204)
+        response = client.patch(
+            f'/posts/{self.post.pk}', {'title': 'After', 'version': 1}, format='json')
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).title, 'Before')
+
+    def test_category_version(self):
+        client = self.client_for(self.admin)
+        response = client.patch(
+            f'/categories/{self.category.pk}', {'label': 'World', 'version': 1}, format='json')
+        self.assertEqual(response.status_code, 204)
+        response = client.patch(
+            f'/categories/{self.category.pk}', {'label': 'Late', 'version': 1}, format='json')
+        self.assertEqual(response.status_code, 412)
+        category = Category.objects.get(pk=self.category.pk)
+        self.assertEqual((category.label, category.version), ('World', 2))
+
+
+class VersionedSaveTests(TestCase):
+
+    def test_save_bumps_and_reads_back_the_version(self):
+        category = Category.objects.create(label='News')
+        self.assertEqual(category.version, 1)
+        category.label = 'World'
+        category.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(category.version, 2)
+        category.save(update_fields=['label'])
+        self.assertEqual(category.version, 3)
+        self.assertEqual(Category.objects.get(pk=category.pk).version, 3)
+
+    def test_save_counts_writes_it_did_not_see(self):
+        category = Category.objects.create(label='News')
+        Category.objects.filter(pk=category.pk).update(version=5)
+        category.save()
+        self.assertEqual(category.version, 6)
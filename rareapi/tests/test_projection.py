@@ -0,0 +1,137 @@
+"""Projections against the serializers they stand in for"""
+from datetime import datetime, timezone as dt_timezone
+from itertools import chain, combinations
+from unittest import mock
+from django.contrib.auth.models import Group, Permission, User
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rareapi.models import Category, Comment, Post, RareUser, Tag
+from rareapi.projection import projection_for
+from rareapi.renderers import JSONRenderer
+from rareapi.views.category import CategorySerializer
+from rareapi.views.comment import CommentSerializer
+from rareapi.views.post import PostSerializer
+from rareapi.views.rareuser import RareUserSerializer
+from rareapi.views.tag import TagSerializer
+
+SERIALIZERS = (PostSerializer, CommentSerializer, RareUserSerializer,
+               CategorySerializer, TagSerializer)
+
+
+def fieldsets(serializer_class):
+    """Every fields= value worth checking, with every expand= subset
+
+    fields= is absent, every field, each field alone or every field but
+    one; expand= is each subset of the relations.
+
+    Yields:
+        dict -- query parameters
+    """
+    names = list(serializer_class.Meta.fields)
+    relations = list(getattr(serializer_class.Meta, 'loads', {}))
+    selections = [None, names]
+    selections += [[name] for name in names]
+    selections += [[other for other in names if other != name] for name in names]
+    expansions = chain.from_iterable(
+        combinations(relations, size) for size in range(len(relations) + 1))
+    for expand in list(expansions):
+        for fields in selections:
+            params = {}
+            if fields is not None:
+                params['fields'] = ','.join(fields)
+            if expand:
+                params['expand'] = ','.join(expand)
+            yield params
+
+
+class ProjectionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        editors = Group.objects.create(name='editors')
+        editors.permissions.set(Permission.objects.filter(codename__endswith='_post'))
+        staff = User.objects.create_user(
+            username='staff', password='x', first_name='Sta', last_name='Ff', is_staff=True)
+        staff.groups.add(editors)
+        staff.user_permissions.set(Permission.objects.filter(codename__endswith='_tag'))
+        reader = User.objects.create_user(username='reader', password='x')
+        author = RareUser.objects.create(
+            user=staff, bio='Writes', profile_image_url='http://localhost/staff.png')
+        commenter = RareUser.objects.create(user=reader, bio='', active=False)
+
+        news = Category.objects.create(label='News')
+        other = Category.objects.create(label='Other')
+        tags = [Tag.objects.create(label=label) for label in ('a', 'b', 'c')]
+
+        posts = [
+            Post.objects.create(
+                author=author, category=news, title='First', approved=True,
+                image_url='http://localhost/1.png', content='One'),
+            Post.objects.create(
+                author=author, category=other, title='Second',
+                image_url='http://localhost/2.png', content='Two', comment_count=2,
+                last_comment_at=datetime(2024, 2, 29, 23, 59, 59, 123456, dt_timezone.utc)),
+            Post.objects.create(
+                author=commenter, category=news, title='Third', rejected=True,
+                image_url='http://localhost/3.png', content='Three'),
+        ]
+        posts[0].tags.set(tags[:2])
+        posts[1].tags.set(tags[2:])
+        # Whole seconds and microseconds both
+        Post.objects.filter(pk=posts[2].pk).update(
+            publication_date=datetime(2023, 6, 1, 12, 0, 0, tzinfo=dt_timezone.utc))
+
+        Comment.objects.create(post=posts[1], author=commenter, content='Hi')
+        Comment.objects.create(post=posts[1], author=author, content='Hello')
+
+    def assertSameData(self, serializer_class, params):
+        request = Request(APIRequestFactory().get('/', params))
+        queryset = serializer_class.Meta.model.objects.order_by('pk')
+
+        projection = projection_for(serializer_class, request)
+        self.assertIsNotNone(projection)
+        projected = projection.data(projection.queryset(queryset))
+
+        serializer = serializer_class(
+            serializer_class.setup_eager_loading(queryset, request),
+            many=True, context={'request': request})
+        expected = serializer.data
+
+        self.assertEqual(projected, expected)
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(projected), renderer.render(expected))
+
+    def test_every_fieldset(self):
+        for serializer_class in SERIALIZERS:
+            for params in fieldsets(serializer_class):
+                with self.subTest(serializer=serializer_class.__name__, **params):
+                    self.assertSameData(serializer_class, params)
+
+    def test_current_time_zone(self):
+        with timezone.override('America/New_York'):
+            for serializer_class in (PostSerializer, CommentSerializer, RareUserSerializer):
+                with self.subTest(serializer=serializer_class.__name__):
+                    self.assertSameData(serializer_class, {})
+
+    def test_unknown_names_are_ignored(self):
+        self.assertSameData(PostSerializer, {'fields': 'id,nope', 'expand': 'author,nope'})
+
+    def test_pages_match(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(username='staff'))
+        paths = ('/posts?limit=2', '/posts?limit=2&offset=2', '/posts?paginate=cursor',
+                 '/posts?fields=id,tags', '/comments?expand=author&fields=id,author',
+                 '/rareusers', '/rareusers?paginate=cursor', '/categories', '/tags')
+        for path in paths:
+            with self.subTest(path=path):
+                projected = client.get(path)
+                # Categories and tags would come back from the response cache
+                cache.clear()
+                with mock.patch('rareapi.pagination.projection_for', return_value=None):
+                    serialized = client.get(path)
+                self.assertEqual(projected.status_code, 200)
+                self.assertTrue(projected.json()['results'])
+                self.assertEqual(projected.content, serialized.content)
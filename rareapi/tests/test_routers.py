@@ -0,0 +1,97 @@
+"""Replica routing: reads of safe requests, stickiness and health checks"""
+from unittest import mock
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rareapi.middleware import ReplicaReadsMiddleware
+from rareapi.models import Post
+from rareapi.routers import ReplicaRouter, begin_reads, end_reads
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'],
+                   REPLICA_HEALTH_CHECK_INTERVAL=10)
+class ReplicaRouterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.healthy = {'replica1': True, 'replica2': True}
+        probe = mock.patch('rareapi.routers.probe', side_effect=lambda alias: self.healthy[alias])
+        self.probe = probe.start()
+        self.addCleanup(probe.stop)
+
+    def reads(self):
+        token = begin_reads()
+        self.addCleanup(end_reads, token)
+
+    def test_primary_outside_safe_requests(self):
+        self.assertEqual(self.router.db_for_read(Post), DEFAULT_DB_ALIAS)
+
+    def test_sticks_to_one_replica(self):
+        self.reads()
+        alias = self.router.db_for_read(Post)
+        self.assertIn(alias, self.healthy)
+        self.assertEqual({self.router.db_for_read(Post) for _ in range(5)}, {alias})
+
+    def test_requests_take_turns(self):
+        aliases = []
+        for _ in range(4):
+            token = begin_reads()
+            aliases.append(self.router.db_for_read(Post))
+            end_reads(token)
+        self.assertEqual(aliases, ['replica1', 'replica2', 'replica1', 'replica2'])
+
+    def test_primary_after_a_write(self):
+        self.reads()
+        self.assertNotEqual(self.router.db_for_read(Post), DEFAULT_DB_ALIAS)
+        self.assertEqual(self.router.db_for_write(Post), DEFAULT_DB_ALIAS)
+        self.assertEqual(self.router.db_for_read(Post), DEFAULT_DB_ALIAS)
+
+    def test_a_write_only_affects_its_request(self):
+        token = begin_reads()
+        self.router.db_for_write(Post)
+        end_reads(token)
+        self.reads()
+        self.assertNotEqual(self.router.db_for_read(Post), DEFAULT_DB_ALIAS)
+
+    def test_primary_inside_transactions(self):
+        self.reads()
+        with mock.patch.object(connections[DEFAULT_DB_ALIAS], 'in_atomic_block', True):
+            self.assertEqual(self.router.db_for_read(Post), DEFAULT_DB_ALIAS)
+
+    def test_tokens_read_from_primary(self):
+        self.reads()
+        self.assertEqual(self.router.db_for_read(Token), DEFAULT_DB_ALIAS)
+
+    def test_unhealthy_replica_skipped(self):
+        self.healthy['replica1'] = False
+        for _ in range(2):
+            token = begin_reads()
+            self.assertEqual(self.router.db_for_read(Post), 'replica2')
+            end_reads(token)
+        self.assertEqual(self.router.health(), {'replica1': False, 'replica2': True})
+
+    def test_primary_when_none_healthy(self):
+        self.healthy.update(replica1=False, replica2=False)
+        self.reads()
+        self.assertEqual(self.router.db_for_read(Post), DEFAULT_DB_ALIAS)
+
+    def test_probes_are_cached(self):
+        with mock.patch('rareapi.routers.time.monotonic', return_value=100):
+            self.assertTrue(self.router.healthy('replica1'))
+            self.healthy['replica1'] = False
+            self.assertTrue(self.router.healthy('replica1'))
+        with mock.patch('rareapi.routers.time.monotonic', return_value=111):
+            self.assertFalse(self.router.healthy('replica1'))
+        self.assertEqual(self.probe.call_count, 2)
+
+    def test_middleware_scopes_safe_methods(self):
+        aliases = {}
+
+        def view(request):
+            aliases[request.method] = self.router.db_for_read(Post)
+
+        middleware = ReplicaReadsMiddleware(view)
+        for method in ('get', 'post'):
+            middleware(getattr(RequestFactory(), method)('/posts'))
+        self.assertEqual(aliases, {'GET': 'replica1', 'POST': DEFAULT_DB_ALIAS})
+        self.assertEqual(self.router.db_for_read(Post), DEFAULT_DB_ALIAS)
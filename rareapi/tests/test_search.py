@@ -0,0 +1,85 @@
+"""Full-text search of posts with ?q="""
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rareapi.models import Category, Post, RareUser
+from rareapi.search import MAX_TERMS, match_expression
+
+
+class MatchExpressionTests(TestCase):
+
+    def test_words_are_quoted(self):
+        self.assertEqual(match_expression('django OR "orm" (NEAR'), '"django" "OR" "orm" "NEAR"')
+
+    def test_no_words(self):
+        self.assertIsNone(match_expression(' "*( '))
+
+    def test_long_queries_are_cut(self):
+        self.assertEqual(match_expression(' '.join(['word'] * 50)).count('"word"'), MAX_TERMS)
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='writer', password='x')
+        cls.author = RareUser.objects.create(user=cls.user, bio='')
+        cls.category = Category.objects.create(label='News')
+        cls.passing = cls.new_post(
+            'Gardening', 'A long piece about tomatoes that mentions django only once, '
+            'among many other words about soil, seeds, water and sunlight.')
+        cls.focused = cls.new_post('Django', 'Django models and django views.')
+        cls.running = cls.new_post('Morning runs', 'She runs by the river.')
+
+    @classmethod
+    def new_post(cls, title, content):
+        return Post.objects.create(
+            author=cls.author, category=cls.category, title=title,
+            image_url='http://localhost/1.png', content=content)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, q):
+        response = self.client.get('/posts', {'q': q})
+        self.assertEqual(response.status_code, 200)
+        return [post['id'] for post in response.json()['results']]
+
+    def test_best_match_first(self):
+        self.assertEqual(self.search('django'), [self.focused.pk, self.passing.pk])
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.search('django tomatoes'), [self.passing.pk])
+        self.assertEqual(self.search('django river'), [])
+
+    def test_stemming(self):
+        self.assertEqual(self.search('running'), [self.running.pk])
+
+    def test_operators_are_plain_words(self):
+        self.assertEqual(self.search('django OR'), [])
+        self.assertEqual(self.search('"django*'), [self.focused.pk, self.passing.pk])
+        self.assertEqual(self.search('()'), [])
+
+    def test_index_follows_writes(self):
+        self.client.patch(f'/posts/{self.running.pk}', {'title': 'Evening swims'}, format='json')
+        self.assertEqual(self.search('evening'), [self.running.pk])
+        self.assertEqual(self.search('morning'), [])
+
+        Post.objects.filter(pk=self.focused.pk).update(content='Nothing relevant')
+        self.assertEqual(self.search('views'), [])
+
+        added = self.new_post('Fresh', 'Just written')
+        self.assertEqual(self.search('fresh'), [added.pk])
+
+    def test_deleted_posts_are_left_out(self):
+        self.client.delete(f'/posts/{self.focused.pk}')
+        self.assertEqual(self.search('django'), [self.passing.pk])
+
+    def test_ordering_parameter_wins(self):
+        response = self.client.post(
+            '/comments', {'postId': self.passing.pk, 'content': 'Hi'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.get('/posts', {'q': 'django', 'ordering': '-last_comment_at'})
+        self.assertEqual([post['id'] for post in response.json()['results']],
+                         [self.passing.pk, self.focused.pk])
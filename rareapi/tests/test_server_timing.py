@@ -0,0 +1,38 @@
+"""Server-Timing is only sent to staff, or to everyone with DEBUG on"""
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rareapi.authentication import token_cache
+
+
+class ServerTimingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', is_staff=True)
+        cls.user = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        token_cache.clear()
+        self.client = APIClient()
+
+    def get_as(self, user):
+        key = Token.objects.get_or_create(user=user)[0].key
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+        return self.client.get('/categories')
+
+    def test_staff(self):
+        response = self.get_as(self.admin)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+    def test_other_users(self):
+        response = self.get_as(self.user)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
+        self.assertNotIn('Server-Timing', APIClient().get('/categories'))
+
+    @override_settings(DEBUG=True)
+    def test_debug(self):
+        self.assertIn('Server-Timing', self.get_as(self.user))
@@ -0,0 +1,101 @@
+"""DELETE requests that only mark rows, and what they hide"""
+import json
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rareapi import purge
+from rareapi.models import Category, Comment, Post, RareUser
+
+
+class SoftDeleteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', password='x', is_staff=True)
+        cls.author = RareUser.objects.create(user=cls.admin, bio='')
+        cls.category = Category.objects.create(label='News')
+        cls.post = Post.objects.create(
+            author=cls.author, category=cls.category, title='Gone',
+            image_url='http://localhost/1.png', content='Body')
+        cls.kept = Post.objects.create(
+            author=cls.author, category=cls.category, title='Kept',
+            image_url='http://localhost/2.png', content='Body')
+        cls.comment = Comment.objects.create(post=cls.post, author=cls.author, content='Hi')
+        Comment.objects.create(post=cls.kept, author=cls.author, content='Hello')
+        cls.writer = RareUser.objects.create(
+            user=User.objects.create_user(username='writer', password='x'), bio='')
+        cls.sports = Category.objects.create(label='Sports')
+        cls.by_writer = Post.objects.create(
+            author=cls.writer, category=cls.category, title='By writer',
+            image_url='http://localhost/3.png', content='Body')
+        cls.in_sports = Post.objects.create(
+            author=cls.author, category=cls.sports, title='In sports',
+            image_url='http://localhost/4.png', content='Body')
+        Comment.objects.create(post=cls.in_sports, author=cls.author, content='Goal')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_deleted_at_is_not_sent(self):
+        for path in ('/posts', f'/posts/{self.post.pk}', '/posts/export', '/rareusers'):
+            with self.subTest(path=path):
+                response = self.client.get(path)
+                if response.streaming:
+                    content = b''.join(response.streaming_content)
+                else:
+                    content = response.content
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn(b'deleted_at', content)
+
+    def test_comments_of_deleted_posts_are_hidden(self):
+        self.assertEqual(self.client.delete(f'/posts/{self.post.pk}').status_code, 204)
+        listed = self.client.get('/comments').json()
+        self.assertEqual(sorted(comment['content'] for comment in listed['results']),
+                         ['Goal', 'Hello'])
+        self.assertEqual(self.client.get(f'/comments?postId={self.post.pk}').json()['count'], 0)
+        # retrieve answers a missing comment as it always has, with an error
+        self.assertNotEqual(self.client.get(f'/comments/{self.comment.pk}').status_code, 200)
+        self.assertEqual(Comment.all_objects.count(), 3)
+
+        purge.purge()
+        self.assertFalse(Post.all_objects.filter(pk=self.post.pk).exists())
+        self.assertEqual(Comment.all_objects.count(), 2)
+
+    def visible(self, post):
+        """Where post shows up: its own URL, the list, search and the export"""
+        listed = {result['id'] for result in self.client.get('/posts').json()['results']}
+        found = {result['id'] for result in self.client.get('/posts?q=body').json()['results']}
+        exported = b''.join(self.client.get('/posts/export').streaming_content)
+        exported = {json.loads(line)['id'] for line in exported.splitlines()}
+        return {
+            'retrieve': self.client.get(f'/posts/{post.pk}').status_code == 200,
+            'list': post.pk in listed,
+            'search': post.pk in found,
+            'export': post.pk in exported,
+        }
+
+    def assertHidden(self, post):
+        self.assertEqual(self.visible(post),
+                         {'retrieve': False, 'list': False, 'search': False, 'export': False})
+        self.assertTrue(self.visible(self.kept)['list'])
+
+    def test_posts_of_deleted_categories_are_hidden(self):
+        self.assertTrue(all(self.visible(self.in_sports).values()))
+        self.assertEqual(self.client.delete(f'/categories/{self.sports.pk}').status_code, 204)
+        self.assertHidden(self.in_sports)
+        self.assertNotIn('Goal', [comment['content'] for comment in
+                                  self.client.get('/comments').json()['results']])
+
+        purge.purge()
+        self.assertFalse(Post.all_objects.filter(pk=self.in_sports.pk).exists())
+        self.assertFalse(Category.all_objects.filter(pk=self.sports.pk).exists())
+
+    def test_posts_of_deleted_users_are_hidden(self):
+        self.assertTrue(all(self.visible(self.by_writer).values()))
+        self.assertEqual(self.client.delete(f'/rareusers/{self.writer.pk}').status_code, 204)
+        self.assertHidden(self.by_writer)
+
+        purge.purge()
+        self.assertFalse(Post.all_objects.filter(pk=self.by_writer.pk).exists())
+        self.assertFalse(RareUser.all_objects.filter(pk=self.writer.pk).exists())
@@ -0,0 +1,63 @@
+"""The ?tag= and ?tagMatch= filters of the post list"""
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rareapi.models import Category, Post, PostTag, RareUser, Tag
+
+
+class TagFilterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='writer', password='x')
+        author = RareUser.objects.create(user=cls.user, bio='')
+        category = Category.objects.create(label='News')
+        cls.python, cls.sql, cls.web = (
+            Tag.objects.create(label=label) for label in ('python', 'sql', 'web'))
+        cls.posts = {}
+        for title, tags in (('both', [cls.python, cls.sql]), ('python', [cls.python]),
+                            ('sql', [cls.sql]), ('none', [])):
+            post = Post.objects.create(
+                author=author, category=category, title=title,
+                image_url='http://localhost/1.png', content='Body')
+            PostTag.objects.bulk_create(PostTag(post=post, tag=tag) for tag in tags)
+            cls.posts[title] = post
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def titles(self, query):
+        response = self.client.get(f'/posts?{query}')
+        self.assertEqual(response.status_code, 200)
+        return sorted(post['title'] for post in response.json()['results'])
+
+    def test_single_tag(self):
+        self.assertEqual(self.titles(f'tag={self.python.pk}'), ['both', 'python'])
+
+    def test_any_tag(self):
+        self.assertEqual(self.titles(f'tag={self.python.pk},{self.sql.pk}'),
+                         ['both', 'python', 'sql'])
+        self.assertEqual(self.titles(f'tag={self.python.pk}&tag={self.sql.pk}'),
+                         ['both', 'python', 'sql'])
+
+    def test_all_tags(self):
+        self.assertEqual(self.titles(f'tag={self.python.pk},{self.sql.pk}&tagMatch=all'),
+                         ['both'])
+        self.assertEqual(self.titles(f'tag={self.python.pk}&tag={self.sql.pk}&tagMatch=all'),
+                         ['both'])
+        self.assertEqual(self.titles(f'tag={self.python.pk},{self.web.pk}&tagMatch=all'), [])
+
+    def test_repeated_tag_counts_once(self):
+        self.assertEqual(self.titles(f'tag={self.python.pk},{self.python.pk}&tagMatch=all'),
+                         ['both', 'python'])
+
+    def test_unused_tag(self):
+        self.assertEqual(self.titles(f'tag={self.web.pk}'), [])
+
+    def test_without_filter(self):
+        self.assertEqual(self.titles(''), ['both', 'none', 'python', 'sql'])
+
+    def test_combined_with_search(self):
+        self.assertEqual(self.titles(f'tag={self.sql.pk}&q=both'), ['both'])
+        self.assertEqual(self.titles(f'tag={self.sql.pk}&q=python'), [])
@@ -0,0 +1,89 @@
+"""Token authentication through the in-process cache"""
+from unittest import mock
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rareapi.authentication import TokenCache, token_cache
+from rareapi.models import RareUser
+
+
+class CachedTokenAuthenticationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', password='x')
+        cls.rareuser = RareUser.objects.create(user=cls.user, bio='Before')
+        cls.token = Token.objects.create(user=cls.user)
+        cls.admin = User.objects.create_user(username='admin', password='x', is_staff=True)
+
+    def setUp(self):
+        token_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def profile(self):
+        return self.client.get('/myprofile')
+
+    def test_second_request_skips_the_token_query(self):
+        self.assertEqual(self.profile().status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.profile().status_code, 200)
+        self.assertFalse([query for query in queries if 'authtoken_token' in query['sql']])
+        self.assertEqual((token_cache.stats()['misses'], token_cache.stats()['hits']), (1, 1))
+
+    def test_deleted_token_stops_authenticating(self):
+        self.assertEqual(self.profile().status_code, 200)
+        Token.objects.get(key=self.token.key).delete()
+        self.assertEqual(self.profile().status_code, 401)
+
+    def test_deactivated_user_stops_authenticating(self):
+        self.assertEqual(self.profile().status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.profile().status_code, 401)
+
+    def test_changed_rareuser_is_reloaded(self):
+        self.assertEqual(self.profile().json()['rareuser']['bio'], 'Before')
+        rareuser = RareUser.objects.get(pk=self.rareuser.pk)
+        rareuser.bio = 'After'
+        rareuser.save()
+        self.assertEqual(self.profile().json()['rareuser']['bio'], 'After')
+
+    def test_deleted_rareuser_stops_authenticating(self):
+        self.assertEqual(self.profile().status_code, 200)
+        admin = APIClient()
+        admin.force_authenticate(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(admin.delete(f'/rareusers/{self.rareuser.pk}').status_code, 204)
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.assertEqual(self.profile().status_code, 401)
+
+    def test_unknown_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token nope')
+        self.assertEqual(self.profile().status_code, 401)
+        self.assertEqual(token_cache.stats()['size'], 0)
+
+
+class TokenCacheTests(TestCase):
+
+    def test_least_recently_used_goes_first(self):
+        cache = TokenCache(max_size=2, ttl=60)
+        cache.set('a', 'A')
+        cache.set('b', 'B')
+        cache.get('a')
+        cache.set('c', 'C')
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), ('A', None, 'C'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_entries_expire(self):
+        cache = TokenCache(max_size=2, ttl=60)
+        with mock.patch('rareapi.authentication.time.monotonic', return_value=1000.0):
+            cache.set('a', 'A')
+        with mock.patch('rareapi.authentication.time.monotonic', return_value=1059.0):
+            self.assertEqual(cache.get('a'), 'A')
+        with mock.patch('rareapi.authentication.time.monotonic', return_value=1060.0):
+            self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['size'], 0)
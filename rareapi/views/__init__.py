@@ -1,5 +1,7 @@
 from .auth import login_user
 from .auth import register_user
+from .auth import token_cache_stats
+from .metrics import prometheus_metrics
 from .category import CategoryView
 from .tag import TagView
 from .post import PostView
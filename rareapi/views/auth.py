@@ -1,9 +1,10 @@
 from django.contrib.auth import authenticate
 from rest_framework.authtoken.models import Token
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.response import Response
 from rareapi.models import RareUser
+from rareapi.authentication import token_cache
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -72,3 +73,14 @@ def register_user(request):
             'token': token.key 
            }
     return Response(data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def token_cache_stats(request):
+    '''Reports hit rates of the in-process token cache for sizing it
+
+    Method arguments:
+      request -- The full HTTP request object
+    '''
+    return Response(token_cache.stats())
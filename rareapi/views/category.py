@@ -1,14 +1,20 @@
 """View module for handling requests about categories"""
 from django.http import HttpResponseServerError
 from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.viewsets import ViewSet
 from rest_framework.response import Response
 from rest_framework import serializers
 from rareapi.models import Category
+from rareapi import partial, tasks
+from rareapi.caching import bump_version, cached_response
+from rareapi.fieldsets import SparseFieldsMixin
+from rareapi.pagination import PaginatedViewMixin
 
 
-class CategoryView(ViewSet):
+class CategoryView(PaginatedViewMixin, ViewSet):
     """Category types"""
     
     def create(self, request):
@@ -30,6 +36,7 @@ class CategoryView(ViewSet):
             return Response({"reason": ex.message}, status=status.HTTP_400_BAD_REQUEST)
 
 
+    @cached_response('category')
     def retrieve(self, request, pk=None):
         """Handle GET requests for single category
 
@@ -37,26 +44,23 @@ class CategoryView(ViewSet):
             Response -- JSON serialized category
         """
         try:
-            category_type = Category.objects.get(pk=pk)
+            category_types = CategorySerializer.setup_eager_loading(Category.objects.all(), request)
+            category_type = category_types.get(pk=pk)
             serializer = CategorySerializer(category_type, context={'request': request})
             return Response(serializer.data)
         except Exception as ex:
             return HttpResponseServerError(ex)
 
+    @cached_response('category')
     def list(self, request):
         """Handle GET requests to get all categories
 
         Returns:
-            Response -- JSON serialized list of categories
+            Response -- JSON serialized page of categories
         """
-        category_types = Category.objects.all()
-
-        # Note the addtional `many=True` argument to the
-        # serializer. It's needed when you are serializing
-        # a list of objects instead of a single object.
-        serializer = CategorySerializer(
-            category_types, many=True, context={'request': request})
-        return Response(serializer.data)
+        category_types = CategorySerializer.setup_eager_loading(Category.objects.all(), request)
+
+        return self.paginated_response(category_types, CategorySerializer)
     
     def update(self, request, pk=None):
         """Handle PUT requests for a category
@@ -73,27 +77,43 @@ class CategoryView(ViewSet):
         return Response({}, status=status.HTTP_204_NO_CONTENT)
     
     
-    def destroy(self, request, pk=None):
-        """Handle DELETE requests for a single post
+    def partial_update(self, request, pk=None):
+        """Handle PATCH requests for a category
+
+        Changes only the fields sent, with one UPDATE. Sending the category's
+        version makes the edit conditional on nobody having changed it since.
 
         Returns:
-            Response -- 200, 404, or 500 status code
+            Response -- 204, or 400, 404 or 412 status code
         """
-        try:
-            category = Category.objects.get(pk=pk)
-            category.delete()
-
-            return Response({}, status=status.HTTP_204_NO_CONTENT)
+        response = partial.partial_update(request, Category.objects.all(), pk, CategorySerializer)
+        if response.status_code == status.HTTP_204_NO_CONTENT:
+            # UPDATE sends no post_save, so retire cached category pages here
+            transaction.on_commit(lambda: bump_version('category'))
+        return response
+    
+    
+    def destroy(self, request, pk=None):
+        """Handle DELETE requests for a single category
 
-        except Category.DoesNotExist as ex:
-            return Response({'message': ex.args[0]}, status=status.HTTP_404_NOT_FOUND)
+        Marks the category deleted and queues a purge job, which removes
+        it with its posts later, so this costs the same for any category.
 
-        except Exception as ex:
-            return Response({'message': ex.args[0]}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        Returns:
+            Response -- 204 or 404 status code
+        """
+        with transaction.atomic():
+            if not Category.objects.filter(pk=pk).update(deleted_at=timezone.now()):
+                return Response({'message': 'Category matching query does not exist.'},
+                                status=status.HTTP_404_NOT_FOUND)
+            # UPDATE sends no post_delete, so retire cached category pages here
+            transaction.on_commit(lambda: bump_version('category'))
+            tasks.purge_soon()
+        return Response({}, status=status.HTTP_204_NO_CONTENT)
 
     
     
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """JSON serializer for categories
 
     Arguments:
@@ -101,4 +121,5 @@ class CategorySerializer(serializers.ModelSerializer):
     """
     class Meta:
         model = Category
-        fields = ('id', 'label')
\ No newline at end of file
+        fields = ('id', 'label', 'version')
+        read_only_fields = ('version',)
\ No newline at end of file
@@ -1,15 +1,25 @@
 """View module for handling requests about comments"""
+from django.db import transaction
 from django.http import HttpResponseServerError
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser
 from rest_framework.viewsets import ViewSet
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework import serializers
 from rareapi.models import Comment, RareUser, Post
 from django.core.exceptions import ValidationError
+from rareapi import activity, bulk, jobs, partial
+from rareapi.authentication import get_rareuser
+from rareapi.caching import aconditional_response, conditional_response
+from rareapi.export import EXPORT_RENDERERS, filter_since, ndjson_response
+from rareapi.fieldsets import Load, SparseFieldsMixin
+from rareapi.pagination import PaginatedViewMixin, CommentCursorPagination
 
 
-class CommentView(ViewSet):
+class CommentView(PaginatedViewMixin, ViewSet):
     """One Comment"""
+    cursor_pagination_class = CommentCursorPagination
 
     def retrieve(self, request, pk=None):
         """Handle GET requests for single comment
@@ -18,27 +28,97 @@ class CommentView(ViewSet):
             Response -- JSON serialized comment
         """
         try:
-            comment = Comment.objects.get(pk=pk)
-            serializer = CommentSerializer(comment, context={'request': request})
-            return Response(serializer.data)
+            comments = CommentSerializer.setup_eager_loading(Comment.objects.filter(pk=pk), request)
+
+            def render():
+                serializer = CommentSerializer(comments.get(), context={'request': request})
+                return Response(serializer.data)
+
+            # Comments embed a post summary and their author
+            return conditional_response(
+                request, comments, render, namespaces=('post', 'rareuser'))
         except Exception as ex:
             return HttpResponseServerError(ex)
         
 
+    async def aretrieve(self, request, pk=None):
+        """retrieve() for rareapi.asyncviews
+
+        Returns:
+            Response -- JSON serialized comment
+        """
+        try:
+            comments = CommentSerializer.setup_eager_loading(Comment.objects.filter(pk=pk), request)
+
+            async def render():
+                serializer = CommentSerializer(
+                    await comments.aget(), context={'request': request})
+                return Response(serializer.data)
+
+            return await aconditional_response(
+                request, comments, render, namespaces=('post', 'rareuser'))
+        except Exception as ex:
+            return HttpResponseServerError(ex)
+
+
     def list(self, request):
         """Handle GET requests to get all comments
 
         Returns:
-            Response -- JSON serialized list of comments
+            Response -- JSON serialized page of comments
         """
-        comments = Comment.objects.all()
-
-        # Note the addtional `many=True` argument to the
-        # serializer. It's needed when you are serializing
-        # a list of objects instead of a single object.
-        serializer = CommentSerializer(
-            comments, many=True, context={'request': request})
-        return Response(serializer.data)
+        comments = self.listed_comments()
+        return conditional_response(
+            request, comments, lambda: self.paginated_response(comments, CommentSerializer),
+            namespaces=('post', 'rareuser'))
+
+
+    async def alist(self, request):
+        """list() for rareapi.asyncviews
+
+        Returns:
+            Response -- JSON serialized page of comments, or None for cursor pages
+        """
+        if not self.paginates_async():
+            return None
+        comments = self.listed_comments()
+        return await aconditional_response(
+            request, comments, lambda: self.apaginated_response(comments, CommentSerializer),
+            namespaces=('post', 'rareuser'))
+
+
+    def listed_comments(self):
+        """Comments matching the postId parameter"""
+        comments = CommentSerializer.setup_eager_loading(Comment.objects.all(), self.request)
+        postId = self.request.query_params.get('postId', None)
+
+        if postId is not None:
+            comments = comments.filter(post__id=postId)
+        return comments
+
+
+    @action(methods=['get'], detail=False, permission_classes=[IsAdminUser],
+            renderer_classes=EXPORT_RENDERERS)
+    def export(self, request):
+        """Handle GET requests to dump every comment as NDJSON
+
+        Accepts since= (changed at or after), authorId= and postId= filters.
+
+        Returns:
+            StreamingHttpResponse -- one JSON serialized comment per line
+        """
+        comments = filter_since(
+            CommentSerializer.setup_eager_loading(Comment.objects.all(), request), request)
+        authorId = self.request.query_params.get('authorId', None)
+        postId = self.request.query_params.get('postId', None)
+
+        if authorId is not None:
+            comments = comments.filter(author__id=authorId)
+
+        if postId is not None:
+            comments = comments.filter(post__id=postId)
+
+        return ndjson_response(request, comments, CommentSerializer, 'comments.ndjson')
     
     
     def create(self, request):
@@ -47,7 +127,7 @@ class CommentView(ViewSet):
         Returns:
             Response -- JSON serialized comment instance
         """
-        author = RareUser.objects.get(user=request.auth.user)
+        author = get_rareuser(request)
 
         comment = Comment()
         comment.author = author
@@ -60,31 +140,104 @@ class CommentView(ViewSet):
         comment.post = post
 
         try:
-            comment.save()
+            with transaction.atomic():
+                comment.save()
+                activity.comment_added(comment)
             serializer = CommentSerializer(comment, context={'request': request})
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         except ValidationError as ex:
             return Response({"reason": ex.message}, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(methods=['post'], detail=False)
+    def bulk(self, request):
+        """Handle POST operations for a JSON array of comments
+
+        Post ids are checked with one query and all valid comments are
+        inserted in batches inside one transaction.
+
+        Returns:
+            Response -- per-item status with the new ids
+        """
+        author = get_rareuser(request)
+        if author is None:
+            return Response({'message': 'Only rareusers can comment'},
+                            status=status.HTTP_403_FORBIDDEN)
+
+        items = bulk.request_items(request)
+        post_ids = bulk.existing_ids(
+            Post, [bulk.as_id(item.get('postId'))
+                   for item in items if isinstance(item, dict)])
+
+        candidates = []
+        results = []
+        for index, errors, data in bulk.validated_items(items, CommentBulkSerializer):
+            if errors is None and data['post_id'] not in post_ids:
+                errors = {'postId': ['Post does not exist.']}
+            if errors:
+                results.append({'index': index, 'status': 'invalid', 'errors': errors})
+                continue
+
+            candidates.append((index, Comment(author=author, **data)))
+
+        # Recounting can touch as many posts as there are comments, so a
+        # job does it, queued in the same transaction as the comments
+        return bulk.insert(
+            Comment, candidates, results,
+            on_created=lambda created: jobs.enqueue(
+                'recount_posts', priority=5,
+                post_ids=sorted({comment.post_id for comment in created})))
         
     def update(self, request, pk=None):
         """Handle PUT requests for a comment
         Returns:
             Response -- Empty body with 204 status code
         """
-        author = RareUser.objects.get(user=request.auth.user)
+        author = get_rareuser(request)
         post = Post.objects.get(pk=request.data["postId"])
 
         comment = Comment.objects.get(pk=pk)        
+        moved_from = comment.post_id if comment.post_id != post.id else None
         comment.author = author
         comment.post = post
         comment.content = request.data["content"]
 
-        comment.save()
+        with transaction.atomic():
+            comment.save()
+            if moved_from is not None:
+                activity.comment_removed(moved_from)
+                activity.comment_added(comment)
         # 204 status code means everything worked but the
         # server is not sending back any data in the response
         return Response({}, status=status.HTTP_204_NO_CONTENT)
         
         
+    def partial_update(self, request, pk=None):
+        """Handle PATCH requests for a comment
+
+        Changes only the fields sent, with one UPDATE, and only on the
+        requester's own comments. Sending the comment's version makes
+        the edit conditional on nobody having changed it since.
+
+        Returns:
+            Response -- 204, or 400, 403, 404 or 412 status code
+        """
+        author = get_rareuser(request)
+        owner = ('author_id', author.id if author is not None else None)
+        if 'postId' not in request.data:
+            return partial.partial_update(
+                request, Comment.objects.all(), pk, CommentUpdateSerializer, owner)
+
+        # A move changes the counts of both posts, so the old one is read first
+        with transaction.atomic():
+            moved_from = Comment.objects.filter(pk=pk).values_list('post_id', flat=True).first()
+            response = partial.partial_update(
+                request, Comment.objects.all(), pk, CommentUpdateSerializer, owner)
+            moved_to = bulk.as_id(request.data['postId'])
+            if response.status_code == status.HTTP_204_NO_CONTENT and moved_from != moved_to:
+                activity.recount(Post.objects.filter(pk__in=(moved_from, moved_to)))
+        return response
+        
+        
     def destroy(self, request, pk=None):
         """Handle DELETE requests for a single comment
 
@@ -93,11 +246,18 @@ class CommentView(ViewSet):
         """
         try:
             comment = Comment.objects.get(pk=pk)
-            if comment.author == RareUser.objects.get(user=request.auth.user):
-                comment.delete()
+            author = get_rareuser(request)
+            if author is not None and comment.author_id == author.id:
+                with transaction.atomic():
+                    comment.delete()
+                    activity.comment_removed(comment.post_id)
                 return Response({}, status=status.HTTP_204_NO_CONTENT)
 
-        except comment.DoesNotExist as ex:
+            return Response(
+                {'message': 'Only the author can delete a comment'},
+                status=status.HTTP_403_FORBIDDEN)
+
+        except Comment.DoesNotExist as ex:
             return Response({'message': ex.args[0]}, status=status.HTTP_404_NOT_FOUND)
 
         except Exception as ex:
@@ -105,26 +265,85 @@ class CommentView(ViewSet):
         
     
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentPostSerializer(serializers.ModelSerializer):
+    """JSON serializer for the post summary embedded in a comment
+
+    Arguments:
+        serializers
+    """
+    class Meta:
+        model = Post
+        fields = ('id', 'title')
+
+
+class CommentAuthorSerializer(serializers.ModelSerializer):
+    """JSON serializer for the author summary embedded in a comment
+
+    Arguments:
+        serializers
+    """
+    username = serializers.CharField(source='user.username')
+    first_name = serializers.CharField(source='user.first_name')
+    last_name = serializers.CharField(source='user.last_name')
+
+    class Meta:
+        model = RareUser
+        fields = ('id', 'username', 'first_name', 'last_name', 'profile_image_url')
+
+
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """JSON serializer for comments
 
     Arguments:
         serializers
     """
+    post = CommentPostSerializer(read_only=True)
+    author = CommentAuthorSerializer(read_only=True)
+
     class Meta:
         model = Comment
-        fields = ('id', 'content', 'created_on', 'post', 'author')
-        depth = 3
-        
-        
-class PostSerializer(serializers.ModelSerializer):
-    """JSON serializer for posts
+        fields = ('id', 'content', 'created_on', 'post', 'author', 'version')
+        # The post and author summaries are joined into the comment query.
+        # Only the columns they print are read, so the post body and the
+        # author's password hash never leave the database.
+        loads = {
+            'post': Load(only=('post__id', 'post__title'), select=('post',)),
+            'author': Load(
+                only=('author__id', 'author__profile_image_url',
+                      'author__user__username', 'author__user__first_name',
+                      'author__user__last_name'),
+                select=('author__user',)),
+        }
+
+
+class CommentBulkSerializer(serializers.ModelSerializer):
+    """Validates one item of a bulk comment request
+
+    Post ids are checked by the view, with one query for all items.
 
     Arguments:
         serializers
     """
+    postId = serializers.IntegerField(source='post_id')
+
     class Meta:
-        model = Post
-        fields = ('id', 'author', 'category', 'title', 
-                  'publication_date', 'image_url', 'content', 'approved')
-        # depth = 3
\ No newline at end of file
+        model = Comment
+        fields = ('content', 'postId')
+
+
+class CommentUpdateSerializer(serializers.ModelSerializer):
+    """Validates the fields a PATCH may change on a comment
+
+    Arguments:
+        serializers
+    """
+    postId = serializers.IntegerField(source='post_id')
+
+    class Meta:
+        model = Comment
+        fields = ('content', 'postId')
+
+    def validate_postId(self, value):
+        if not Post.objects.filter(pk=value).exists():
+            raise serializers.ValidationError('Post does not exist.')
+        return value
@@ -0,0 +1,54 @@
+from django.db import router
+from django.http import HttpResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rareapi import jobs, purge
+from rareapi.authentication import token_cache
+from rareapi.metrics import metrics
+from rareapi.routers import ReplicaRouter
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def prometheus_metrics(request):
+    '''Reports request timings per action, token cache counters, replica health, purge backlog and job queue for Prometheus
+
+    Method arguments:
+      request -- The full HTTP request object
+    '''
+    stats = token_cache.stats()
+    lines = [
+        '# HELP rare_token_cache_entries Tokens held by the in-process token cache',
+        '# TYPE rare_token_cache_entries gauge',
+        f'rare_token_cache_entries {stats["size"]}',
+    ]
+    for counter in ('hits', 'misses', 'evictions', 'invalidations'):
+        lines.append(f'# HELP rare_token_cache_{counter}_total Token cache {counter}')
+        lines.append(f'# TYPE rare_token_cache_{counter}_total counter')
+        lines.append(f'rare_token_cache_{counter}_total {stats[counter]}')
+
+    for replica_router in router.routers:
+        if isinstance(replica_router, ReplicaRouter):
+            lines.append('# HELP rare_replica_healthy Whether the replica passed its last '
+                         'health check (-1 before the first)')
+            lines.append('# TYPE rare_replica_healthy gauge')
+            for alias, healthy in replica_router.health().items():
+                lines.append(
+                    f'rare_replica_healthy{{database="{alias}"}} '
+                    f'{-1 if healthy is None else int(healthy)}')
+
+    lines.append('# HELP rare_soft_deleted_rows Rows marked deleted that manage.py '
+                 'purge_deleted has yet to remove')
+    lines.append('# TYPE rare_soft_deleted_rows gauge')
+    for model, rows in purge.pending().items():
+        lines.append(f'rare_soft_deleted_rows{{model="{model}"}} {rows}')
+
+    lines.append('# HELP rare_jobs Jobs in the queue table by state')
+    lines.append('# TYPE rare_jobs gauge')
+    for state, total in jobs.counts().items():
+        lines.append(f'rare_jobs{{status="{state}"}} {total}')
+
+    body = metrics.render() + '\n'.join(lines) + '\n'
+    return HttpResponse(body, content_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,5 +1,9 @@
 """View module for handling requests about posts"""
 from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAdminUser
@@ -7,13 +11,29 @@ from django.http import HttpResponseServerError
 from rest_framework.viewsets import ViewSet
 from rest_framework.response import Response
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from rareapi.models.category import Category
-from rareapi.models import Post
-from rareapi.models import RareUser
+from rareapi.models import Post, PostTag, Tag
+from rareapi import bulk, jobs, moderation, partial, tasks
+from rareapi.authentication import get_rareuser
+from rareapi.caching import aconditional_response, bump_version, conditional_response
+from rareapi.export import EXPORT_RENDERERS, filter_since, ndjson_response
+from rareapi.fieldsets import Load, SparseFieldsMixin
+from rareapi.pagination import PaginatedViewMixin, PostCursorPagination
+from rareapi.search import search_posts
+from rareapi.views.comment import CommentAuthorSerializer
 
 
-class PostView(ViewSet):
+# ?ordering= values; each follows an index, id breaking ties
+POST_ORDERINGS = {
+    'last_comment_at': ('last_comment_at', 'id'),
+    '-last_comment_at': ('-last_comment_at', '-id'),
+}
+
+
+class PostView(PaginatedViewMixin, ViewSet):
     """One Post"""
+    cursor_pagination_class = PostCursorPagination
 
     def create(self, request):
         """Handle POST operations for posts
@@ -21,7 +41,7 @@ class PostView(ViewSet):
         Returns:
             Response -- JSON serialized post instance
         """
-        author = RareUser.objects.get(user=request.auth.user)
+        author = get_rareuser(request)
 
         post = Post()
         post.author = author
@@ -30,7 +50,7 @@ class PostView(ViewSet):
         post.image_url = request.data["image_url"]
         post.content = request.data["content"]
         
-        if request.auth.user.is_staff:
+        if request.user.is_staff:
             post.approved = True
 
         category = Category.objects.get(pk=request.data["category_id"])
@@ -44,6 +64,43 @@ class PostView(ViewSet):
             return Response({"reason": ex.message}, status=status.HTTP_400_BAD_REQUEST)
 
 
+    @action(methods=['post'], detail=False)
+    def bulk(self, request):
+        """Handle POST operations for a JSON array of posts
+
+        Category ids are checked with one query and all valid posts are
+        inserted in batches inside one transaction.
+
+        Returns:
+            Response -- per-item status with the new ids
+        """
+        author = get_rareuser(request)
+        if author is None:
+            return Response({'message': 'Only rareusers can create posts'},
+                            status=status.HTTP_403_FORBIDDEN)
+
+        items = bulk.request_items(request)
+        category_ids = bulk.existing_ids(
+            Category, [bulk.as_id(item.get('category_id'))
+                       for item in items if isinstance(item, dict)])
+
+        candidates = []
+        results = []
+        for index, errors, data in bulk.validated_items(items, PostBulkSerializer):
+            if errors is None and data['category_id'] not in category_ids:
+                errors = {'category_id': ['Category does not exist.']}
+            if errors:
+                results.append({'index': index, 'status': 'invalid', 'errors': errors})
+                continue
+
+            candidates.append((index, Post(
+                author=author, approved=request.user.is_staff, **data)))
+
+        # Many posts at once leave the search index fragmented
+        return bulk.insert(Post, candidates, results, on_created=lambda created: jobs.enqueue(
+            'optimize_search_index', key='optimize_search_index', priority=-10))
+
+
     def retrieve(self, request, pk=None):
         """Handle GET requests for single post
 
@@ -51,9 +108,34 @@ class PostView(ViewSet):
             Response -- JSON serialized post
         """
         try:
-            post = Post.objects.get(pk=pk)
-            serializer = PostSerializer(post, context={'request': request})
-            return Response(serializer.data)
+            posts = PostSerializer.setup_eager_loading(Post.objects.filter(pk=pk), request)
+
+            def render():
+                serializer = PostSerializer(posts.get(), context={'request': request})
+                return Response(serializer.data)
+
+            # Posts embed their category, author and tags
+            return conditional_response(
+                request, posts, render, namespaces=('category', 'rareuser', 'tag'))
+        except Exception as ex:
+            return HttpResponseServerError(ex)
+
+
+    async def aretrieve(self, request, pk=None):
+        """retrieve() for rareapi.asyncviews
+
+        Returns:
+            Response -- JSON serialized post
+        """
+        try:
+            posts = PostSerializer.setup_eager_loading(Post.objects.filter(pk=pk), request)
+
+            async def render():
+                serializer = PostSerializer(await posts.aget(), context={'request': request})
+                return Response(serializer.data)
+
+            return await aconditional_response(
+                request, posts, render, namespaces=('category', 'rareuser', 'tag'))
         except Exception as ex:
             return HttpResponseServerError(ex)
         
@@ -62,28 +144,98 @@ class PostView(ViewSet):
         """Handle GET requests to get all posts
 
         Returns:
-            Response -- JSON serialized list of posts
+            Response -- JSON serialized page of posts
+        """
+        posts = self.listed_posts()
+        return conditional_response(
+            request, posts, lambda: self.paginated_response(posts, PostSerializer),
+            namespaces=('category', 'rareuser', 'tag'))
+
+
+    async def alist(self, request):
+        """list() for rareapi.asyncviews
+
+        Returns:
+            Response -- JSON serialized page of posts, or None for cursor pages
         """
-        posts = Post.objects.all()
+        if not self.paginates_async():
+            return None
+        posts = self.listed_posts()
+        return await aconditional_response(
+            request, posts, lambda: self.apaginated_response(posts, PostSerializer),
+            namespaces=('category', 'rareuser', 'tag'))
+
+
+    def listed_posts(self):
+        """Posts matching the authorId, q, tag and tagMatch parameters, in ordering"""
+        posts = PostSerializer.setup_eager_loading(Post.objects.all(), self.request)
         authorId = self.request.query_params.get('authorId', None)
+        q = self.request.query_params.get('q', None)
         
         if authorId is not None:
             posts = posts.filter(author__id=authorId)
-       
-        # Note the addtional `many=True` argument to the
-        # serializer. It's needed when you are serializing
-        # a list of objects instead of a single object.
-        serializer = PostSerializer(
-            posts, many=True, context={'request': request})
-        return Response(serializer.data)
+
+        if q is not None:
+            posts = search_posts(posts, q)
+
+        # ?tag=1,2 or ?tag=1&tag=2; any tag matches unless tagMatch=all
+        tag_ids = {
+            bulk.as_id(value)
+            for values in self.request.query_params.getlist('tag')
+            for value in values.split(',')
+        }
+        if tag_ids:
+            tagged = PostTag.objects.filter(tag_id__in=tag_ids)
+            if self.request.query_params.get('tagMatch') == 'all':
+                tagged = tagged.values('post_id').annotate(
+                    matched=Count('tag_id')).filter(matched=len(tag_ids))
+            posts = posts.filter(id__in=tagged.values('post_id'))
+
+        ordering = self.requested_ordering()
+        if ordering:
+            posts = posts.order_by(*ordering)
+        return posts
+
+
+    def requested_ordering(self):
+        """Order by of the ordering parameter, empty when absent or unknown"""
+        return POST_ORDERINGS.get(self.request.query_params.get('ordering'), ())
     
 
+    @action(methods=['get'], detail=False, permission_classes=[IsAdminUser],
+            renderer_classes=EXPORT_RENDERERS)
+    def export(self, request):
+        """Handle GET requests to dump every post as NDJSON
+
+        Accepts since= (changed at or after) and authorId= filters.
+
+        Returns:
+            StreamingHttpResponse -- one JSON serialized post per line
+        """
+        posts = filter_since(
+            PostExportSerializer.setup_eager_loading(Post.objects.all(), request), request)
+        authorId = self.request.query_params.get('authorId', None)
+
+        if authorId is not None:
+            posts = posts.filter(author__id=authorId)
+
+        return ndjson_response(request, posts, PostExportSerializer, 'posts.ndjson')
+
+
+    def get_paginator(self):
+        # Search results are ordered by rank, and ?ordering= by other
+        # columns, neither of which cursors can follow
+        if 'q' in self.request.query_params or self.requested_ordering():
+            return api_settings.DEFAULT_PAGINATION_CLASS()
+        return super().get_paginator()
+
+
     def update(self, request, pk=None):
         """Handle PUT requests for a game
         Returns:
             Response -- Empty body with 204 status code
         """
-        author = RareUser.objects.get(user=request.auth.user)
+        author = get_rareuser(request)
 
         category = Category.objects.get(pk=request.data["category_id"])
 
@@ -101,45 +253,178 @@ class PostView(ViewSet):
         return Response({}, status=status.HTTP_204_NO_CONTENT)
     
     
-    def destroy(self, request, pk=None):
-        """Handle DELETE requests for a single post
+    def partial_update(self, request, pk=None):
+        """Handle PATCH requests for a post
+
+        Changes only the fields sent, with one UPDATE. Authors may edit
+        their own posts, admins any post. Sending the post's version
+        makes the edit conditional on nobody having changed it since.
 
         Returns:
-            Response -- 200, 404, or 500 status code
+            Response -- 204, or 400, 403, 404 or 412 status code
         """
-        try:
-            post = Post.objects.get(pk=pk)
-            post.delete()
+        owner = None
+        if not request.user.is_staff:
+            author = get_rareuser(request)
+            owner = ('author_id', author.id if author is not None else None)
 
-            return Response({}, status=status.HTTP_204_NO_CONTENT)
+        response = partial.partial_update(
+            request, Post.objects.all(), pk, PostUpdateSerializer, owner)
+        if response.status_code == status.HTTP_204_NO_CONTENT and 'title' in request.data:
+            # Comments embed the post title
+            transaction.on_commit(lambda: bump_version('post'))
+        return response
 
-        except Post.DoesNotExist as ex:
-            return Response({'message': ex.args[0]}, status=status.HTTP_404_NOT_FOUND)
 
-        except Exception as ex:
-            return Response({'message': ex.args[0]}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    def destroy(self, request, pk=None):
+        """Handle DELETE requests for a single post
+
+        Marks the post deleted and queues a purge job, which removes it
+        with its comments later, so this costs the same for any post.
+
+        Returns:
+            Response -- 204 or 404 status code
+        """
+        with transaction.atomic():
+            if not Post.objects.filter(pk=pk).update(deleted_at=timezone.now()):
+                return Response({'message': 'Post matching query does not exist.'},
+                                status=status.HTTP_404_NOT_FOUND)
+            # UPDATE sends no post_delete; comments embed the post
+            transaction.on_commit(lambda: bump_version('post'))
+            tasks.purge_soon()
+        return Response({}, status=status.HTTP_204_NO_CONTENT)
         
 
     @action(methods=['get'], detail=False, permission_classes=[IsAdminUser])
     def unapproved(self, request):
-        try:
-            unapprovedPosts = Post.objects.filter(approved=False)
-            serializer = PostSerializer(unapprovedPosts, many=True, context={'request': request})
-            return Response(serializer.data)   
-        
-        except Exception as ex:
-                return Response({'message': ex.args[0]}) 
+        """Handle GET requests for the moderation queue
+
+        Lists posts neither approved nor rejected, a page at a time, from
+        their partial index.
+
+        Returns:
+            Response -- JSON serialized page of posts
+        """
+        posts = PostSerializer.setup_eager_loading(moderation.pending(), request)
+        return conditional_response(
+            request, posts, lambda: self.paginated_response(posts, PostSerializer),
+            namespaces=('category', 'rareuser', 'tag'))
             
             
     @action(methods=['put'], detail=True, permission_classes=[IsAdminUser])        
     def approve(self, request, pk=None):
-        post = Post.objects.get(pk=pk)
-        post.approved = True
-        post.save()
+        """Handle PUT requests that approve a single post
+
+        Returns:
+            Response -- 204 or 404 status code
+        """
+        posts = Post.objects.filter(pk=pk)
+        if not moderation.decide(posts, True) and not posts.exists():
+            return Response({'message': 'Post matching query does not exist.'},
+                            status=status.HTTP_404_NOT_FOUND)
         return Response({}, status=status.HTTP_204_NO_CONTENT)   
+
+
+    @action(methods=['post'], detail=False, permission_classes=[IsAdminUser])
+    def moderate(self, request):
+        """Handle POST requests that approve or reject many posts at once
+
+        Expects {"decision": "approve" or "reject"} and either "ids": [...]
+        or any of the filters authorId, categoryId, since and until (a
+        publication date range, ISO 8601). Filters pick from the
+        moderation queue, ids pick any post. The posts are updated with
+        one UPDATE, one per chunk of ids.
+
+        Returns:
+            Response -- {"count": posts changed}, or 400 status code
+        """
+        data = request.data if isinstance(request.data, dict) else {}
+        approve = moderation.DECISIONS.get(data.get('decision'))
+        if approve is None:
+            return Response({'decision': 'Expected "approve" or "reject"'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if 'ids' in data:
+            ids = data['ids']
+            if not isinstance(ids, list) or len(ids) > bulk.MAX_ITEMS:
+                return Response({'ids': f'Expected a list of at most {bulk.MAX_ITEMS} post ids'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            changed = moderation.decide_ids([bulk.as_id(pk) for pk in ids], approve)
+            return Response({'count': changed})
+
+        posts = moderation.pending()
+        filters = {
+            'authorId': 'author_id', 'categoryId': 'category_id',
+            'since': 'publication_date__gte', 'until': 'publication_date__lt',
+        }
+        errors = {}
+        for key, lookup in filters.items():
+            if data.get(key) is None:
+                continue
+            if key in ('since', 'until'):
+                value = parse_datetime(str(data[key]))
+                error = 'Expected an ISO 8601 datetime'
+            else:
+                value = bulk.as_id(data[key])
+                error = 'Expected an id'
+            if value is None:
+                errors[key] = error
+            else:
+                posts = posts.filter(**{lookup: value})
+
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        if not any(data.get(key) is not None for key in filters):
+            # Deciding the whole queue at once is almost certainly a mistake
+            return Response({'message': 'Send ids or at least one of ' + ', '.join(filters)},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response({'count': moderation.decide(posts, approve)})
+
+
+    @action(methods=['post', 'delete'], detail=True)
+    def tags(self, request, pk=None):
+        """Handle POST/DELETE requests that attach or detach tags of a post
+
+        Expects {"tag_ids": [...]}; POST attaches them with one INSERT and
+        skips tags already attached, DELETE detaches them with one DELETE.
+
+        Returns:
+            Response -- 204, 400, 403 or 404 status code
+        """
+        try:
+            post = Post.objects.only('id', 'author_id').get(pk=pk)
+        except Post.DoesNotExist as ex:
+            return Response({'message': ex.args[0]}, status=status.HTTP_404_NOT_FOUND)
+
+        author = get_rareuser(request)
+        if not request.user.is_staff and (author is None or post.author_id != author.id):
+            return Response({'message': 'Only the author can tag a post'},
+                            status=status.HTTP_403_FORBIDDEN)
+
+        tag_ids = request.data.get('tag_ids') if isinstance(request.data, dict) else None
+        if not isinstance(tag_ids, list):
+            return Response({'tag_ids': 'Expected a list of tag ids'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        tag_ids = {bulk.as_id(tag_id) for tag_id in tag_ids}
+
+        if request.method == 'POST':
+            existing = bulk.existing_ids(Tag, tag_ids)
+            if existing != tag_ids:
+                return Response({'tag_ids': 'Unknown tag ids'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            PostTag.objects.bulk_create(
+                [PostTag(post_id=post.id, tag_id=tag_id) for tag_id in existing],
+                ignore_conflicts=True)
+        else:
+            PostTag.objects.filter(post_id=post.id, tag_id__in=tag_ids).delete()
+
+        # The tag list is part of the post, so its ETag and version have to move
+        Post.objects.filter(pk=post.id).update(
+            updated_at=timezone.now(), version=F('version') + 1)
+        return Response({}, status=status.HTTP_204_NO_CONTENT)
             
     
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """JSON serializer for posts
 
     Arguments:
@@ -148,5 +433,77 @@ class PostSerializer(serializers.ModelSerializer):
     class Meta:
         model = Post
         fields = ('id', 'author', 'category', 'title', 
-                  'publication_date', 'image_url', 'content', 'approved')
-        depth = 3
\ No newline at end of file
+                  'publication_date', 'image_url', 'content', 'approved', 'rejected', 'tags',
+                  'comment_count', 'last_comment_at', 'version')
+        depth = 3
+        # Every relation depth = 3 walks into, joined or prefetched up front
+        # instead of once per post. The nested author brings its Django
+        # user along, with that user's groups and permissions.
+        loads = {
+            'author': Load(
+                select=('author__user',),
+                prefetch=('author__user__groups__permissions',
+                          'author__user__user_permissions')),
+            'category': Load(select=('category',)),
+            'tags': Load(only=(), prefetch=('tags',)),
+        }
+
+
+class PostExportSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """JSON serializer for the lines of the post export
+
+    The author is the summary comments embed, so the dump carries no
+    password hashes, groups or permissions.
+
+    Arguments:
+        serializers
+    """
+    author = CommentAuthorSerializer(read_only=True)
+
+    class Meta:
+        model = Post
+        fields = PostSerializer.Meta.fields
+        depth = 1
+        loads = {
+            'author': Load(
+                only=('author__id', 'author__profile_image_url',
+                      'author__user__username', 'author__user__first_name',
+                      'author__user__last_name'),
+                select=('author__user',)),
+            'category': Load(select=('category',)),
+            'tags': Load(only=(), prefetch=('tags',)),
+        }
+
+
+class PostBulkSerializer(serializers.ModelSerializer):
+    """Validates one item of a bulk post request
+
+    Category ids are checked by the view, with one query for all items.
+
+    Arguments:
+        serializers
+    """
+    category_id = serializers.IntegerField()
+
+    class Meta:
+        model = Post
+        fields = ('title', 'image_url', 'content', 'category_id')
+
+
+class PostUpdateSerializer(serializers.ModelSerializer):
+    """Validates the fields a PATCH may change on a post
+
+    Arguments:
+        serializers
+    """
+    publication_date = serializers.DateTimeField()
+    category_id = serializers.IntegerField()
+
+    class Meta:
+        model = Post
+        fields = ('title', 'publication_date', 'image_url', 'content', 'category_id')
+
+    def validate_category_id(self, value):
+        if not Category.objects.filter(pk=value).exists():
+            raise serializers.ValidationError('Category does not exist.')
+        return value
@@ -2,11 +2,12 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import serializers
 from rareapi.models import RareUser
+from rareapi.authentication import get_rareuser
 
 
 @api_view(['GET'])
 def get_rareuser_profile(request):
-    rareuser = RareUser.objects.get(user=request.auth.user)
+    rareuser = get_rareuser(request)
 
     serializer = RareUserSerializer(rareuser, context={'request': request})
     
@@ -16,6 +17,26 @@ def get_rareuser_profile(request):
     return Response(profile)
 
 
+async def aget_rareuser_profile(view, request):
+    """get_rareuser_profile for rareapi.asyncviews
+
+    The groups and permissions are prefetched, as serializing them from the
+    event loop can't fall back to lazy queries.
+    """
+    rareuser = get_rareuser(request)
+    if rareuser is not None:
+        rareuser = await RareUser.objects.select_related('user').prefetch_related(
+            'user__groups__permissions', 'user__user_permissions',
+        ).aget(pk=rareuser.pk)
+
+    serializer = RareUserSerializer(rareuser, context={'request': request})
+
+    profile = {}
+    profile["rareuser"] = serializer.data
+
+    return Response(profile)
+
+
 class RareUserSerializer(serializers.ModelSerializer):
 
     class Meta:
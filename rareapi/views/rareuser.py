@@ -1,13 +1,28 @@
 """View module for handling requests about rareusers"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.http import HttpResponseServerError
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser
 from rest_framework.viewsets import ViewSet
 from rest_framework.response import Response
 from rest_framework import serializers
 from rareapi.models import RareUser
+from rareapi import tasks
+from rareapi.authentication import token_cache
+from rareapi.caching import bump_version
+from rareapi.export import EXPORT_RENDERERS, filter_since, ndjson_response
+from rareapi.fieldsets import Load, SparseFieldsMixin
+from rareapi.pagination import PaginatedViewMixin, RareUserCursorPagination
 
+User = get_user_model()
 
-class RareUserView(ViewSet):
+
+class RareUserView(PaginatedViewMixin, ViewSet):
     """One RareUser"""
+    cursor_pagination_class = RareUserCursorPagination
 
     def retrieve(self, request, pk=None):
         """Handle GET requests for single rareuser
@@ -16,7 +31,22 @@ class RareUserView(ViewSet):
             Response -- JSON serialized rareuser
         """
         try:
-            rareuser = RareUser.objects.get(pk=pk)
+            rareusers = RareUserSerializer.setup_eager_loading(RareUser.objects.all(), request)
+            rareuser = rareusers.get(pk=pk)
+            serializer = RareUserSerializer(rareuser, context={'request': request})
+            return Response(serializer.data)
+        except Exception as ex:
+            return HttpResponseServerError(ex)
+
+    async def aretrieve(self, request, pk=None):
+        """retrieve() for rareapi.asyncviews
+
+        Returns:
+            Response -- JSON serialized rareuser
+        """
+        try:
+            rareusers = RareUserSerializer.setup_eager_loading(RareUser.objects.all(), request)
+            rareuser = await rareusers.aget(pk=pk)
             serializer = RareUserSerializer(rareuser, context={'request': request})
             return Response(serializer.data)
         except Exception as ex:
@@ -26,19 +56,71 @@ class RareUserView(ViewSet):
         """Handle GET requests to get all rareusers
 
         Returns:
-            Response -- JSON serialized list of rareusers
+            Response -- JSON serialized page of rareusers
+        """
+        rareusers = RareUserSerializer.setup_eager_loading(RareUser.objects.all(), request)
+
+        return self.paginated_response(rareusers, RareUserSerializer)
+
+    async def alist(self, request):
+        """list() for rareapi.asyncviews
+
+        Returns:
+            Response -- JSON serialized page of rareusers, or None for cursor pages
+        """
+        if not self.paginates_async():
+            return None
+        rareusers = RareUserSerializer.setup_eager_loading(RareUser.objects.all(), request)
+
+        return await self.apaginated_response(rareusers, RareUserSerializer)
+
+    @action(methods=['get'], detail=False, permission_classes=[IsAdminUser],
+            renderer_classes=EXPORT_RENDERERS)
+    def export(self, request):
+        """Handle GET requests to dump every rareuser as NDJSON
+
+        Accepts a since= filter on the signup date.
+
+        Returns:
+            StreamingHttpResponse -- one JSON serialized rareuser per line
+        """
+        rareusers = filter_since(
+            RareUserExportSerializer.setup_eager_loading(RareUser.objects.all(), request),
+            request, field='created_on')
+
+        return ndjson_response(request, rareusers, RareUserExportSerializer, 'rareusers.ndjson')
+
+
+    def destroy(self, request, pk=None):
+        """Handle DELETE requests for a single rareuser, admins only
+
+        Marks the rareuser deleted, deactivates their login and queues a
+        purge job, which removes their posts and comments later, so this
+        costs the same for any rareuser.
+
+        Returns:
+            Response -- 204, 403 or 404 status code
         """
-        rareusers = RareUser.objects.all()
-
-        # Note the addtional `many=True` argument to the
-        # serializer. It's needed when you are serializing
-        # a list of objects instead of a single object.
-        serializer = RareUserSerializer(
-            rareusers, many=True, context={'request': request})
-        return Response(serializer.data)
+        if not request.user.is_staff:
+            return Response({'message': 'Only admins can delete rareusers'},
+                            status=status.HTTP_403_FORBIDDEN)
+
+        user_id = RareUser.objects.filter(pk=pk).values_list('user_id', flat=True).first()
+        if user_id is None:
+            return Response({'message': 'RareUser matching query does not exist.'},
+                            status=status.HTTP_404_NOT_FOUND)
+        with transaction.atomic():
+            RareUser.objects.filter(pk=pk).update(deleted_at=timezone.now())
+            User.objects.filter(pk=user_id).update(is_active=False)
+            # UPDATE sends no signals: drop their cached tokens, and posts
+            # and comments embed their author
+            transaction.on_commit(lambda: token_cache.discard_user(user_id))
+            transaction.on_commit(lambda: bump_version('rareuser'))
+            tasks.purge_soon()
+        return Response({}, status=status.HTTP_204_NO_CONTENT)
     
 
-class RareUserSerializer(serializers.ModelSerializer):
+class RareUserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """JSON serializer for rareusers
 
     Arguments:
@@ -47,4 +129,41 @@ class RareUserSerializer(serializers.ModelSerializer):
     class Meta:
         model = RareUser
         fields = ('id', 'user', 'bio', 'created_on', 'active', 'profile_image_url')
-        depth = 3
\ No newline at end of file
+        depth = 3
+        # The nested user with its groups and permissions, loaded up front
+        loads = {
+            'user': Load(
+                select=('user',),
+                prefetch=('user__groups__permissions',
+                          'user__user_permissions__content_type')),
+        }
+
+class ExportUserSerializer(serializers.ModelSerializer):
+    """JSON serializer for the Django user embedded in an exported rareuser
+
+    Arguments:
+        serializers
+    """
+    class Meta:
+        model = User
+        fields = ('id', 'username', 'first_name', 'last_name', 'email',
+                  'is_staff', 'is_active', 'date_joined')
+
+
+class RareUserExportSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """JSON serializer for the lines of the rareuser export
+
+    The user is summarized, so the dump carries no password hashes,
+    groups or permissions.
+
+    Arguments:
+        serializers
+    """
+    user = ExportUserSerializer(read_only=True)
+
+    class Meta:
+        model = RareUser
+        fields = RareUserSerializer.Meta.fields
+        loads = {
+            'user': Load(select=('user',)),
+        }
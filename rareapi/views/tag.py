@@ -3,14 +3,20 @@
 # from unicodedata import tag
 from django.http import HttpResponseServerError
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from rest_framework import status
+from rest_framework.decorators import action
 from rest_framework.viewsets import ViewSet
 from rest_framework.response import Response
 from rest_framework import serializers
 from rareapi.models import Tag
+from rareapi import bulk, partial
+from rareapi.caching import bump_version, cached_response
+from rareapi.fieldsets import SparseFieldsMixin
+from rareapi.pagination import PaginatedViewMixin
 
 
-class TagView(ViewSet):
+class TagView(PaginatedViewMixin, ViewSet):
     """Tag types"""
     
     def create(self, request):
@@ -32,6 +38,28 @@ class TagView(ViewSet):
             return Response({"reason": ex.message}, status=status.HTTP_400_BAD_REQUEST)
 
 
+    @action(methods=['post'], detail=False)
+    def bulk(self, request):
+        """Handle POST operations for a JSON array of tags
+
+        Returns:
+            Response -- per-item status with the new ids
+        """
+        candidates = []
+        results = []
+        for index, errors, data in bulk.validated_items(bulk.request_items(request), TagSerializer):
+            if errors:
+                results.append({'index': index, 'status': 'invalid', 'errors': errors})
+                continue
+            candidates.append((index, Tag(**data)))
+
+        # bulk_create sends no post_save, so retire cached tag pages here
+        response = bulk.insert(Tag, candidates, results)
+        bump_version('tag')
+        return response
+
+
+    @cached_response('tag')
     def retrieve(self, request, pk=None):
         """Handle GET requests for single tag
 
@@ -39,26 +67,23 @@ class TagView(ViewSet):
             Response -- JSON serialized tag
         """
         try:
-            tag_type = Tag.objects.get(pk=pk)
+            tag_types = TagSerializer.setup_eager_loading(Tag.objects.all(), request)
+            tag_type = tag_types.get(pk=pk)
             serializer = TagSerializer(tag_type, context={'request': request})
             return Response(serializer.data)
         except Exception as ex:
             return HttpResponseServerError(ex)
 
+    @cached_response('tag')
     def list(self, request):
         """Handle GET requests to get all categories
 
         Returns:
-            Response -- JSON serialized list of categories
+            Response -- JSON serialized page of tags
         """
-        tag_types = Tag.objects.all()
-
-        # Note the addtional `many=True` argument to the
-        # serializer. It's needed when you are serializing
-        # a list of objects instead of a single object.
-        serializer = TagSerializer(
-            tag_types, many=True, context={'request': request})
-        return Response(serializer.data)
+        tag_types = TagSerializer.setup_eager_loading(Tag.objects.all(), request)
+
+        return self.paginated_response(tag_types, TagSerializer)
     
     def update(self, request, pk=None):
         """Handle PUT requests for a tag
@@ -75,6 +100,22 @@ class TagView(ViewSet):
         return Response({}, status=status.HTTP_204_NO_CONTENT)
     
     
+    def partial_update(self, request, pk=None):
+        """Handle PATCH requests for a tag
+
+        Changes only the fields sent, with one UPDATE. Sending the tag's
+        version makes the edit conditional on nobody having changed it since.
+
+        Returns:
+            Response -- 204, or 400, 404 or 412 status code
+        """
+        response = partial.partial_update(request, Tag.objects.all(), pk, TagSerializer)
+        if response.status_code == status.HTTP_204_NO_CONTENT:
+            # UPDATE sends no post_save, so retire cached tag pages here
+            transaction.on_commit(lambda: bump_version('tag'))
+        return response
+    
+    
     def destroy(self, request, pk=None):
         """Handle DELETE requests for a single post
 
@@ -94,7 +135,7 @@ class TagView(ViewSet):
             return Response({'message': ex.args[0]}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """JSON serializer for tags
 
     Arguments:
@@ -102,4 +143,5 @@ class TagSerializer(serializers.ModelSerializer):
     """
     class Meta:
         model = Tag
-        fields = ('id', 'label')
\ No newline at end of file
+        fields = ('id', 'label', 'version')
+        read_only_fields = ('version',)
\ No newline at end of file